@@ -0,0 +1,9 @@
+"""Performance benchmarks for the LocalLibrary catalog.
+
+Each module is a script run from the repository root, e.g.::
+
+    python -m benchmarks.loan_query_plans --copies 1000000
+
+Benchmarks never touch the configured database: they create a throwaway
+test database (like ``manage.py test``), seed it and drop it afterwards.
+"""
@@ -0,0 +1,177 @@
+"""Compare gunicorn sync workers with uvicorn (ASGI) under many concurrent clients.
+
+Seeds a throwaway database, then starts each server in turn on it and
+drives the catalog read pages with `--concurrency` simultaneous clients:
+
+* gunicorn with sync workers, as in the Procfile, serving the sync views;
+* uvicorn serving the async views (catalog/async_views.py);
+* uvicorn serving the sync views, which Django runs in a thread.
+
+Both servers get the same number of worker processes. Requires the
+packages in benchmarks/requirements.txt.
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.asgi_vs_wsgi --copies 100000 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.base import benchmark_database, setup_django, timed
+from benchmarks.routes import percentile
+
+# (label, sync route name, async route name)
+PAGES = [
+    ('index', 'index', 'async-index'),
+    ('books', 'books', 'async-books'),
+    ('book detail', 'book-detail', 'async-book-detail'),
+    ('authors', 'authors', 'async-authors'),
+    ('author detail', 'author-detail', 'async-author-detail'),
+]
+
+
+def server_commands(port, workers):
+    """(label, command, whether to request the async views) of each server to benchmark."""
+    gunicorn = [sys.executable, '-m', 'gunicorn', 'locallibrary.wsgi', '--workers', str(workers),
+                '--bind', f'127.0.0.1:{port}', '--log-level', 'warning']
+    uvicorn = [sys.executable, '-m', 'uvicorn', 'locallibrary.asgi:application', '--workers', str(workers),
+               '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning', '--no-access-log']
+    return [
+        ('gunicorn sync', gunicorn, False),
+        ('uvicorn async views', uvicorn, True),
+        ('uvicorn sync views', uvicorn, False),
+    ]
+
+
+def page_paths(samples, use_async):
+    from django.urls import reverse
+
+    paths = {}
+    for label, sync_name, async_name in PAGES:
+        name = async_name if use_async else sync_name
+        kwargs = {'pk': samples[label.split()[0]]} if label.endswith('detail') else None
+        paths[label] = reverse(name, kwargs=kwargs)
+    return paths
+
+
+async def wait_until_ready(client, base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = await client.get(base_url + '/catalog/')
+            if response.status_code == 200:
+                return
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+        await asyncio.sleep(0.2)
+
+
+async def load(client, url, requests, concurrency):
+    """Issue `requests` GETs from `concurrency` concurrent clients. Returns latencies in ms, errors and seconds."""
+    latencies, errors = [], 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await client.get(url)
+                failed = response.status_code != 200
+            except Exception:
+                failed = True
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def benchmark_server(base_url, paths, requests, concurrency):
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        await wait_until_ready(client, base_url)
+        results = {}
+        for label, path in paths.items():
+            await load(client, base_url + path, concurrency, concurrency)  # warm up every worker
+            latencies, errors, elapsed = await load(client, base_url + path, requests, concurrency)
+            results[label] = {
+                'path': path,
+                'requests_per_second': round(len(latencies) / elapsed, 1),
+                'latency_ms': {
+                    'mean': round(statistics.mean(latencies), 3),
+                    'p50': round(percentile(latencies, 0.50), 3),
+                    'p99': round(percentile(latencies, 0.99), 3),
+                },
+                'errors': errors,
+            }
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--copies', type=int, default=100000, help='Number of BookInstance rows to seed.')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per page and server.')
+    parser.add_argument('--concurrency', type=int, default=200, help='Simultaneous clients (default: 200).')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes per server.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', help='Also write the results to this file.')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from django.db import connection
+    from benchmarks.routes import pick_samples
+    from benchmarks.seed import seed_catalog
+
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            # The servers run in other processes, so the database cannot live in memory
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+
+        with benchmark_database():
+            with timed(f'Seeded {args.copies} copies'):
+                seed_catalog(args.copies)
+            samples = pick_samples()
+            env = {
+                **os.environ,
+                'DJANGO_SETTINGS_MODULE': 'benchmarks.server_settings',
+                'BENCHMARK_DATABASE_NAME': connection.settings_dict['NAME'],
+            }
+            connection.close()
+
+            results = {}
+            for label, command, use_async in server_commands(args.port, args.workers):
+                server = subprocess.Popen(command, env=env)
+                try:
+                    results[label] = asyncio.run(benchmark_server(
+                        f'http://127.0.0.1:{args.port}', page_paths(samples, use_async), args.requests, args.concurrency,
+                    ))
+                finally:
+                    server.terminate()
+                    server.wait()
+
+    print(f'{args.concurrency} concurrent clients, {args.workers} workers per server')
+    for label, pages in results.items():
+        print(label)
+        for page, result in pages.items():
+            print(f'  {page:<14} {result["requests_per_second"]:>8} req/s  p50 {result["latency_ms"]["p50"]:>9.2f} ms  '
+                  f'p99 {result["latency_ms"]["p99"]:>9.2f} ms  {result["errors"]} errors')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
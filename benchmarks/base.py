@@ -0,0 +1,35 @@
+import os
+import time
+from contextlib import contextmanager
+
+
+def setup_django(settings_module='locallibrary.settings'):
+    """Configure Django for a benchmark script run outside manage.py."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+@contextmanager
+def benchmark_database(verbosity=0, keepdb=False):
+    """Create a throwaway test database for the duration of the block."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, keepdb=keepdb)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity, keepdb=keepdb)
+        teardown_test_environment()
+
+
+@contextmanager
+def timed(label, stream=None):
+    """Print how long the block took."""
+    started = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - started
+    print(f'{label}: {elapsed:.2f}s', file=stream)
@@ -0,0 +1,97 @@
+"""Compare bulk inserts of copies with random (version 4) and time-ordered (version 7) UUID ids.
+
+For each kind of id, loads copies into a fresh throwaway database with
+bulk_create, as the importer does, and records the insert rate and how
+local the primary key index writes were: the share of inserts that went to
+the right edge of the index (past every key inserted before them), and,
+on SQLite, the number of pages of the primary key index afterwards.
+
+    python -m benchmarks.copy_ids --copies 1000000
+"""
+import argparse
+import json
+import time
+import uuid
+
+from benchmarks.base import benchmark_database, setup_django
+
+
+def id_generators():
+    from catalog.identifiers import uuid7
+
+    return {'uuid4': uuid.uuid4, 'uuid7': uuid7}
+
+
+def right_edge_share(ids):
+    """The share of ids greater than every id before them, i.e. appended at the end of the index."""
+    appended, highest = 0, None
+    for value in ids:
+        if highest is None or value.hex > highest:
+            appended += 1
+            highest = value.hex
+    return appended / len(ids) if ids else 0.0
+
+
+def index_pages(connection, table):
+    """Pages of the primary key index of table, if the SQLite build has the dbstat table."""
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name LIKE 'sqlite_autoindex%%'",
+                       [table])
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        try:
+            cursor.execute('SELECT count(*) FROM dbstat WHERE name = %s', [row[0]])
+        except Exception:
+            return None
+        return cursor.fetchone()[0]
+
+
+def load(copies, new_id, batch_size):
+    """Bulk insert `copies` copies with ids from new_id. Returns the ids and the seconds spent inserting."""
+    from django.db import transaction
+    from catalog.models import Book, BookInstance
+
+    book = Book.objects.create(title='Benchmark', summary='A synthetic book used for benchmarking.', isbn='0' * 13)
+    ids = [new_id() for _ in range(copies)]
+    started = time.perf_counter()
+    for start in range(0, copies, batch_size):
+        with transaction.atomic():
+            BookInstance.objects.bulk_create([
+                BookInstance(id=copy_id, book_id=book.pk, imprint='Benchmark Press', status='a')
+                for copy_id in ids[start:start + batch_size]
+            ])
+    return ids, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--copies', type=int, default=1000000, help='Number of BookInstance rows to insert per kind of id.')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_create and transaction.')
+    parser.add_argument('--json', help='Also write the results to this file.')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from catalog.models import BookInstance
+
+    results = {}
+    for name, new_id in id_generators().items():
+        with benchmark_database() as connection:
+            ids, elapsed = load(args.copies, new_id, args.batch_size)
+            results[name] = {
+                'rows_per_second': round(args.copies / elapsed),
+                'seconds': round(elapsed, 2),
+                'right_edge_inserts': round(right_edge_share(ids), 4),
+                'index_pages': index_pages(connection, BookInstance._meta.db_table),
+            }
+        print(f'{name}: {results[name]}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'copies': args.copies, 'batch_size': args.batch_size, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Show the query plans of the loan-status queries with and without the BookInstance indexes.
+
+Seeds a throwaway database, then runs EXPLAIN and times the queries behind
+LoanedBooksView, LoanedBooksByUserListView and the index page twice: once
+with the indexes added by catalog migration 0007 dropped, and once with
+them in place.
+
+    python -m benchmarks.loan_query_plans --copies 1000000
+"""
+import argparse
+import json
+import time
+
+from benchmarks.base import benchmark_database, setup_django, timed
+
+
+def loan_queries():
+    from catalog.models import BookInstance
+
+    return {
+        'all borrowed (LoanedBooksView)': (
+            BookInstance.objects.filter(status__exact='o').order_by('due_back')[:10]
+        ),
+        "borrower's loans (LoanedBooksByUserListView)": (
+            BookInstance.objects.filter(borrower_id=1).filter(status__exact='o').order_by('due_back')[:10]
+        ),
+        'available copies (index)': BookInstance.objects.filter(status__exact='a').order_by().values('pk'),
+    }
+
+
+def run_queries(connection, repeat):
+    """EXPLAIN each query and time `repeat` executions of it."""
+    results = {}
+    for label, queryset in loan_queries().items():
+        plan = queryset.explain()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            if queryset.query.is_sliced:
+                list(queryset)
+            else:
+                queryset.count()
+        elapsed = (time.perf_counter() - started) / repeat
+        results[label] = {'plan': plan, 'ms': round(elapsed * 1000, 3)}
+    return results
+
+
+def analyze(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--copies', type=int, default=1000000, help='Number of BookInstance rows to seed.')
+    parser.add_argument('--repeat', type=int, default=5, help='Executions per query when timing.')
+    parser.add_argument('--json', help='Also write the plans and timings to this file.')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from benchmarks.seed import seed_catalog
+    from catalog.models import BookInstance
+
+    with benchmark_database() as connection:
+        with timed(f'Seeded {args.copies} copies'):
+            seed_catalog(args.copies)
+
+        indexes = BookInstance._meta.indexes
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.remove_index(BookInstance, index)
+        analyze(connection)
+        without_indexes = run_queries(connection, args.repeat)
+
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.add_index(BookInstance, index)
+        analyze(connection)
+        with_indexes = run_queries(connection, args.repeat)
+
+    for label in without_indexes:
+        print(f'\n== {label}')
+        print(f'-- without indexes ({without_indexes[label]["ms"]} ms)\n{without_indexes[label]["plan"]}')
+        print(f'-- with indexes ({with_indexes[label]["ms"]} ms)\n{with_indexes[label]["plan"]}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'copies': args.copies, 'without_indexes': without_indexes, 'with_indexes': with_indexes}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
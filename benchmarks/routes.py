@@ -0,0 +1,212 @@
+"""Drive every route in catalog/urls.py against a seeded catalog and record performance.
+
+For each route the benchmark issues GET requests through the Django test
+client, logged in as a librarian so that every page is reachable, and
+records latency percentiles, queries per request and bytes rendered.
+Results are written as JSON; pass a previous result with --compare to
+flag routes that got slower or issue more queries.
+
+    python -m benchmarks.routes --scale 10k --output bench-10k.json
+    python -m benchmarks.routes --scale 10k --compare bench-10k.json
+"""
+import argparse
+import datetime
+import json
+import statistics
+import sys
+import time
+
+from benchmarks.base import benchmark_database, setup_django, timed
+
+SCALES = {
+    '10k': 10000,
+    '1m': 1000000,
+    '10m': 10000000,
+}
+
+
+def parse_scale(value):
+    """A SCALES preset or a number of copies."""
+    if value.lower() in SCALES:
+        return SCALES[value.lower()]
+    return int(value)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def sample_kwargs(samples):
+    """URL keyword arguments to use for each parametrised route, by route name."""
+    book = {'pk': samples['book']}
+    author = {'pk': samples['author']}
+    return {
+        'book-detail': book,
+        'book_update': book,
+        'book_delete': book,
+        'author-detail': author,
+        'async-book-detail': book,
+        'async-author-detail': author,
+        'author_update': author,
+        'author_delete': author,
+        'renew-book-librarian': {'pk': samples['copy']},
+        'export-catalog': {'kind': 'books', 'fmt': 'csv'},
+        'batch-loans': {'action': 'checkout'},
+        'api-list': {'resource': 'books'},
+        'api-detail': {'resource': 'books', **book},
+    }
+
+
+def catalog_routes(samples):
+    """(name, url) of every catalog route, and the names of routes that could not be built."""
+    from django.urls import reverse, URLPattern
+    from catalog import urls
+
+    kwargs_by_name = sample_kwargs(samples)
+    routes, skipped = [], []
+    for pattern in urls.urlpatterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name:
+            continue
+        if pattern.pattern.converters and pattern.name not in kwargs_by_name:
+            skipped.append(pattern.name)
+            continue
+        routes.append((pattern.name, reverse(pattern.name, kwargs=kwargs_by_name.get(pattern.name))))
+    return routes, skipped
+
+
+def create_librarian():
+    from django.contrib.auth.models import Group, Permission, User
+
+    librarian = User.objects.create_user(username='benchmark-librarian')
+    librarian.groups.add(Group.objects.get_or_create(name='Librarian')[0])
+    librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+    return librarian
+
+
+def pick_samples():
+    """Typical rows to request detail pages for: the book with the most copies, its author, one of its copies."""
+    from catalog.models import Book, BookInstance
+
+    book = Book.objects.filter(author__isnull=False).order_by('-copies_total', 'pk').first()
+    copy = BookInstance.objects.filter(book=book).order_by('pk').first()
+    return {'book': book.pk, 'author': book.author_id, 'copy': copy.pk}
+
+
+def measure(client, url, requests, cold):
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    latencies, queries, sizes, statuses = [], [], [], set()
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(len(context.captured_queries))
+        sizes.append(size)
+        statuses.add(response.status_code)
+
+    return {
+        'url': url,
+        'status': sorted(statuses),
+        'requests': requests,
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies), 3),
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p90': round(percentile(latencies, 0.90), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'max': round(max(latencies), 3),
+        },
+        'queries': {'mean': round(statistics.mean(queries), 2), 'max': max(queries)},
+        'bytes': {'mean': round(statistics.mean(sizes)), 'max': max(sizes)},
+    }
+
+
+def compare(results, baseline, threshold):
+    """Routes whose p90 latency grew by more than `threshold` times, or that issue more queries."""
+    regressions = []
+    for name, result in results['routes'].items():
+        before = baseline.get('routes', {}).get(name)
+        if before is None:
+            continue
+        latency, latency_before = result['latency_ms']['p90'], before['latency_ms']['p90']
+        if latency_before and latency / latency_before > threshold:
+            regressions.append(f'{name}: p90 {latency_before} ms -> {latency} ms')
+        if result['queries']['max'] > before['queries']['max']:
+            regressions.append(f'{name}: {before["queries"]["max"]} -> {result["queries"]["max"]} queries')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=parse_scale, default=SCALES['10k'],
+                        help=f'Number of BookInstance rows, or one of {", ".join(SCALES)} (default: 10k).')
+    parser.add_argument('--requests', type=int, default=20, help='Requests per route (default: 20).')
+    parser.add_argument('--cold', action='store_true', help='Clear the cache before every request.')
+    parser.add_argument('--anonymous', action='store_true', help='Request pages without logging in.')
+    parser.add_argument('--skip', action='append', default=[], help='Route name to leave out (repeatable).')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--compare', help='Previous results JSON to check for regressions.')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='Slowdown factor of the p90 latency counted as a regression (default: 1.25).')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from django.test import Client
+    from benchmarks.seed import seed_catalog
+
+    with benchmark_database():
+        with timed(f'Seeded {args.scale} copies'):
+            seed_catalog(args.scale)
+
+        client = Client()
+        if not args.anonymous:
+            client.force_login(create_librarian())
+
+        routes, skipped = catalog_routes(pick_samples())
+        results = {
+            'copies': args.scale,
+            'requests_per_route': args.requests,
+            'cold_cache': args.cold,
+            'anonymous': args.anonymous,
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'routes': {},
+            'skipped': skipped + args.skip,
+        }
+        for name, url in routes:
+            if name in args.skip:
+                continue
+            client.get(url)  # warm up imports and template loading
+            results['routes'][name] = result = measure(client, url, args.requests, args.cold)
+            print(f'{name:<24} {url:<48} p50 {result["latency_ms"]["p50"]:>9.2f} ms  '
+                  f'p99 {result["latency_ms"]["p99"]:>9.2f} ms  {result["queries"]["max"]:>3} queries  '
+                  f'{result["bytes"]["mean"]:>8} bytes  {result["status"]}')
+
+    if skipped:
+        print(f'Skipped routes without sample arguments: {", ".join(skipped)}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
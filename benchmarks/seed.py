@@ -0,0 +1,99 @@
+"""Seed a benchmark database with a synthetic catalog of a given size."""
+import datetime
+import random
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from catalog import counters, search
+from catalog.models import Author, Book, BookInstance, Genre, Language
+
+GENRES = ['Fantasy', 'Science Fiction', 'Romance', 'Crime', 'Non-fiction', 'History', 'Poetry', 'Horror']
+LANGUAGES = ['English', 'French', 'German', 'Spanish', 'Japanese']
+
+# Share of copies in each loan status
+STATUS_WEIGHTS = {'a': 60, 'o': 30, 'm': 5, 'r': 5}
+
+
+def _batches(count, batch_size):
+    for start in range(0, count, batch_size):
+        yield start, min(start + batch_size, count)
+
+
+def seed_catalog(copies, books=None, authors=None, borrowers=None, batch_size=10000, seed=0, stdout=None):
+    """Create `copies` BookInstance rows with books, authors, genres, languages and borrowers.
+
+    By default there are ten copies per book, ten books per author and one
+    borrower per hundred copies. Rows get explicit primary keys so the same
+    code works on backends that do not return ids from bulk inserts.
+    """
+    rng = random.Random(seed)
+    books = books or max(1, copies // 10)
+    authors = authors or max(1, books // 10)
+    borrowers = borrowers or max(1, copies // 100)
+    today = datetime.date.today()
+
+    def log(message):
+        if stdout is not None:
+            stdout.write(message + '\n')
+
+    with transaction.atomic():
+        genres = Genre.objects.bulk_create([Genre(id=number + 1, name=name) for number, name in enumerate(GENRES)])
+        languages = Language.objects.bulk_create([Language(id=number + 1, name=name) for number, name in enumerate(LANGUAGES)])
+
+        password = make_password(None)
+        for start, end in _batches(borrowers, batch_size):
+            User.objects.bulk_create([
+                User(id=number + 1, username=f'patron{number}', password=password) for number in range(start, end)
+            ])
+        log(f'{borrowers} borrowers')
+
+        for start, end in _batches(authors, batch_size):
+            Author.objects.bulk_create([
+                Author(id=number + 1, first_name=f'First{number}', last_name=f'Last{number % 5000}')
+                for number in range(start, end)
+            ])
+        log(f'{authors} authors')
+
+        BookGenre = Book.genre.through
+        for start, end in _batches(books, batch_size):
+            Book.objects.bulk_create([
+                Book(
+                    id=number + 1,
+                    title=f'Book {number}',
+                    summary='A synthetic book used for benchmarking.',
+                    isbn=f'{number:013}',
+                    author_id=rng.randrange(authors) + 1,
+                    language_id=languages[number % len(languages)].id,
+                )
+                for number in range(start, end)
+            ])
+            BookGenre.objects.bulk_create([
+                BookGenre(book_id=number + 1, genre_id=genre.id)
+                for number in range(start, end)
+                for genre in rng.sample(genres, rng.randint(1, 2))
+            ])
+        log(f'{books} books')
+
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+        for start, end in _batches(copies, batch_size):
+            instances = []
+            for number in range(start, end):
+                status = rng.choices(statuses, weights)[0]
+                on_loan = status == 'o'
+                instances.append(BookInstance(
+                    id=uuid.UUID(int=rng.getrandbits(128), version=4),
+                    book_id=rng.randrange(books) + 1,
+                    imprint='Benchmark Press',
+                    status=status,
+                    due_back=today + datetime.timedelta(days=rng.randint(-30, 30)) if on_loan else None,
+                    borrower_id=rng.randrange(borrowers) + 1 if on_loan else None,
+                ))
+            BookInstance.objects.bulk_create(instances)
+            log(f'{end} of {copies} copies')
+
+        counters.rebuild(batch_size=batch_size)
+        search.rebuild()
@@ -0,0 +1,16 @@
+"""Settings for the application servers started by benchmarks.asgi_vs_wsgi.
+
+The benchmark seeds a throwaway database and passes its name in
+BENCHMARK_DATABASE_NAME, so the servers never see the configured database.
+"""
+import os
+
+from locallibrary.settings import *  # noqa: F401,F403
+from locallibrary.settings import DATABASES
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+DATABASES['default']['NAME'] = os.environ['BENCHMARK_DATABASE_NAME']
+
+# No collectstatic manifest in a benchmark checkout
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
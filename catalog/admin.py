@@ -1,35 +1,63 @@
 from django.contrib import admin
-from .models import Author, Genre, Book, BookInstance, Language
+from django.db.models import Prefetch
+from .models import Author, Genre, Book, BookInstance, Hold, Language, OverdueNotice
+from .pagination import EstimatedCountPaginator
 
 # Register your models here.
-admin.site.register(Genre)
-admin.site.register(Language)
+@admin.register(Genre)
+class GenreAdmin(admin.ModelAdmin):
+    search_fields = ('name',)
+
+
+@admin.register(Language)
+class LanguageAdmin(admin.ModelAdmin):
+    search_fields = ('name',)
+
 
 class BookInline(admin.TabularInline):
     model = Book
     extra = 0
+    # Select boxes would list every language and genre for every book
+    autocomplete_fields = ('language', 'genre')
 
 class BookInstanceInline(admin.TabularInline):
     model = BookInstance
     extra = 0
+    # A select box would list every user for every copy
+    raw_id_fields = ('borrower',)
 
 @admin.register(Author)
 class AuthorAdmin(admin.ModelAdmin):
     list_display = ('last_name', 'first_name', 'date_of_birth', 'date_of_death')
     fields = ['first_name', 'last_name', ('date_of_birth', 'date_of_death')]
+    search_fields = ('last_name', 'first_name')
     inlines = [BookInline]
 
 
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
     list_display = ('title', 'author', 'display_genre')
+    list_select_related = ('author',)
+    autocomplete_fields = ('author', 'language', 'genre')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     inlines = [BookInstanceInline]
 
+    def get_queryset(self, request):
+        # display_genre reads the prefetched genres instead of querying them for every row
+        return super().get_queryset(request).prefetch_related(Prefetch('genre', queryset=Genre.objects.only('id', 'name')))
+
 # Register the Admin classes for BookInstance using the decorator
 @admin.register(BookInstance)
 class BookInstanceAdmin(admin.ModelAdmin):
     list_display = ('book', 'status', 'borrower', 'due_back', 'id')
     list_filter = ('status', 'due_back')
+    list_select_related = ('book', 'borrower')
+    raw_id_fields = ('book', 'borrower')
+    # A total ordering, read from bookinst_due_back_idx, so the admin does not add one that needs a sort
+    ordering = ('due_back', 'id')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         (None, {
@@ -39,3 +67,17 @@ class BookInstanceAdmin(admin.ModelAdmin):
             'fields': ('status', 'due_back', 'borrower')
         }),
     )
+
+@admin.register(OverdueNotice)
+class OverdueNoticeAdmin(admin.ModelAdmin):
+    list_display = ('borrower', 'notice_date', 'loans', 'oldest_due_back', 'sent_at')
+    list_filter = ('notice_date',)
+    list_select_related = ('borrower',)
+
+
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+    list_display = ('book', 'patron', 'status', 'created_at', 'expires_at')
+    list_filter = ('status',)
+    list_select_related = ('book', 'patron')
+    raw_id_fields = ('book', 'patron', 'copy')
@@ -0,0 +1,243 @@
+"""Read-only JSON API over the catalog.
+
+    GET /catalog/api/<resource>/                  first page of a resource
+    GET /catalog/api/<resource>/?cursor=<token>   following pages
+    GET /catalog/api/<resource>/?ids=1,2,3        up to MAX_IDS objects by id
+    GET /catalog/api/<resource>/<id>/             one object
+
+Resources are books, authors, copies, genres and languages. Every call
+accepts:
+
+* ``fields=title,author``: the attributes to return (the id is always
+  returned), loaded with QuerySet.only() so unused columns are not read.
+  A foreign key is returned as the related id.
+* ``include=author,genre``: related objects to embed, each loaded for the
+  whole page with one prefetch query. ``fields[authors]=last_name`` picks
+  the attributes of an embedded resource.
+* ``limit=`` (lists only): page size, at most MAX_LIMIT.
+
+Lists use keyset pagination (catalog.pagination.CursorPaginator), so a
+call costs one query plus one per include whatever its page size or
+position, and there is no total count.
+"""
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.pagination import CursorPaginator, InvalidCursor
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_IDS = 100
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class Relation:
+    """A related resource that can be embedded with include=.
+
+    `accessor` is the attribute on the model (and the prefetch lookup),
+    `remote_field` the foreign key on the related model for one-to-many
+    relations, which the prefetch query has to load.
+    """
+
+    def __init__(self, resource, accessor, many=False, remote_field=None):
+        self.resource = resource
+        self.accessor = accessor
+        self.many = many
+        self.remote_field = remote_field
+
+
+class Resource:
+    def __init__(self, model, fields, ordering, relations=None):
+        self.model = model
+        self.fields = fields
+        self.ordering = ordering
+        self.relations = relations or {}
+
+    def foreign_keys(self):
+        return {name for name, relation in self.relations.items() if not relation.many}
+
+
+RESOURCES = {
+    'books': Resource(
+        Book,
+        fields=['title', 'summary', 'isbn', 'author', 'language', 'copies_total', 'copies_available',
+                'copies_on_loan', 'updated_at'],
+        ordering=('title', 'id'),
+        relations={
+            'author': Relation('authors', 'author'),
+            'language': Relation('languages', 'language'),
+            'genre': Relation('genres', 'genre', many=True),
+            'copies': Relation('copies', 'bookinstance_set', many=True, remote_field='book'),
+        },
+    ),
+    'authors': Resource(
+        Author,
+        fields=['first_name', 'last_name', 'date_of_birth', 'date_of_death'],
+        ordering=('last_name', 'first_name', 'id'),
+        relations={'books': Relation('books', 'book_set', many=True, remote_field='author')},
+    ),
+    'copies': Resource(
+        BookInstance,
+        fields=['book', 'imprint', 'status', 'due_back'],
+        ordering=('id',),
+        relations={'book': Relation('books', 'book')},
+    ),
+    'genres': Resource(Genre, fields=['name'], ordering=('name', 'id')),
+    'languages': Resource(Language, fields=['name'], ordering=('name', 'id')),
+}
+
+
+def _names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def _fields(request, resource, param):
+    if param not in request.GET:
+        return resource.fields
+    fields = _names(request.GET[param])
+    unknown = [name for name in fields if name not in resource.fields and name != 'id']
+    if unknown:
+        raise ApiError(f'Unknown fields for {param}: {", ".join(unknown)}')
+    return [name for name in fields if name != 'id']
+
+
+def _includes(request, resource):
+    """{relation name: (Relation, related Resource, fields)} of the include= parameter."""
+    includes = {}
+    for name in _names(request.GET.get('include', '')):
+        relation = resource.relations.get(name)
+        if relation is None:
+            raise ApiError(f'Unknown include: {name}')
+        related = RESOURCES[relation.resource]
+        includes[name] = (relation, related, _fields(request, related, f'fields[{relation.resource}]'))
+    return includes
+
+
+def _queryset(resource, fields, includes):
+    """Queryset loading only `fields`, the ordering columns and the related objects to embed."""
+    only = {'pk', *fields}
+    only.update(name for name in resource.ordering if name != 'id')
+    prefetches = []
+    for name, (relation, related, related_fields) in includes.items():
+        related_only = {'pk', *related_fields}
+        if relation.many:
+            if relation.remote_field:
+                # The prefetch matches rows to their parent through this column
+                related_only.add(relation.remote_field)
+        else:
+            only.add(relation.accessor)
+        prefetches.append(Prefetch(relation.accessor, queryset=related.model.objects.only(*related_only)))
+    return resource.model.objects.only(*only).prefetch_related(*prefetches)
+
+
+def _serialize(obj, resource, fields, includes=None):
+    data = {'id': obj.pk}
+    foreign_keys = resource.foreign_keys()
+    for name in fields:
+        if name in foreign_keys:
+            data[name] = getattr(obj, resource.model._meta.get_field(name).attname)
+        else:
+            data[name] = getattr(obj, name)
+    for name, (relation, related, related_fields) in (includes or {}).items():
+        if relation.many:
+            data[name] = [_serialize(item, related, related_fields) for item in getattr(obj, relation.accessor).all()]
+        else:
+            item = getattr(obj, relation.accessor)
+            data[name] = None if item is None else _serialize(item, related, related_fields)
+    return data
+
+
+def _pk_values(resource, values):
+    field = resource.model._meta.pk
+    try:
+        return [field.to_python(value) for value in values]
+    except ValidationError:
+        raise ApiError('Invalid id')
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit must be a number')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(f'limit must be between 1 and {MAX_LIMIT}')
+    return limit
+
+
+def _page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def _resource(name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        raise ApiError(f'Unknown resource: {name}', status=404)
+    return resource
+
+
+def api_view(view):
+    """Turn ApiError into a JSON error response."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+    return require_GET(wrapper)
+
+
+@api_view
+def resource_list(request, resource):
+    """A page of a resource, or the objects named by ids=."""
+    resource = _resource(resource)
+    fields = _fields(request, resource, 'fields')
+    includes = _includes(request, resource)
+    queryset = _queryset(resource, fields, includes)
+
+    if 'ids' in request.GET:
+        ids = list(dict.fromkeys(_pk_values(resource, _names(request.GET['ids']))))
+        if len(ids) > MAX_IDS:
+            raise ApiError(f'At most {MAX_IDS} ids can be requested at once')
+        objects = {obj.pk: obj for obj in queryset.filter(pk__in=ids)}
+        return JsonResponse({
+            'data': [_serialize(objects[pk], resource, fields, includes) for pk in ids if pk in objects],
+            'missing': [pk for pk in ids if pk not in objects],
+        })
+
+    paginator = CursorPaginator(queryset, _limit(request), resource.ordering)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor as e:
+        raise ApiError(str(e))
+    return JsonResponse({
+        'data': [_serialize(obj, resource, fields, includes) for obj in page],
+        'next': _page_url(request, page.next_cursor),
+        'previous': _page_url(request, page.previous_cursor),
+    })
+
+
+@api_view
+def resource_detail(request, resource, pk):
+    """One object of a resource."""
+    resource = _resource(resource)
+    fields = _fields(request, resource, 'fields')
+    includes = _includes(request, resource)
+    obj = _queryset(resource, fields, includes).filter(pk__in=_pk_values(resource, [pk])).first()
+    if obj is None:
+        raise ApiError('Not found', status=404)
+    return JsonResponse({'data': _serialize(obj, resource, fields, includes)})
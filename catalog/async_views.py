@@ -0,0 +1,160 @@
+"""Async versions of the catalog read views, for serving under ASGI.
+
+The ORM is synchronous in Django 3.1, so queries run in worker threads
+through sync_to_async. Queries that do not depend on each other (a list
+page's count and rows, an author and their books) are
+started together with asyncio.gather, each in a thread with its own
+database connection, so a page costs the time of its slowest query rather
+than the sum of them. Templates are rendered with sync_to_async too, since
+rendering may still touch the database.
+
+The pages are the same templates as the synchronous views. Conditional GET
+(catalog.conditional) and cursor pagination are not available here.
+"""
+import asyncio
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import Page, Paginator
+from django.db import close_old_connections, connection
+from django.http import Http404
+from django.shortcuts import render
+
+from catalog import stats, versions, visits
+from catalog.models import Author, Book
+
+PAGINATE_BY = 10
+
+
+def _shares_request_connection():
+    """Whether queries must stay on the request's connection.
+
+    Other connections cannot see the rows of an open transaction (e.g. in
+    tests), and an in-memory SQLite database only exists for one connection.
+    """
+    if connection.in_atomic_block:
+        return True
+    return connection.vendor == 'sqlite' and connection.is_in_memory_db()
+
+
+def _on_own_connection(function):
+    """Run function in a worker thread, dropping that thread's connection when it is too old to reuse."""
+    close_old_connections()
+    try:
+        return function()
+    finally:
+        close_old_connections()
+
+
+async def run_concurrently(*functions):
+    """Call the synchronous functions concurrently, each in its own thread. Returns their results in order."""
+    if await sync_to_async(_shares_request_connection)():
+        return [await sync_to_async(function)() for function in functions]
+    return await asyncio.gather(*(
+        sync_to_async(partial(_on_own_connection, function), thread_sensitive=False)()
+        for function in functions
+    ))
+
+
+def _page_number(request):
+    try:
+        number = int(request.GET.get('page', 1))
+    except ValueError:
+        raise Http404('Page is not a number.')
+    if number < 1:
+        raise Http404('Page number is less than 1.')
+    return number
+
+
+async def _paginate(request, queryset):
+    """Count the queryset and load the requested page of it at the same time."""
+    number = _page_number(request)
+    offset = (number - 1) * PAGINATE_BY
+    count, rows = await run_concurrently(queryset.count, lambda: list(queryset[offset:offset + PAGINATE_BY]))
+    if not rows and number > 1:
+        raise Http404('Invalid page.')
+
+    paginator = Paginator(queryset, PAGINATE_BY)
+    paginator.count = count
+    page_obj = Page(rows, number, paginator)
+    return {'paginator': paginator, 'page_obj': page_obj, 'is_paginated': paginator.num_pages > 1}
+
+
+async def index(request):
+    """Async version of the home page view."""
+    visit_counter = visits.get_visit_counter()
+    counts, num_visits = await run_concurrently(stats.get_index_counts, partial(visit_counter.visit, request))
+
+    context = {
+        **counts,
+        'num_visits': num_visits,
+    }
+    response = await sync_to_async(render)(request, 'index.html', context=context)
+    visit_counter.save(request, response)
+    return response
+
+
+async def book_list(request):
+    """Async version of BookListView."""
+    queryset = (
+        Book.objects.select_related('author')
+        .only('id', 'title', 'author__id', 'author__first_name', 'author__last_name')
+        .order_by('title', 'id')
+    )
+    context = await _paginate(request, queryset)
+    context['book_list'] = context['page_obj'].object_list
+    return await sync_to_async(render)(request, 'book_list.html', context=context)
+
+
+async def author_list(request):
+    """Async version of AuthorListView."""
+    queryset = Author.objects.only('id', 'first_name', 'last_name').order_by('last_name', 'first_name', 'id')
+    context = await _paginate(request, queryset)
+    context['author_list'] = context['page_obj'].object_list
+    return await sync_to_async(render)(request, 'author_list.html', context=context)
+
+
+def _evaluated(queryset):
+    len(queryset)
+    return queryset
+
+
+async def book_detail(request, pk):
+    """Async version of BookDetailView.
+
+    Like the sync view, only the book is loaded up front: its genres and
+    copies are read by the template inside the cached fragment, so a warm
+    fragment costs no queries for them.
+    """
+    book = await sync_to_async(Book.objects.select_related('author', 'language').filter(pk=pk).first)()
+    if book is None:
+        raise Http404('No book found matching the query')
+
+    context = {
+        'book': book,
+        'object': book,
+        'fragment_timeout': versions.FRAGMENT_TIMEOUT,
+        'fragment_version': await sync_to_async(versions.get_versions)(
+            ('book', book.pk), ('author', book.author_id), ('genre', versions.ALL), ('language', versions.ALL),
+        ),
+    }
+    return await sync_to_async(render)(request, 'book_detail.html', context=context)
+
+
+async def author_detail(request, pk):
+    """Async version of AuthorDetailView, loading the author and their books at the same time."""
+    author, books = await run_concurrently(
+        Author.objects.filter(pk=pk).first,
+        partial(_evaluated, Book.objects.filter(author_id=pk).only('id', 'title', 'summary', 'author_id').order_by('title', 'id')),
+    )
+    if author is None:
+        raise Http404('No author found matching the query')
+
+    context = {
+        'author': author,
+        'object': author,
+        'book_list': books,
+        'fragment_timeout': versions.FRAGMENT_TIMEOUT,
+        'fragment_version': await sync_to_async(versions.get_versions)(('author', author.pk)),
+    }
+    return await sync_to_async(render)(request, 'author_detail.html', context=context)
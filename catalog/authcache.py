@@ -0,0 +1,88 @@
+"""Cached users, permissions and group memberships.
+
+Without it every page for a logged in user loads the user, their own and
+their groups' permissions (for the ``perms`` checks of base_generic.html),
+and librarian pages also check the Librarian group. CachedModelBackend
+keeps all of that in the cache, as one entry per user, so a page costs no
+auth queries once the entry is there.
+
+The cached user carries ModelBackend's permission caches and its group
+names, so has_perm() and in_group() answer without the database. Entries
+are keyed on the versions of catalog.versions: saving a user or changing
+their groups or permissions moves that user to a new version, and changing
+a group's permissions, or any group or permission, moves every user (see
+catalog.signals).
+
+The versions live in the default cache, so the backend is only safe with a
+cache shared by every process serving the site: with a per-process cache,
+the other processes would not see a user being deactivated or losing a
+permission. The settings only enable it when CACHES['default'] is shared.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from catalog import versions
+
+# Bounds how long a process without a shared cache can miss an invalidation
+TIMEOUT = 60 * 60
+
+
+def _key(user_id):
+    return f'catalog:auth:{user_id}:{versions.get_versions(("user", user_id), ("auth", versions.ALL))}'
+
+
+def group_names(user):
+    """The names of the user's groups, loaded once per user object."""
+    if not hasattr(user, '_group_names'):
+        user._group_names = frozenset(user.groups.values_list('name', flat=True)) if user.is_authenticated else frozenset()
+    return user._group_names
+
+
+def in_group(user, name):
+    return name in group_names(user)
+
+
+def get_cached_user(user_id):
+    """The user with the given id, with their permissions and groups loaded, from the cache if possible."""
+    key = _key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = get_user_model()._default_manager.filter(pk=user_id).first()
+        if user is None:
+            return None
+        # Loaded into the user's own caches, which are stored with it
+        ModelBackend().get_all_permissions(user)
+        group_names(user)
+        cache.set(key, user, TIMEOUT)
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend that loads users with their permissions and groups from the cache."""
+
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        return user if self.user_can_authenticate(user) else None
+
+
+def user_changed(sender, instance, **kwargs):
+    versions.bump('user', instance.pk)
+
+
+def memberships_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """m2m_changed receiver for the groups and permissions of users."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        versions.bump('user', instance.pk)
+    elif pk_set is not None:
+        versions.bump('user', *pk_set)
+    else:
+        # A group or permission was cleared of all its users, which are not known here
+        versions.bump('auth', versions.ALL)
+
+
+def auth_changed(sender, **kwargs):
+    """Receiver for changes to groups and permissions, which can concern any user."""
+    versions.bump('auth', versions.ALL)
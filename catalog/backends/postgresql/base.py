@@ -0,0 +1,8 @@
+"""The PostgreSQL backend with its connections pooled and health checked by catalog.pool."""
+from django.db.backends.postgresql import base
+
+from catalog.pool import HealthCheckedDatabaseWrapperMixin, PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(HealthCheckedDatabaseWrapperMixin, PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,137 @@
+"""Conditional GET (ETag / Last-Modified) support for the catalog read views.
+
+Validators are computed from the ``updated_at`` columns of Book and Author
+with one small aggregate query, so an unchanged page is answered with
+304 Not Modified before the view runs or a template is rendered.
+
+A book's ``updated_at`` moves whenever anything shown on its page changes:
+the book itself, its copies, its genres or its language (see the touch_*
+signal handlers below). Pages show the logged in user's name and links, so
+the ETag includes the user, and Last-Modified (which cannot) is only sent
+to anonymous users.
+
+Lists and author pages only send an ETag: deleting a book or author, or
+moving a book to another author, leaves the greatest ``updated_at`` where
+it was (or even lowers it), and only the rest of the ETag notices: the
+author's book count on author pages, and on the lists the whole-table
+version of books or authors that catalog.versions bumps when one is added
+or deleted (read from the cache, rather than counting the table on every
+request). A client revalidating with If-Modified-Since alone would get a
+stale 304.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from catalog import versions
+from catalog.models import Author, Book
+
+
+def _latest(*timestamps):
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    return max(timestamps) if timestamps else None
+
+
+def book_list_validators(request, *args, **kwargs):
+    book_totals = Book.objects.order_by().aggregate(updated_at=Max('updated_at'))
+    author_totals = Author.objects.order_by().aggregate(updated_at=Max('updated_at'))
+    return _latest(book_totals['updated_at'], author_totals['updated_at']), versions.get_versions(('book', versions.ALL))
+
+
+def author_list_validators(request, *args, **kwargs):
+    totals = Author.objects.order_by().aggregate(updated_at=Max('updated_at'))
+    return totals['updated_at'], versions.get_versions(('author', versions.ALL))
+
+
+def book_detail_validators(request, pk, **kwargs):
+    row = Book.objects.filter(pk=pk).values_list('updated_at', 'author__updated_at').first()
+    if row is None:
+        return None, None
+    return _latest(*row), None
+
+
+def author_detail_validators(request, pk, **kwargs):
+    # The books are listed on the author's page; a book leaving or being deleted changes the count
+    row = (
+        Author.objects.filter(pk=pk)
+        .annotate(books_updated_at=Max('book__updated_at'), books=Count('book'))
+        .values_list('updated_at', 'books_updated_at', 'books')
+        .first()
+    )
+    if row is None:
+        return None, None
+    return _latest(row[0], row[1]), row[2]
+
+
+def conditional_view(validators, send_last_modified=True):
+    """Decorate a catalog view with ETag and Last-Modified handling based on `validators`.
+
+    `validators(request, *args, **kwargs)` returns (last_modified, extra), where
+    extra is anything else the page depends on that timestamps miss (e.g. a row
+    count, which changes on deletion). It is called once per request. Views
+    whose extra is not empty should pass send_last_modified=False, as
+    Last-Modified alone would miss the changes only extra reflects.
+    """
+    def get_validators(request, *args, **kwargs):
+        if not hasattr(request, '_catalog_validators'):
+            request._catalog_validators = validators(request, *args, **kwargs)
+        return request._catalog_validators
+
+    def etag(request, *args, **kwargs):
+        last_modified, extra = get_validators(request, *args, **kwargs)
+        if last_modified is None:
+            return None
+        user = request.user.pk if request.user.is_authenticated else 'anonymous'
+        key = f'{validators.__name__}:{request.get_full_path()}:{user}:{last_modified.isoformat()}:{extra}'
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        if not send_last_modified or request.user.is_authenticated:
+            return None
+        return get_validators(request, *args, **kwargs)[0]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def conditional_class_view(validators, send_last_modified=True):
+    """conditional_view() for class-based views."""
+    return method_decorator(conditional_view(validators, send_last_modified), name='dispatch')
+
+
+def _touch_books(queryset):
+    queryset.update(updated_at=timezone.now())
+
+
+def touch_books_of_copy(sender, instance, **kwargs):
+    # Must run before catalog.counters updates _counted_as, which still names the copy's previous book here
+    previous = getattr(instance, '_counted_as', None)
+    book_ids = {instance.book_id, previous[0] if previous else None} - {None}
+    if book_ids:
+        _touch_books(Book.objects.filter(pk__in=book_ids))
+
+
+def touch_books_of_genres(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            _touch_books(Book.objects.filter(pk=instance.pk))
+    elif action == 'pre_clear':
+        # genre.book_set.clear(): the books are only known before the clear
+        _touch_books(Book.objects.filter(genre=instance))
+    elif action in ('post_add', 'post_remove'):
+        _touch_books(Book.objects.filter(pk__in=pk_set))
+
+
+def touch_books_of_genre(sender, instance, **kwargs):
+    _touch_books(Book.objects.filter(genre=instance))
+
+
+def touch_books_of_language(sender, instance, **kwargs):
+    _touch_books(Book.objects.filter(language=instance))
+
+
+def touch_books_of_author(sender, instance, **kwargs):
+    # Deleting an author nulls Book.author with an UPDATE that leaves updated_at alone
+    _touch_books(Book.objects.filter(author=instance))
@@ -0,0 +1,149 @@
+"""Materialized copy counters for books and for the whole library.
+
+Every Book carries the number of its copies in each loan status, and the
+single LibraryCounter row carries the same numbers for the whole library.
+They are adjusted incrementally whenever a BookInstance is created, deleted,
+moved to another book or changes status. Bulk writes that bypass model
+signals (``QuerySet.update()``, ``bulk_create()``) must call
+``apply_changes()`` themselves, and ``rebuild()`` (the ``rebuild_counters``
+management command) recomputes everything from the BookInstance table.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from catalog.models import Book, BookInstance, LibraryCounter
+
+# Counter field for each BookInstance.LOAN_STATUS value
+STATUS_FIELDS = {
+    'm': 'copies_maintenance',
+    'o': 'copies_on_loan',
+    'a': 'copies_available',
+    'r': 'copies_reserved',
+}
+COUNTER_FIELDS = ['copies_total', *STATUS_FIELDS.values()]
+
+
+def _field_deltas(old_status, new_status):
+    """Counter deltas for one copy moving from old_status to new_status (None = not counted)."""
+    deltas = Counter()
+    if old_status is not None:
+        deltas['copies_total'] -= 1
+        if old_status in STATUS_FIELDS:
+            deltas[STATUS_FIELDS[old_status]] -= 1
+    if new_status is not None:
+        deltas['copies_total'] += 1
+        if new_status in STATUS_FIELDS:
+            deltas[STATUS_FIELDS[new_status]] += 1
+    return deltas
+
+
+def apply_changes(changes):
+    """Adjust the counters for an iterable of (old, new) pairs.
+
+    Each side is a (book_id, status) tuple, or None when the copy did not exist
+    before (created) or does not exist any more (deleted). Books that end up
+    with the same deltas are updated together in a single UPDATE. A book_id
+    of None only adjusts the library-wide counters, for callers that write
+    the book's own counters directly (e.g. bulk imports creating new books).
+    """
+    book_deltas = defaultdict(Counter)
+    library_deltas = Counter()
+    for old, new in changes:
+        if old is not None:
+            deltas = _field_deltas(old[1], None)
+            book_deltas[old[0]].update(deltas)
+            library_deltas.update(deltas)
+        if new is not None:
+            deltas = _field_deltas(None, new[1])
+            book_deltas[new[0]].update(deltas)
+            library_deltas.update(deltas)
+
+    books_by_deltas = defaultdict(list)
+    for book_id, deltas in book_deltas.items():
+        deltas = frozenset((field, delta) for field, delta in deltas.items() if delta)
+        if book_id is not None and deltas:
+            books_by_deltas[deltas].append(book_id)
+
+    library_deltas = {field: delta for field, delta in library_deltas.items() if delta}
+
+    with transaction.atomic():
+        for deltas, book_ids in books_by_deltas.items():
+            Book.objects.filter(pk__in=book_ids).update(**{field: F(field) + delta for field, delta in deltas})
+        if library_deltas:
+            updated = LibraryCounter.objects.filter(pk=LibraryCounter.SINGLETON_ID).update(
+                **{field: F(field) + delta for field, delta in library_deltas.items()}
+            )
+            if not updated:
+                # The counter row is missing: recount it from scratch rather than guess.
+                rebuild_library_counter()
+
+
+def copy_pre_save(sender, instance, raw, **kwargs):
+    """Find out how a copy is counted before it is saved, if it was not loaded with the fields."""
+    if instance._state.adding:
+        instance._counted_as = None
+    elif not hasattr(instance, '_counted_as'):
+        instance._counted_as = sender.objects.filter(pk=instance.pk).values_list('book_id', 'status').first()
+
+
+def copy_post_save(sender, instance, **kwargs):
+    """Count a saved copy under its new book and status."""
+    old = getattr(instance, '_counted_as', None)
+    new = (instance.book_id, instance.status)
+    if old != new:
+        apply_changes([(old, new)])
+    instance._counted_as = new
+
+
+def copy_post_delete(sender, instance, **kwargs):
+    """Stop counting a deleted copy."""
+    old = getattr(instance, '_counted_as', (instance.book_id, instance.status))
+    if old is not None:
+        apply_changes([(old, None)])
+    instance._counted_as = None
+
+
+def _status_aggregates():
+    aggregates = {'copies_total': Count('pk')}
+    for status, field in STATUS_FIELDS.items():
+        aggregates[field] = Count('pk', filter=Q(status=status))
+    return aggregates
+
+
+def rebuild_library_counter():
+    """Recount the library-wide counters from the BookInstance table."""
+    totals = BookInstance.objects.order_by().aggregate(**_status_aggregates())
+    LibraryCounter.objects.update_or_create(pk=LibraryCounter.SINGLETON_ID, defaults=totals)
+
+
+def rebuild(batch_size=1000):
+    """Recount every book and the library-wide counters from the BookInstance table.
+
+    Returns the number of books that have at least one copy.
+    """
+    rows = (
+        BookInstance.objects.order_by()
+        .filter(book__isnull=False)
+        .values('book')
+        .annotate(**_status_aggregates())
+    )
+
+    books_counted = 0
+    with transaction.atomic():
+        Book.objects.update(**{field: 0 for field in COUNTER_FIELDS})
+
+        books = []
+        for row in rows.iterator(chunk_size=batch_size):
+            books.append(Book(pk=row.pop('book'), **row))
+            if len(books) >= batch_size:
+                Book.objects.bulk_update(books, COUNTER_FIELDS)
+                books_counted += len(books)
+                books = []
+        Book.objects.bulk_update(books, COUNTER_FIELDS)
+        books_counted += len(books)
+
+        rebuild_library_counter()
+
+    return books_counted
@@ -0,0 +1,115 @@
+"""Streaming export of books, authors and copies as CSV or NDJSON.
+
+Rows are produced lazily, a chunk at a time, so memory use stays the same
+however large the catalog is: authors and copies are read with
+``QuerySet.iterator(chunk_size=...)`` (a server-side cursor on
+PostgreSQL), and books are read in primary key order one chunk at a time
+so that the genres of each chunk can be fetched with one more query.
+
+The book export uses the column names read by catalog.importer, so an
+export can be loaded into another catalog with ``import_catalog``.
+"""
+import csv
+import json
+from collections import defaultdict
+
+from catalog.importer import GENRE_SEPARATOR
+from catalog.models import Author, Book, BookInstance
+
+DEFAULT_CHUNK_SIZE = 2000
+
+BOOK_COLUMNS = [
+    'id', 'title', 'author_first_name', 'author_last_name', 'summary', 'isbn', 'genres', 'language', 'copies',
+]
+AUTHOR_COLUMNS = ['id', 'first_name', 'last_name', 'date_of_birth', 'date_of_death']
+COPY_COLUMNS = ['id', 'book_id', 'book_title', 'imprint', 'status', 'due_back', 'borrower']
+
+
+def export_books(chunk_size=DEFAULT_CHUNK_SIZE):
+    BookGenre = Book.genre.through
+    queryset = Book.objects.order_by('pk').values_list(
+        'pk', 'title', 'author__first_name', 'author__last_name', 'summary', 'isbn', 'language__name', 'copies_total',
+    )
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        last_pk = chunk[-1][0]
+
+        genres = defaultdict(list)
+        links = BookGenre.objects.filter(book_id__in=[row[0] for row in chunk]).order_by('pk')
+        for book_id, name in links.values_list('book_id', 'genre__name'):
+            genres[book_id].append(name)
+
+        for pk, title, first_name, last_name, summary, isbn, language, copies in chunk:
+            yield {
+                'id': pk,
+                'title': title,
+                'author_first_name': first_name or '',
+                'author_last_name': last_name or '',
+                'summary': summary,
+                'isbn': isbn,
+                'genres': genres[pk],
+                'language': language or '',
+                'copies': copies,
+            }
+
+
+def export_authors(chunk_size=DEFAULT_CHUNK_SIZE):
+    queryset = Author.objects.order_by('pk').values_list(*AUTHOR_COLUMNS)
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield dict(zip(AUTHOR_COLUMNS, row))
+
+
+def export_copies(chunk_size=DEFAULT_CHUNK_SIZE):
+    queryset = BookInstance.objects.order_by('pk').values_list(
+        'id', 'book_id', 'book__title', 'imprint', 'status', 'due_back', 'borrower__username',
+    )
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield dict(zip(COPY_COLUMNS, row))
+
+
+EXPORTS = {
+    'books': (BOOK_COLUMNS, export_books),
+    'authors': (AUTHOR_COLUMNS, export_authors),
+    'copies': (COPY_COLUMNS, export_copies),
+}
+
+
+class Echo:
+    """File-like object whose write() hands back the line, so csv.writer output can be streamed."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        values = []
+        for column in columns:
+            value = row[column]
+            if isinstance(value, list):
+                value = GENRE_SEPARATOR.join(value)
+            values.append('' if value is None else value)
+        yield writer.writerow(values)
+
+
+def ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(row, default=str) + '\n'
+
+
+FORMATS = {
+    'csv': ('text/csv', csv_lines),
+    'ndjson': ('application/x-ndjson', ndjson_lines),
+}
+
+
+def export_lines(kind, fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Lines of the `kind` export ('books', 'authors' or 'copies') in format `fmt` ('csv' or 'ndjson')."""
+    columns, rows = EXPORTS[kind]
+    _content_type, lines = FORMATS[fmt]
+    return lines(columns, rows(chunk_size=chunk_size))
@@ -0,0 +1,250 @@
+"""Materialized book counts per genre, language, author and genre-language pair.
+
+The browse view filters books by genre, language and author, and shows
+how many books each choice of the other facets would leave. Those numbers
+are read from FacetCount rows instead of grouping the whole catalog:
+
+* the genre, language and author sidebars without filters read the
+  genre, language and author rows;
+* with a language chosen, the genre sidebar reads the genre-language pairs
+  of that language, and the other way round;
+* with an author chosen, the counts are grouped over the author's books
+  only, and the author sidebar under a genre or language filter is grouped
+  over the books of that genre or language.
+
+The rows are adjusted incrementally when a book is created, changes
+language or author, is deleted, or gains or loses genres (see
+catalog.signals). Bulk writes that bypass model signals (the importer)
+call apply_changes() themselves, and rebuild() (the rebuild_facets
+management command) recounts everything.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from catalog import stats
+from catalog.models import Author, Book, FacetCount, Genre, Language
+
+# Authors listed in the browse sidebar
+AUTHOR_FACET_LIMIT = 20
+
+# The (genre_id, language_id, author_id) keys of each kind of row, and how to find them
+KINDS = {
+    'genre': (lambda key: key[0] and not key[1] and not key[2], Q(language=None, author=None), 'genre_id'),
+    'language': (lambda key: key[1] and not key[0] and not key[2], Q(genre=None, author=None), 'language_id'),
+    'author': (lambda key: key[2] and not key[0] and not key[1], Q(genre=None, language=None), 'author_id'),
+}
+
+
+def book_keys(genre_ids, language_id, author_id):
+    """The (genre_id, language_id, author_id) keys of the rows a book is counted in."""
+    keys = [(genre_id, None, None) for genre_id in genre_ids]
+    if language_id is not None:
+        keys.append((None, language_id, None))
+        keys.extend((genre_id, language_id, None) for genre_id in genre_ids)
+    if author_id is not None:
+        keys.append((None, None, author_id))
+    return keys
+
+
+def _existing(keys):
+    """{key: FacetCount} of the rows that exist for keys, with one query per kind of row."""
+    rows = {}
+    for accepts, condition, field in KINDS.values():
+        values = [key for key in keys if accepts(key)]
+        if values:
+            ids = [value for key in values for value in key if value]
+            rows.update(
+                ((row.genre_id, row.language_id, row.author_id), row)
+                for row in FacetCount.objects.filter(condition, **{f'{field}__in': ids})
+            )
+    pairs = [key for key in keys if key[0] and key[1]]
+    if pairs:
+        pair_rows = FacetCount.objects.filter(
+            genre_id__in={key[0] for key in pairs}, language_id__in={key[1] for key in pairs}, author=None,
+        )
+        rows.update(((row.genre_id, row.language_id, None), row) for row in pair_rows)
+    wanted = set(keys)
+    return {key: row for key, row in rows.items() if key in wanted}
+
+
+def apply_changes(deltas):
+    """Add the {(genre_id, language_id, author_id): delta} counts to their rows, creating missing rows."""
+    deltas = {key: delta for key, delta in Counter(deltas).items() if delta}
+    if not deltas:
+        return
+    try:
+        with transaction.atomic():
+            _apply(deltas)
+    except IntegrityError:
+        # Another writer created one of the missing rows first; it exists now
+        with transaction.atomic():
+            _apply(deltas)
+
+
+def _apply(deltas):
+    existing = _existing(list(deltas))
+    changed = []
+    for key, row in existing.items():
+        row.books = F('books') + deltas[key]
+        changed.append(row)
+    FacetCount.objects.bulk_update(changed, ['books'], batch_size=500)
+    FacetCount.objects.bulk_create([
+        FacetCount(genre_id=key[0], language_id=key[1], author_id=key[2], books=delta)
+        for key, delta in deltas.items()
+        if key not in existing and delta > 0
+    ], batch_size=500)
+
+
+def book_deltas(books, sign):
+    """Deltas counting (sign=1) or uncounting (sign=-1) books given as (genre_ids, language_id, author_id)."""
+    deltas = Counter()
+    for genre_ids, language_id, author_id in books:
+        for key in book_keys(genre_ids, language_id, author_id):
+            deltas[key] += sign
+    return deltas
+
+
+def rebuild():
+    """Recount every facet from the Book and book-genre tables. Returns the number of rows written."""
+    BookGenre = Book.genre.through
+    rows = [
+        *(FacetCount(genre_id=row['genre'], books=row['books'])
+          for row in BookGenre.objects.order_by().values('genre').annotate(books=Count('book'))),
+        *(FacetCount(language_id=row['language'], books=row['books'])
+          for row in Book.objects.order_by().filter(language__isnull=False).values('language').annotate(books=Count('pk'))),
+        *(FacetCount(author_id=row['author'], books=row['books'])
+          for row in Book.objects.order_by().filter(author__isnull=False).values('author').annotate(books=Count('pk'))),
+        *(FacetCount(genre_id=row['genre'], language_id=row['book__language'], books=row['books'])
+          for row in BookGenre.objects.order_by().filter(book__language__isnull=False)
+          .values('genre', 'book__language').annotate(books=Count('book'))),
+    ]
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        FacetCount.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def book_pre_save(sender, instance, raw=False, **kwargs):
+    """Find out the author and language a book is counted under, if they were not loaded from the database."""
+    loaded = getattr(instance, '_loaded_relations', {})
+    if instance.pk is not None and not {'author_id', 'language_id'} <= loaded.keys():
+        row = sender.objects.filter(pk=instance.pk).values('author_id', 'language_id').first()
+        if row is not None:
+            instance._loaded_relations = row
+
+
+def book_saved(sender, instance, created, raw=False, **kwargs):
+    """Move a book to the facets of its new language and author."""
+    old = {} if created else getattr(instance, '_loaded_relations', {})
+    old_language, old_author = old.get('language_id'), old.get('author_id')
+    deltas = Counter()
+    if old_author != instance.author_id:
+        deltas[(None, None, old_author)] -= 1
+        deltas[(None, None, instance.author_id)] += 1
+    if old_language != instance.language_id:
+        genre_ids = [] if created else list(Book.genre.through.objects.filter(book_id=instance.pk).values_list('genre_id', flat=True))
+        deltas.update(book_deltas([(genre_ids, old_language, None)], -1))
+        deltas.update(book_deltas([(genre_ids, instance.language_id, None)], 1))
+    apply_changes({key: delta for key, delta in deltas.items() if any(key)})
+
+
+def book_pre_delete(sender, instance, **kwargs):
+    """Uncount a book before it and its genre links are deleted (the links without m2m_changed)."""
+    genre_ids = list(Book.genre.through.objects.filter(book_id=instance.pk).values_list('genre_id', flat=True))
+    old = getattr(instance, '_loaded_relations', {'author_id': instance.author_id, 'language_id': instance.language_id})
+    apply_changes(book_deltas([(genre_ids, old['language_id'], old['author_id'])], -1))
+
+
+def book_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """m2m_changed receiver counting books under the genres they gain and lose."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    sign = 1 if action == 'post_add' else -1
+    if not reverse:
+        book = instance
+        if action == 'pre_clear':
+            pk_set = set(book.genre.values_list('pk', flat=True))
+        changes = [(pk_set, book.language_id, None)]
+    else:
+        genre = instance
+        books = genre.book_set.all() if action == 'pre_clear' else Book.objects.filter(pk__in=pk_set)
+        changes = [([genre.pk], language_id, None) for language_id in books.values_list('language_id', flat=True)]
+    # Only the genre and genre-language rows; the book stays counted under its language
+    apply_changes({key: delta for key, delta in book_deltas(changes, sign).items() if key[0]})
+
+
+def _counts(rows, model, field):
+    """[(object, books)] of the FacetCount rows, objects loaded in one query, most books first."""
+    counts = {getattr(row, field): row.books for row in rows if row.books}
+    objects = model.objects.in_bulk(list(counts))
+    return sorted(((objects[pk], books) for pk, books in counts.items() if pk in objects),
+                  key=lambda item: (-item[1], str(item[0])))
+
+
+def _grouped(queryset, limit=None):
+    """[(object, books)] of the objects of queryset, with their books counted, most books first."""
+    queryset = queryset.annotate(books=Count('book', distinct=True)).order_by('-books', 'pk')
+    return [(obj, obj.books) for obj in queryset[:limit]]
+
+
+def filter_books(queryset, genre=None, language=None, author=None):
+    """Books of queryset with the chosen genre, language and author ids."""
+    if genre is not None:
+        queryset = queryset.filter(genre=genre)
+    if language is not None:
+        queryset = queryset.filter(language=language)
+    if author is not None:
+        queryset = queryset.filter(author=author)
+    return queryset
+
+
+def filter_books_lookups(genre=None, language=None, author=None):
+    """Lookups from Genre, Language or Author to the books matching the filters."""
+    lookups = {}
+    if genre is not None:
+        lookups['book__genre'] = genre
+    if language is not None:
+        lookups['book__language'] = language
+    if author is not None:
+        lookups['book__author'] = author
+    return lookups
+
+
+def count_books(genre=None, language=None, author=None):
+    """The number of books matching the filters, from a FacetCount row unless an author and more are chosen."""
+    if author is None or (genre is None and language is None):
+        key = {'genre': genre, 'language': language, 'author': author}
+        if any(key.values()):
+            row = FacetCount.objects.filter(**key).values_list('books', flat=True).first()
+            return row or 0
+        return stats.get_index_counts()['num_books']
+    return filter_books(Book.objects.all(), genre, language, author).count()
+
+
+def genre_facets(language=None, author=None):
+    """[(genre, books)] for the genre sidebar."""
+    if author is not None:
+        return _grouped(Genre.objects.filter(**filter_books_lookups(language=language, author=author)))
+    if language is not None:
+        return _counts(FacetCount.objects.filter(language=language, author=None, genre__isnull=False), Genre, 'genre_id')
+    return _counts(FacetCount.objects.filter(language=None, author=None, genre__isnull=False), Genre, 'genre_id')
+
+
+def language_facets(genre=None, author=None):
+    """[(language, books)] for the language sidebar."""
+    if author is not None:
+        return _grouped(Language.objects.filter(**filter_books_lookups(genre=genre, author=author)))
+    if genre is not None:
+        return _counts(FacetCount.objects.filter(genre=genre, author=None, language__isnull=False), Language, 'language_id')
+    return _counts(FacetCount.objects.filter(genre=None, author=None, language__isnull=False), Language, 'language_id')
+
+
+def author_facets(genre=None, language=None, limit=AUTHOR_FACET_LIMIT):
+    """[(author, books)] of the authors with the most books, for the author sidebar."""
+    if genre is not None or language is not None:
+        queryset = Author.objects.filter(**filter_books_lookups(genre=genre, language=language))
+        return _grouped(queryset, limit)
+    rows = FacetCount.objects.filter(genre=None, language=None, author__isnull=False, books__gt=0).order_by('-books', 'author')[:limit]
+    return _counts(rows, Author, 'author_id')
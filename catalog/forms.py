@@ -1,22 +1,78 @@
 import datetime
+import re
 
 from django import forms
+from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
 
+from catalog.identifiers import parse_copy_id
+
+def validate_renewal_date(data):
+    """The rules for a new due date: not in the past and at most 4 weeks ahead."""
+    # Check if a date is not in the past
+    if data < datetime.date.today():
+        raise ValidationError(_('Invalid date - renewal in past'))
+
+    # Check if da data is in the allowed range (+4 weeks from today).
+    if data > datetime.date.today() + datetime.timedelta(weeks=4):
+        raise ValidationError(_('Invalid date - renewal more than 4 weeks ahead'))
+
 class RenewBookForm(forms.Form):
     renewal_date = forms.DateField(help_text="Enter a date between now and 4 weeks (default 3).")
 
     def clean_renewal_date(self):
         data = self.cleaned_data['renewal_date']
+        validate_renewal_date(data)
 
-        # Check if a date is not in the past
-        if data < datetime.date.today():
-            raise ValidationError(_('Invalid date - renewal in past'))
+        # Remember to always return the cleaned data.
+        return data
 
-        # Check if da data is in the allowed range (+4 weeks from today).
-        if data > datetime.date.today() + datetime.timedelta(weeks=4):
-            raise ValidationError(_('Invalid date - renewal more than 4 weeks ahead'))
+class BatchLoanForm(forms.Form):
+    """Copy ids for a batch checkout, return or renewal, with the borrower and due date they need."""
+    MAX_COPIES = 5000
 
-        # Remember to always return the cleaned data.
-        return data
\ No newline at end of file
+    copy_ids = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 10}),
+        help_text='Copy IDs, short or full, one per line (scanned barcodes), or separated by commas or spaces.',
+    )
+    borrower = forms.CharField(required=False, help_text='Username of the borrower (checkout only).')
+    due_back = forms.DateField(required=False, help_text='Enter a date between now and 4 weeks (default 3).')
+
+    def __init__(self, *args, action, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.action = action
+        # Checkout needs both, renewal only a due date and a return neither
+        if action != 'checkout':
+            del self.fields['borrower']
+        if action not in ('checkout', 'renew'):
+            del self.fields['due_back']
+        for field in ('borrower', 'due_back'):
+            if field in self.fields:
+                self.fields[field].required = True
+
+    def clean_copy_ids(self):
+        values = [value for value in re.split(r'[\s,;]+', self.cleaned_data['copy_ids']) if value]
+        copy_ids, invalid = [], []
+        for value in values:
+            try:
+                copy_ids.append(parse_copy_id(value))
+            except ValueError:
+                invalid.append(value)
+        if invalid:
+            raise ValidationError(_('Invalid copy IDs: %(ids)s'), params={'ids': ', '.join(invalid[:10])})
+        if len(copy_ids) > self.MAX_COPIES:
+            raise ValidationError(_('At most %(max)s copies can be processed at once'), params={'max': self.MAX_COPIES})
+        return copy_ids
+
+    def clean_borrower(self):
+        username = self.cleaned_data['borrower']
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise ValidationError(_('No borrower with username %(username)s'), params={'username': username})
+
+    def clean_due_back(self):
+        data = self.cleaned_data['due_back']
+        validate_renewal_date(data)
+        return data
@@ -0,0 +1,216 @@
+"""Hold queues: patrons waiting for a copy of a book, served first come first served.
+
+A hold waits in its book's queue until a copy is set aside for it. The copy
+becomes Reserved, with the patron as its borrower, and the hold is ready
+for pickup until expires_at. Checking the copy out to the patron fulfils
+the hold; checking it out to anyone else puts the hold back in the queue,
+in its old place.
+
+A book's queue is read through the (book, status, created_at, id) index, so
+serving the next patrons is a range scan of as many index entries as there
+are copies to give out, however many holds the book has.
+
+Copies are allocated when they are returned through catalog.loans (which
+sends copies_changed) or saved as available, e.g. in the admin. Copies made
+available without signals (bulk imports) and holds not picked up in time
+are dealt with by reallocate(), the allocate_holds command run nightly.
+"""
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from catalog import loans
+from catalog.models import Book, BookInstance, Hold
+
+ACTIVE_STATUSES = ('w', 'r')
+
+
+def pickup_days():
+    return getattr(settings, 'CATALOG_HOLD_PICKUP_DAYS', 7)
+
+
+def place_hold(book, patron):
+    """Queue `patron` for a copy of `book`. Returns the hold, which is ready at once if a copy is available."""
+    hold = Hold.objects.filter(book=book, patron=patron, status__in=ACTIVE_STATUSES).first()
+    if hold is not None:
+        return hold
+    try:
+        with transaction.atomic():
+            hold = Hold.objects.create(book=book, patron=patron)
+    except IntegrityError:
+        # Placed by another request of the same patron in the meantime
+        return Hold.objects.get(book=book, patron=patron, status__in=ACTIVE_STATUSES)
+
+    for ready in allocate(book.pk):
+        if ready.pk == hold.pk:
+            return ready
+    return hold
+
+
+def allocate(book_id, copy_ids=None, now=None):
+    """Set available copies of a book aside for its oldest waiting holds. Returns the holds made ready.
+
+    `copy_ids` limits the copies to those just made available; otherwise
+    every available copy of the book is given out.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        if copy_ids is None:
+            copy_ids = list(
+                BookInstance.objects.filter(book_id=book_id, status='a').order_by().values_list('id', flat=True)
+            )
+        if not copy_ids:
+            return []
+        waiting = list(
+            Hold.objects.select_for_update()
+            .filter(book_id=book_id, status='w')
+            .order_by('created_at', 'id')[:len(copy_ids)]
+        )
+
+        ready = []
+        for hold, copy_id in zip(waiting, copy_ids):
+            # Only a copy that is still available can be set aside
+            reserved = BookInstance.objects.filter(pk=copy_id, status='a').update(
+                status='r', borrower_id=hold.patron_id, due_back=None, version=F('version') + 1, updated_at=now,
+            )
+            if reserved:
+                hold.status = 'r'
+                hold.copy_id = copy_id
+                hold.ready_at = now
+                hold.expires_at = now + datetime.timedelta(days=pickup_days())
+                ready.append(hold)
+        Hold.objects.bulk_update(ready, ['status', 'copy', 'ready_at', 'expires_at'])
+        loans.maintain([(book_id, 'a')] * len(ready), 'r')
+    return ready
+
+
+def _release(holds, status, now):
+    """End ready holds with `status` and give their copies to the next patrons in the queue.
+
+    Returns the holds made ready.
+    """
+    if not holds:
+        return []
+    with transaction.atomic():
+        Hold.objects.filter(pk__in=[hold.pk for hold in holds]).update(status=status)
+
+        patrons = {hold.copy_id: hold.patron_id for hold in holds if hold.copy_id}
+        rows = BookInstance.objects.filter(pk__in=list(patrons), status='r').order_by().values_list('id', 'book_id', 'borrower_id')
+        # Copies that were handed to someone else in the meantime stay as they are
+        released = [(copy_id, book_id) for copy_id, book_id, borrower_id in rows if patrons[copy_id] == borrower_id]
+        if not released:
+            return []
+        BookInstance.objects.filter(pk__in=[copy_id for copy_id, _book_id in released]).update(
+            status='a', borrower=None, version=F('version') + 1, updated_at=now,
+        )
+        loans.maintain([(book_id, 'r') for _copy_id, book_id in released], 'a')
+
+        copies_by_book = defaultdict(list)
+        for copy_id, book_id in released:
+            copies_by_book[book_id].append(copy_id)
+        return [ready for book_id, copy_ids in copies_by_book.items() for ready in allocate(book_id, copy_ids, now)]
+
+
+def cancel(hold, now=None):
+    """Cancel a waiting or ready hold. The copy of a ready hold goes to the next patron in the queue."""
+    with transaction.atomic():
+        hold = Hold.objects.select_for_update().filter(pk=hold.pk, status__in=ACTIVE_STATUSES).first()
+        if hold is None:
+            return
+        if hold.status == 'r':
+            _release([hold], 'c', now or timezone.now())
+        else:
+            Hold.objects.filter(pk=hold.pk).update(status='c')
+
+
+def expire(now=None):
+    """End the ready holds not picked up by their deadline. Returns (holds expired, holds made ready)."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        holds = list(Hold.objects.select_for_update().filter(status='r', expires_at__lte=now))
+        ready = _release(holds, 'e', now)
+    return len(holds), len(ready)
+
+
+def settle(copy_ids, new_status, borrower_id=None):
+    """Settle the ready holds of reserved copies that changed status.
+
+    A copy checked out to its patron fulfils the hold; otherwise the hold
+    goes back to waiting, keeping its place in the queue.
+    """
+    ready = Hold.objects.filter(status='r', copy_id__in=copy_ids)
+    if new_status == 'o' and borrower_id is not None:
+        ready.filter(patron_id=borrower_id).update(status='f')
+    ready.update(status='w', copy=None, ready_at=None, expires_at=None)
+
+
+def reallocate(now=None):
+    """Nightly pass over all queues. Returns (holds expired, holds made ready).
+
+    Expires the holds not picked up in time, puts back in the queue the
+    ready holds whose copy went elsewhere (e.g. changed in the admin), and
+    allocates every available copy of the books that have a queue.
+    """
+    now = now or timezone.now()
+    expired, made_ready = expire(now)
+
+    ready_holds = Hold.objects.filter(status='r').values_list('copy_id', 'patron_id', 'copy__status', 'copy__borrower_id')
+    fulfilled, lost = [], []
+    for copy_id, patron_id, copy_status, borrower_id in ready_holds:
+        if copy_id is None or borrower_id != patron_id:
+            lost.append(copy_id)
+        elif copy_status == 'o':
+            fulfilled.append(copy_id)
+        elif copy_status != 'r':
+            lost.append(copy_id)
+    Hold.objects.filter(status='r', copy_id__in=fulfilled).update(status='f')
+    Hold.objects.filter(Q(copy__isnull=True) | Q(copy_id__in=[copy_id for copy_id in lost if copy_id]), status='r').update(
+        status='w', copy=None, ready_at=None, expires_at=None,
+    )
+
+    waiting = Hold.objects.filter(book=OuterRef('pk'), status='w')
+    book_ids = list(Book.objects.filter(Exists(waiting), copies_available__gt=0).values_list('pk', flat=True))
+    made_ready += sum(len(allocate(book_id, now=now)) for book_id in book_ids)
+    return expired, made_ready
+
+
+def with_positions(queryset):
+    """Annotate holds with `position`, their place in the queue (1 = next), counted over the queue index."""
+    ahead = (
+        Hold.objects.filter(book=OuterRef('book'), status='w')
+        .filter(Q(created_at__lt=OuterRef('created_at')) | Q(created_at=OuterRef('created_at'), id__lt=OuterRef('id')))
+        .order_by().values('book').annotate(count=Count('pk')).values('count')
+    )
+    return queryset.annotate(position=Coalesce(Subquery(ahead), 0) + 1)
+
+
+def copies_changed(sender, copies, new_status, borrower_id=None, **kwargs):
+    """Receiver of catalog.loans.copies_changed: settle the holds of reserved copies, allocate returned ones."""
+    reserved = [copy_id for copy_id, _book_id, old_status in copies if old_status == 'r']
+    if reserved:
+        settle(reserved, new_status, borrower_id)
+    if new_status == 'a':
+        copies_by_book = defaultdict(list)
+        for copy_id, book_id, _old_status in copies:
+            if book_id is not None:
+                copies_by_book[book_id].append(copy_id)
+        for book_id, copy_ids in copies_by_book.items():
+            allocate(book_id, copy_ids)
+
+
+def copy_saved(sender, instance, raw=False, **kwargs):
+    """post_save receiver giving a copy saved as available to the first patron waiting for its book."""
+    if raw or instance.status != 'a' or instance.book_id is None:
+        return
+    for hold in allocate(instance.book_id, [instance.pk]):
+        # Keep the instance in step with the row, which is now reserved
+        instance.status = 'r'
+        instance.borrower_id = hold.patron_id
+        instance.due_back = None
+        instance.version += 1
+        instance._counted_as = (instance.book_id, 'r')
@@ -0,0 +1,93 @@
+"""Time-ordered copy ids and their short form.
+
+BookInstance ids used to be random (version 4) UUIDs, so every insert
+landed at a random place in the primary key index. new_copy_id() makes
+version 7 UUIDs (RFC 9562) by default instead: they start with the time in
+milliseconds, so new copies are appended at the end of the index, and
+ordering copies by id orders them by creation. CATALOG_COPY_UUID_VERSION = 4
+switches back to random ids.
+
+short_id() writes a copy id as 26 characters of Crockford's base32 for
+URLs and barcodes; parse_copy_id() and the ``copyid`` URL converter accept
+both forms.
+"""
+import secrets
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+# Crockford's base32: no I, L, O or U, and case-insensitive
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+SHORT_ID_LENGTH = 26
+_DECODE = {char: value for value, char in enumerate(ALPHABET)}
+_DECODE.update({'I': 1, 'L': 1, 'O': 0})
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7():
+    """A version 7 UUID: the Unix time in milliseconds, a counter and 62 random bits.
+
+    The 12-bit counter starts at a random value in each millisecond and keeps
+    the UUIDs of one process ordered within it, and when the clock goes back.
+    """
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1000000
+        if ms > _last_ms:
+            # Half of the counter's range is left for the UUIDs that follow in the same millisecond
+            _last_ms, _counter = ms, secrets.randbits(11)
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                # Borrow the next millisecond rather than wrap around
+                _last_ms, _counter = _last_ms + 1, 0
+        ms, counter = _last_ms, _counter
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | secrets.randbits(62))
+
+
+def new_copy_id():
+    """Default of BookInstance.id: a version 7 UUID, or a version 4 one if CATALOG_COPY_UUID_VERSION is 4."""
+    if getattr(settings, 'CATALOG_COPY_UUID_VERSION', 7) == 4:
+        return uuid.uuid4()
+    return uuid7()
+
+
+def short_id(value):
+    """The 26-character base32 form of a copy id."""
+    number = uuid.UUID(str(value)).int
+    chars = []
+    for _ in range(SHORT_ID_LENGTH):
+        number, digit = divmod(number, 32)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def parse_copy_id(value):
+    """The UUID of a copy id in either form. Raises ValueError if it is neither."""
+    value = str(value).strip()
+    if len(value.replace('-', '')) != SHORT_ID_LENGTH:
+        return uuid.UUID(value)
+    number = 0
+    for char in value.upper().replace('-', ''):
+        if char not in _DECODE:
+            raise ValueError(f'Invalid copy id: {value}')
+        number = number * 32 + _DECODE[char]
+    if number >> 128:
+        raise ValueError(f'Invalid copy id: {value}')
+    return uuid.UUID(int=number)
+
+
+class CopyIdConverter:
+    """URL converter for copy ids, matching both forms and writing the short one."""
+    regex = '[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9A-Za-z]{26}'
+
+    def to_python(self, value):
+        return parse_copy_id(value)
+
+    def to_url(self, value):
+        return short_id(value)
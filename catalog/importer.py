@@ -0,0 +1,198 @@
+"""Bulk loading of books, genres and copies from CSV or JSON Lines files.
+
+Each input row describes one book::
+
+    title, author_first_name, author_last_name, summary, isbn, genres,
+    language, copies, imprint, status
+
+``genres`` is a ';'-separated string in CSV (a list or a string in JSON),
+``copies`` is the number of BookInstance rows to create for the book (0 by
+default) and ``status`` their loan status ('a' by default).
+
+Authors, genres and languages are resolved through in-memory maps and
+created when missing. Books, their genre links and their copies are
+written with bulk_create, one transaction per batch, so a failing row only
+rolls back its own batch. Bulk inserts bypass model signals, so the
+importer maintains the copy counters, the facet counts, the search index
+and the caches itself.
+"""
+import contextlib
+import csv
+import json
+import sys
+import time
+
+from django.db import connection, transaction
+from django.db.models import Max
+
+from catalog import counters, facets, search, stats, versions
+from catalog.models import Author, Book, BookInstance, Genre, Language
+
+FIELDS = [
+    'title', 'author_first_name', 'author_last_name', 'summary', 'isbn', 'genres',
+    'language', 'copies', 'imprint', 'status',
+]
+GENRE_SEPARATOR = ';'
+LOAN_STATUSES = {status for status, _label in BookInstance.LOAN_STATUS}
+
+
+class ImportRowError(ValueError):
+    """A row of the import file is invalid."""
+
+
+def _open(path):
+    if path == '-':
+        # Read standard input without closing it
+        return contextlib.nullcontext(sys.stdin)
+    return open(path, newline='', encoding='utf-8')
+
+
+def read_csv(path):
+    with _open(path) as f:
+        yield from csv.DictReader(f)
+
+
+def read_jsonl(path):
+    with _open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+def guess_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class CatalogImporter:
+    """Import rows in batches of `batch_size` books. `progress` is called with (rows, seconds) after each batch."""
+
+    def __init__(self, batch_size=1000, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.authors = {(first, last): pk for pk, first, last in Author.objects.values_list('pk', 'first_name', 'last_name')}
+        self.genres = dict(Genre.objects.values_list('name', 'pk'))
+        self.languages = dict(Language.objects.values_list('name', 'pk'))
+        self.rows = 0
+        self.copies = 0
+
+    def _create_with_ids(self, model, objs):
+        """bulk_create objs and make sure they have primary keys, whatever the backend."""
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # Assign the ids ourselves; the import is expected to be the only writer of these tables
+            next_id = (model.objects.aggregate(max_id=Max('pk'))['max_id'] or 0) + 1
+            for offset, obj in enumerate(objs):
+                obj.pk = next_id + offset
+        return model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+    def _resolve(self, lookup, model, keys, make):
+        missing = [key for key in dict.fromkeys(keys) if key not in lookup]
+        for obj, key in zip(self._create_with_ids(model, [make(key) for key in missing]), missing):
+            lookup[key] = obj.pk
+
+    def _clean(self, number, row):
+        def text(name):
+            value = row.get(name)
+            return '' if value is None else str(value).strip()
+
+        cleaned = {name: text(name) for name in ('title', 'author_first_name', 'author_last_name', 'summary', 'isbn', 'language', 'imprint')}
+        if not cleaned['title']:
+            raise ImportRowError(f'Row {number}: title is required')
+
+        genres = row.get('genres') or []
+        if isinstance(genres, str):
+            genres = genres.split(GENRE_SEPARATOR)
+        cleaned['genres'] = [genre.strip() for genre in genres if genre.strip()]
+
+        try:
+            cleaned['copies'] = int(row.get('copies') or 0)
+        except (TypeError, ValueError):
+            raise ImportRowError(f'Row {number}: copies must be a number')
+        if cleaned['copies'] < 0:
+            raise ImportRowError(f'Row {number}: copies must not be negative')
+
+        cleaned['status'] = text('status') or 'a'
+        if cleaned['status'] not in LOAN_STATUSES:
+            raise ImportRowError(f'Row {number}: unknown status {cleaned["status"]!r}')
+        return cleaned
+
+    def import_rows(self, rows):
+        """Import an iterable of row dicts. Returns the number of books imported."""
+        started = time.perf_counter()
+        try:
+            for batch in _batches(enumerate(rows, start=1), self.batch_size):
+                batch = [self._clean(number, row) for number, row in batch]
+                with transaction.atomic():
+                    self._import_batch(batch)
+                self.rows += len(batch)
+                if self.progress is not None:
+                    self.progress(self.rows, time.perf_counter() - started)
+        finally:
+            # The batches committed before an error stay imported
+            stats.invalidate_index_counts()
+        return self.rows
+
+    def _import_batch(self, batch):
+        def author_key(row):
+            return row['author_first_name'], row['author_last_name']
+
+        self._resolve(self.authors, Author, [author_key(row) for row in batch if any(author_key(row))],
+                      lambda key: Author(first_name=key[0], last_name=key[1]))
+        self._resolve(self.genres, Genre, [genre for row in batch for genre in row['genres']],
+                      lambda name: Genre(name=name))
+        self._resolve(self.languages, Language, [row['language'] for row in batch if row['language']],
+                      lambda name: Language(name=name))
+
+        books = []
+        for row in batch:
+            status_field = counters.STATUS_FIELDS[row['status']]
+            books.append(Book(
+                title=row['title'],
+                summary=row['summary'],
+                isbn=row['isbn'],
+                author_id=self.authors.get(author_key(row)),
+                language_id=self.languages.get(row['language']),
+                # New books: their counters are written directly rather than incremented
+                copies_total=row['copies'],
+                **{status_field: row['copies']},
+            ))
+        books = self._create_with_ids(Book, books)
+
+        BookGenre = Book.genre.through
+        BookGenre.objects.bulk_create([
+            BookGenre(book_id=book.pk, genre_id=self.genres[genre])
+            for book, row in zip(books, batch)
+            for genre in dict.fromkeys(row['genres'])
+        ], batch_size=self.batch_size)
+
+        copies = [
+            BookInstance(book_id=book.pk, imprint=row['imprint'], status=row['status'])
+            for book, row in zip(books, batch)
+            for _copy in range(row['copies'])
+        ]
+        BookInstance.objects.bulk_create(copies, batch_size=self.batch_size)
+        self.copies += len(copies)
+
+        # The new books' own counters were written above; only the library-wide ones need adjusting
+        counters.apply_changes((None, (None, copy.status)) for copy in copies)
+        facets.apply_changes(facets.book_deltas(
+            [({self.genres[genre] for genre in row['genres']}, book.language_id, book.author_id)
+             for book, row in zip(books, batch)], 1,
+        ))
+        search.index_books([book.pk for book in books])
+        versions.bump('author', *{book.author_id for book in books})
+        versions.bump('book', versions.ALL)
+        versions.bump('author', versions.ALL)
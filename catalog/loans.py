@@ -0,0 +1,220 @@
+"""Batch checkout, return and renewal of book copies.
+
+Each operation takes many copy ids and runs in one transaction: one SELECT
+(FOR UPDATE where supported) reads the current status of every copy, then
+the eligible copies are changed with ``UPDATE ... WHERE id IN (...)``
+statements, one per CHUNK_SIZE copies. The UPDATE re-checks the status; if
+it changes fewer rows than expected, another request got in between and
+the whole batch is rolled back and retried. Every copy gets a LoanResult
+saying whether it was changed, and why not.
+
+Single copies change state with transition(): a compare-and-set UPDATE on
+the copy's status and version column, which fails with LoanStateError
+instead of overwriting a change made since the copy was read. Every change
+made here increments BookInstance.version, as does BookInstance.save().
+Only the status changes in ALLOWED_TRANSITIONS are possible.
+
+QuerySet.update() sends no model signals, so the copy counters, cache
+versions, Book.updated_at and the index counts are maintained here, and
+copies_changed is sent for every status change instead.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+
+from catalog import counters, stats, versions
+from catalog.models import Book, BookInstance
+
+CHUNK_SIZE = 500
+RETRIES = 3
+
+STATUS_LABELS = dict(BookInstance.LOAN_STATUS)
+
+# The statuses a copy can move to from each status. On loan to on loan is a renewal.
+ALLOWED_TRANSITIONS = {
+    'a': {'o', 'r', 'm'},
+    'r': {'o', 'a', 'm'},
+    'o': {'o', 'a', 'm'},
+    'm': {'a'},
+}
+
+
+# Sent inside the transaction after copies change status here, with `copies` as (id, book_id, old status)
+# tuples, `new_status` and `borrower_id`. catalog.holds hands returned copies to the patrons waiting for them.
+copies_changed = Signal()
+
+
+class LoanStateError(Exception):
+    """A copy cannot make the requested status change, or changed since it was read."""
+
+
+class ConcurrentChange(Exception):
+    """Copies changed between reading and updating them."""
+
+
+def check_transition(old_status, new_status):
+    if new_status not in ALLOWED_TRANSITIONS.get(old_status, ()):
+        raise LoanStateError(
+            f'A copy that is {STATUS_LABELS.get(old_status, old_status).lower()} '
+            f'cannot be made {STATUS_LABELS.get(new_status, new_status).lower()}'
+        )
+
+
+def maintain(changed, new_status=None):
+    """Do what the model signals would have for copies changed with update(): counters, cache versions, Book.updated_at.
+
+    `changed` holds the (book_id, old status) of each copy.
+    """
+    if not changed:
+        return
+    if new_status is not None:
+        counters.apply_changes(((book_id, status), (book_id, new_status)) for book_id, status in changed)
+        stats.invalidate_index_counts()
+    book_ids = {book_id for book_id, _status in changed} - {None}
+    versions.bump('book', *book_ids)
+    Book.objects.filter(pk__in=book_ids).update(updated_at=timezone.now())
+
+
+def transition(copy, new_status, expected_version=None, **values):
+    """Move `copy` to `new_status`, also setting `values`, if nobody changed it since it was read.
+
+    The copy's status and version (or `expected_version`, e.g. the version
+    a form was rendered with) must still be those in the database.
+    Raises LoanStateError otherwise, or if the status change is not allowed.
+    """
+    check_transition(copy.status, new_status)
+    version = copy.version if expected_version is None else expected_version
+    with transaction.atomic():
+        updated = BookInstance.objects.filter(pk=copy.pk, status=copy.status, version=version).update(
+            status=new_status, version=F('version') + 1, updated_at=timezone.now(), **values,
+        )
+        if not updated:
+            raise LoanStateError('The copy was changed by someone else. Reload it and try again.')
+        old_status = copy.status
+        status_changed = new_status != old_status
+        maintain([(copy.book_id, old_status)], new_status if status_changed else None)
+
+        copy.status = new_status
+        copy.version = version + 1
+        copy._counted_as = (copy.book_id, new_status)
+        for field, value in values.items():
+            setattr(copy, field, value)
+        if status_changed:
+            copies_changed.send(sender=BookInstance, copies=[(copy.pk, copy.book_id, old_status)],
+                                new_status=new_status, borrower_id=copy.borrower_id)
+    return copy
+
+
+def renew_copy(copy, due_back, expected_version=None):
+    """Set a new due date for a copy on loan. Raises LoanStateError if the copy is not on loan."""
+    if copy.status != 'o':
+        raise LoanStateError(f'Only a copy on loan can be renewed; this one is {STATUS_LABELS.get(copy.status, copy.status).lower()}')
+    # The compare-and-set UPDATE of transition() also requires the copy to still be on loan
+    return transition(copy, 'o', expected_version, due_back=due_back)
+
+
+class LoanResult:
+    def __init__(self, copy_id, ok, message, book_id=None):
+        self.copy_id = copy_id
+        self.ok = ok
+        self.message = message
+        self.book_id = book_id
+
+    def __repr__(self):
+        return f'<LoanResult {self.copy_id}: {self.message}>'
+
+
+class LoanOperation:
+    """A change applied to copies in `from_statuses`. `values` are the fields to set.
+
+    from_statuses must agree with ALLOWED_TRANSITIONS for the status set.
+    """
+    label = None
+    from_statuses = ()
+
+    def __init__(self, **values):
+        self.values = values
+
+    def apply(self, copy_ids):
+        """Apply the change to every copy in copy_ids. Returns a LoanResult per distinct id, in order."""
+        copy_ids = list(dict.fromkeys(copy_ids))
+        for attempt in range(RETRIES):
+            try:
+                return self._apply(copy_ids)
+            except ConcurrentChange:
+                if attempt == RETRIES - 1:
+                    raise
+
+    def _apply(self, copy_ids):
+        with transaction.atomic():
+            current = {}
+            for start in range(0, len(copy_ids), CHUNK_SIZE):
+                chunk = copy_ids[start:start + CHUNK_SIZE]
+                rows = BookInstance.objects.select_for_update().filter(pk__in=chunk).order_by().values_list('id', 'book_id', 'status')
+                current.update((pk, (book_id, status)) for pk, book_id, status in rows)
+
+            eligible = [pk for pk in copy_ids if pk in current and current[pk][1] in self.from_statuses]
+            now = timezone.now()
+            for start in range(0, len(eligible), CHUNK_SIZE):
+                chunk = eligible[start:start + CHUNK_SIZE]
+                updated = (
+                    BookInstance.objects.filter(pk__in=chunk, status__in=self.from_statuses)
+                    .update(version=F('version') + 1, updated_at=now, **self.values)
+                )
+                if updated != len(chunk):
+                    raise ConcurrentChange()
+
+            new_status = self.values.get('status')
+            maintain([current[pk] for pk in eligible], new_status)
+            if new_status is not None and eligible:
+                borrower = self.values.get('borrower')
+                copies_changed.send(sender=BookInstance, copies=[(pk, *current[pk]) for pk in eligible],
+                                    new_status=new_status, borrower_id=borrower.pk if borrower else None)
+
+        eligible = set(eligible)
+        return [self._result(pk, current.get(pk), pk in eligible) for pk in copy_ids]
+
+    def _result(self, copy_id, current, changed):
+        if current is None:
+            return LoanResult(copy_id, False, 'No such copy')
+        book_id, status = current
+        if changed:
+            return LoanResult(copy_id, True, self.label, book_id)
+        return LoanResult(copy_id, False, f'Not possible for a copy that is {STATUS_LABELS.get(status, status).lower()}', book_id)
+
+
+class Checkout(LoanOperation):
+    label = 'Checked out'
+    from_statuses = ('a', 'r')
+
+    def __init__(self, borrower, due_back):
+        super().__init__(status='o', borrower=borrower, due_back=due_back)
+
+
+class Return(LoanOperation):
+    label = 'Returned'
+    from_statuses = ('o',)
+
+    def __init__(self):
+        super().__init__(status='a', borrower=None, due_back=None)
+
+
+class Renew(LoanOperation):
+    label = 'Renewed'
+    from_statuses = ('o',)
+
+    def __init__(self, due_back):
+        super().__init__(due_back=due_back)
+
+
+def checkout(copy_ids, borrower, due_back):
+    return Checkout(borrower, due_back).apply(copy_ids)
+
+
+def return_copies(copy_ids):
+    return Return().apply(copy_ids)
+
+
+def renew(copy_ids, due_back):
+    return Renew(due_back).apply(copy_ids)
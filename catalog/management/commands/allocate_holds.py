@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from catalog.holds import reallocate
+
+
+class Command(BaseCommand):
+    help = 'Expire the holds not picked up in time and set available copies aside for the patrons waiting for them.'
+
+    def handle(self, *args, **options):
+        expired, ready = reallocate()
+        self.stdout.write(self.style.SUCCESS(f'{expired} holds expired, {ready} holds ready for pickup.'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from catalog import export
+
+
+class Command(BaseCommand):
+    help = 'Write a full export of books, authors or copies as CSV or NDJSON, in constant memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(export.EXPORTS), help='What to export.')
+        parser.add_argument('--format', choices=sorted(export.FORMATS), default='csv', help='Output format (default: csv).')
+        parser.add_argument('--output', '-o', help='File to write (default: standard output).')
+        parser.add_argument('--chunk-size', type=int, default=export.DEFAULT_CHUNK_SIZE, help='Rows fetched from the database at a time.')
+
+    def handle(self, *args, **options):
+        lines = export.export_lines(options['kind'], options['format'], chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
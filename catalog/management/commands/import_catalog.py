@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import importer
+
+
+class Command(BaseCommand):
+    help = 'Bulk load books, genres and copies from a CSV or JSON Lines file (see catalog.importer for the columns).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for standard input.")
+        parser.add_argument('--format', choices=sorted(importer.READERS), help='Input format (default: guessed from the file name).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Books written per bulk insert and transaction.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        read = importer.READERS[options['format'] or importer.guess_format(path)]
+
+        def progress(rows, seconds):
+            rate = rows / seconds if seconds else 0
+            self.stdout.write(f'{rows} rows imported ({rate:.0f} rows/s)')
+
+        catalog_importer = importer.CatalogImporter(batch_size=options['batch_size'], progress=progress)
+        try:
+            catalog_importer.import_rows(read(path))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'{e} ({catalog_importer.rows} rows imported before the error)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {catalog_importer.rows} books with {catalog_importer.copies} copies.'
+        ))
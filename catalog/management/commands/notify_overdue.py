@@ -0,0 +1,33 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from catalog.overdue import RateLimitedSender, notify_overdue
+
+
+class Command(BaseCommand):
+    help = 'Email every borrower with overdue loans and record an OverdueNotice for each of them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=datetime.date.fromisoformat,
+                            help='Day of the scan, YYYY-MM-DD: loans due back before it are overdue (default: today).')
+        parser.add_argument('--batch-size', type=int, default=500, help='Borrowers handled per batch.')
+        parser.add_argument('--rate', type=float, default=10, help='Most emails sent per second (0 for no limit).')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the overdue loans and borrowers.')
+
+    def handle(self, *args, **options):
+        sender = RateLimitedSender(rate=options['rate'], batch_size=min(100, options['batch_size']))
+        try:
+            borrowers, loans, created = notify_overdue(
+                today=options['date'], sender=sender, batch_size=options['batch_size'], dry_run=options['dry_run'],
+            )
+        finally:
+            sender.close()
+
+        if options['dry_run']:
+            self.stdout.write(f'{loans} overdue loans held by {borrowers} borrowers.')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'{loans} overdue loans held by {borrowers} borrowers: '
+                f'{created} notices recorded, {sender.sent} emails sent.'
+            ))
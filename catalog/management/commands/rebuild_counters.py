@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from catalog import counters, stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-book and library-wide copy counters from the BookInstance table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of books written per UPDATE batch.')
+
+    def handle(self, *args, **options):
+        books = counters.rebuild(batch_size=options['batch_size'])
+        stats.invalidate_index_counts()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt copy counters for {books} books.'))
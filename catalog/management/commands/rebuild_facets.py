@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from catalog import facets
+
+
+class Command(BaseCommand):
+    help = 'Recompute the book counts of the browse facets from the Book and book-genre tables.'
+
+    def handle(self, *args, **options):
+        rows = facets.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} facet counts.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from catalog import search
+
+
+class Command(BaseCommand):
+    help = 'Re-index every book in the full-text search index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=search.INDEX_CHUNK_SIZE, help='Number of books indexed per statement.')
+
+    def handle(self, *args, **options):
+        books = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {books} books.'))
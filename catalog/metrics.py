@@ -0,0 +1,189 @@
+"""Per-request timing of SQL queries and template rendering, and in-process aggregates.
+
+RequestMetricsMiddleware (catalog.middleware) starts a RequestMetrics for
+every request. Queries are timed by a database execute wrapper installed on
+every connection when it is opened, and templates by the
+TimedDjangoTemplates backend configured in TEMPLATES, so nothing depends on
+DEBUG or on capturing the SQL text. The current request is found through a
+context variable, which also follows the request into the worker threads
+of async views. Finished requests are added to REGISTRY, which keeps
+fixed-bucket histograms per view and is exposed as JSON by the catalog
+metrics view.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.exceptions import TemplateDoesNotExist
+
+# Upper bounds of the histogram buckets, in milliseconds (the last bucket is unbounded)
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_current = ContextVar('catalog_request_metrics', default=None)
+_rendering = ContextVar('catalog_rendering_template', default=None)
+
+
+class RequestMetrics:
+    """Timings of one request, in seconds."""
+    __slots__ = ('started', 'total', 'queries', 'db_time', 'template_time', 'view_name', 'lock')
+
+    def __init__(self):
+        # Async views run the queries of one request in several threads at once
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.view_name = None
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Value of the Server-Timing response header."""
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+            f'tpl;dur={self.template_time * 1000:.1f};desc="templates", '
+            f'total;dur={self.total * 1000:.1f}'
+        )
+
+
+def current_metrics():
+    """The RequestMetrics of the request being handled, if any."""
+    return _current.get()
+
+
+def current_template():
+    """Name of the top-level template being rendered, if any."""
+    return _rendering.get()
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query to the current request's metrics."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        with metrics.lock:
+            metrics.queries += 1
+            metrics.db_time += elapsed
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver adding time_query to every new database connection."""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class TimedTemplate(Template):
+    """Template whose render time, less the queries run while rendering, counts as template time."""
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        token = _rendering.set(self.template.name)
+        started = time.perf_counter()
+        db_time = metrics.db_time
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started - (metrics.db_time - db_time)
+            _rendering.reset(token)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing every top-level render for the request metrics."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class Histogram:
+    """Counts of observations per BUCKETS_MS bucket, with their sum."""
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.sum = 0.0
+
+    def observe(self, milliseconds):
+        self.counts[bisect_left(BUCKETS_MS, milliseconds)] += 1
+        self.sum += milliseconds
+
+    def as_dict(self):
+        bounds = [str(bound) for bound in BUCKETS_MS] + ['+Inf']
+        return {'buckets': dict(zip(bounds, self.counts)), 'sum_ms': round(self.sum, 3)}
+
+
+class ViewMetrics:
+    __slots__ = ('requests', 'queries', 'total', 'db', 'template')
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.total = Histogram()
+        self.db = Histogram()
+        self.template = Histogram()
+
+
+class MetricsRegistry:
+    """Aggregated request metrics per view name, for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, metrics):
+        view_name = metrics.view_name or '<unresolved>'
+        with self._lock:
+            view = self._views.get(view_name)
+            if view is None:
+                view = self._views[view_name] = ViewMetrics()
+            view.requests += 1
+            view.queries += metrics.queries
+            view.total.observe(metrics.total * 1000)
+            view.db.observe(metrics.db_time * 1000)
+            view.template.observe(metrics.template_time * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view_name: {
+                    'requests': view.requests,
+                    'queries': view.queries,
+                    'total_ms': view.total.as_dict(),
+                    'db_ms': view.db.as_dict(),
+                    'template_ms': view.template.as_dict(),
+                }
+                for view_name, view in sorted(self._views.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,146 @@
+import asyncio
+from contextlib import nullcontext
+
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from catalog import metrics, replicas
+from catalog.queryinspector import QueryInspector, logger as inspector_logger
+
+
+class RequestMetricsMiddleware:
+    """Time the SQL queries and template rendering of every request.
+
+    The totals are sent back in a Server-Timing header and added to the
+    per-view histograms of catalog.metrics.REGISTRY. Place it first in
+    MIDDLEWARE so that session and authentication queries are counted too.
+
+    With CATALOG_QUERY_INSPECTOR set, the statements of every request are
+    also grouped by shape to find N+1 and slow queries (development and
+    staging only; see catalog.queryinspector).
+
+    It works both ways round, so that async views served under ASGI are
+    not pushed onto a thread by this middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function, as Django's MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        self.inspector = None
+        if getattr(settings, 'CATALOG_QUERY_INSPECTOR', False):
+            self.inspector = QueryInspector.from_settings()
+        self.report_path = getattr(settings, 'CATALOG_QUERY_REPORT', None)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        request_metrics, token = metrics.start_request()
+        try:
+            with self._inspect() as inspected:
+                response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self._finish(request, response, request_metrics, inspected)
+
+    async def __acall__(self, request):
+        request_metrics, token = metrics.start_request()
+        try:
+            with self._inspect() as inspected:
+                response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self._finish(request, response, request_metrics, inspected)
+
+    def _inspect(self):
+        return self.inspector.inspect() if self.inspector is not None else nullcontext()
+
+    def _finish(self, request, response, request_metrics, inspected):
+        request_metrics.finish()
+        if request.resolver_match is not None:
+            request_metrics.view_name = request.resolver_match.view_name
+        response['Server-Timing'] = request_metrics.server_timing()
+        metrics.REGISTRY.record(request_metrics)
+
+        if inspected is not None:
+            for finding in self.inspector.record(request_metrics.view_name or '<unresolved>', inspected):
+                inspector_logger.warning(finding)
+            if self.report_path:
+                self.inspector.write_report(self.report_path)
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """Let catalog.replicas.ReplicaRouter send the request's catalog reads to the read replicas.
+
+    A request that writes to a catalog table gets a cookie keeping the
+    browser's next requests on the primary for CATALOG_REPLICA_STICKY_SECONDS,
+    so it reads its own writes while the replicas catch up.
+    """
+    sync_capable = True
+    async_capable = True
+
+    cookie_name = 'catalog_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        self.sticky_seconds = getattr(settings, 'CATALOG_REPLICA_STICKY_SECONDS', 10)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not replicas.get_replicas():
+            return self.get_response(request)
+        state, token = replicas.start_request(pinned=self.cookie_name in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.end_request(token)
+        return self._finish(response, state)
+
+    async def __acall__(self, request):
+        if not replicas.get_replicas():
+            return await self.get_response(request)
+        state, token = replicas.start_request(pinned=self.cookie_name in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replicas.end_request(token)
+        return self._finish(response, state)
+
+    def _finish(self, response, state):
+        if state.wrote:
+            response.set_cookie(self.cookie_name, '1', max_age=self.sticky_seconds, httponly=True, samesite='Lax')
+        return response
+
+
+class AsyncCapableWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware that also runs as async middleware.
+
+    whitenoise 5 only declares itself synchronous, so under ASGI Django
+    would run every request from it down to the view through a thread,
+    serialising the async views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        response = self.process_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
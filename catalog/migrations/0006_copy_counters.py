@@ -0,0 +1,78 @@
+# Generated by Django 3.1.12 on 2026-10-17 00:29
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+STATUS_FIELDS = {
+    'm': 'copies_maintenance',
+    'o': 'copies_on_loan',
+    'a': 'copies_available',
+    'r': 'copies_reserved',
+}
+
+
+def count_copies(apps, schema_editor):
+    """Fill in the copy counters for the copies that already exist."""
+    Book = apps.get_model('catalog', 'Book')
+    BookInstance = apps.get_model('catalog', 'BookInstance')
+    LibraryCounter = apps.get_model('catalog', 'LibraryCounter')
+
+    aggregates = {'copies_total': Count('pk')}
+    for status, field in STATUS_FIELDS.items():
+        aggregates[field] = Count('pk', filter=Q(status=status))
+
+    rows = BookInstance.objects.order_by().filter(book__isnull=False).values('book').annotate(**aggregates)
+    books = [Book(pk=row.pop('book'), **row) for row in rows]
+    Book.objects.bulk_update(books, list(aggregates), batch_size=1000)
+
+    LibraryCounter.objects.create(pk=1, **BookInstance.objects.order_by().aggregate(**aggregates))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_auto_20200121_1546'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibraryCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('copies_total', models.PositiveIntegerField(default=0, editable=False)),
+                ('copies_available', models.PositiveIntegerField(default=0, editable=False)),
+                ('copies_on_loan', models.PositiveIntegerField(default=0, editable=False)),
+                ('copies_maintenance', models.PositiveIntegerField(default=0, editable=False)),
+                ('copies_reserved', models.PositiveIntegerField(default=0, editable=False)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_available',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_maintenance',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_on_loan',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_reserved',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_copies, migrations.RunPython.noop),
+    ]
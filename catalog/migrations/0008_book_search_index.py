@@ -0,0 +1,49 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """Create and fill the full-text search index used by catalog.search."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE catalog_book ADD COLUMN search_vector tsvector')
+        schema_editor.execute(
+            """
+            UPDATE catalog_book SET search_vector =
+                setweight(to_tsvector('english', coalesce(b.title, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(b.isbn, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(a.first_name, '') || ' ' || coalesce(a.last_name, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(b.summary, '')), 'C')
+            FROM catalog_book b LEFT JOIN catalog_author a ON a.id = b.author_id
+            WHERE b.id = catalog_book.id
+            """
+        )
+        schema_editor.execute('CREATE INDEX catalog_book_search_idx ON catalog_book USING gin (search_vector)')
+    elif vendor == 'sqlite':
+        schema_editor.execute('CREATE VIRTUAL TABLE catalog_book_fts USING fts5(title, summary, isbn, author)')
+        schema_editor.execute(
+            """
+            INSERT INTO catalog_book_fts (rowid, title, summary, isbn, author)
+            SELECT b.id, b.title, b.summary, b.isbn, coalesce(a.first_name, '') || ' ' || coalesce(a.last_name, '')
+            FROM catalog_book b LEFT JOIN catalog_author a ON a.id = b.author_id
+            """
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX catalog_book_search_idx')
+        schema_editor.execute('ALTER TABLE catalog_book DROP COLUMN search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE catalog_book_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_loan_status_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.1.12 on 2026-10-17 00:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0009_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueNotice',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notice_date', models.DateField(help_text='Day of the overdue scan that produced the notice')),
+                ('loans', models.PositiveIntegerField(help_text='Number of overdue copies')),
+                ('oldest_due_back', models.DateField()),
+                ('sent_at', models.DateTimeField(blank=True, help_text='When the email went out, empty if there was no address', null=True)),
+                ('borrower', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-notice_date', 'borrower'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='overduenotice',
+            constraint=models.UniqueConstraint(fields=('borrower', 'notice_date'), name='overdue_notice_once_per_day'),
+        ),
+    ]
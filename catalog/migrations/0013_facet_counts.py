@@ -0,0 +1,66 @@
+# Generated by Django 3.1.12 on 2026-10-17 01:04
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def count_facets(apps, schema_editor):
+    """Fill in the facet counts for the books that already exist."""
+    Book = apps.get_model('catalog', 'Book')
+    FacetCount = apps.get_model('catalog', 'FacetCount')
+    BookGenre = Book.genre.through
+
+    rows = [
+        *(FacetCount(genre_id=row['genre'], books=row['books'])
+          for row in BookGenre.objects.order_by().values('genre').annotate(books=Count('book'))),
+        *(FacetCount(language_id=row['language'], books=row['books'])
+          for row in Book.objects.order_by().filter(language__isnull=False).values('language').annotate(books=Count('pk'))),
+        *(FacetCount(author_id=row['author'], books=row['books'])
+          for row in Book.objects.order_by().filter(author__isnull=False).values('author').annotate(books=Count('pk'))),
+        *(FacetCount(genre_id=row['genre'], language_id=row['book__language'], books=row['books'])
+          for row in BookGenre.objects.order_by().filter(book__language__isnull=False)
+          .values('genre', 'book__language').annotate(books=Count('book'))),
+    ]
+    FacetCount.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0012_holds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('books', models.PositiveIntegerField(default=0)),
+                ('author', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='catalog.author')),
+                ('genre', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='catalog.genre')),
+                ('language', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='catalog.language')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='facetcount',
+            index=models.Index(condition=models.Q(('author__isnull', False), ('genre', None), ('language', None)), fields=['-books', 'author'], name='facet_top_authors_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='facetcount',
+            constraint=models.UniqueConstraint(condition=models.Q(('author', None), ('language', None)), fields=('genre',), name='facet_genre_once'),
+        ),
+        migrations.AddConstraint(
+            model_name='facetcount',
+            constraint=models.UniqueConstraint(condition=models.Q(('author', None), ('genre', None)), fields=('language',), name='facet_language_once'),
+        ),
+        migrations.AddConstraint(
+            model_name='facetcount',
+            constraint=models.UniqueConstraint(condition=models.Q(('genre', None), ('language', None)), fields=('author',), name='facet_author_once'),
+        ),
+        migrations.AddConstraint(
+            model_name='facetcount',
+            constraint=models.UniqueConstraint(fields=('genre', 'language'), name='facet_genre_language_once'),
+        ),
+        migrations.RunPython(count_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.1.12 on 2026-10-17 01:13
+
+import catalog.identifiers
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_bookinstance_due_back_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bookinstance',
+            name='id',
+            field=models.UUIDField(default=catalog.identifiers.new_copy_id, help_text='Unique ID for this particular book across the whole library', primary_key=True, serialize=False),
+        ),
+    ]
@@ -1,8 +1,11 @@
 from django.db import models
+from django.db.models import Q
 from django.urls import reverse # Used to generate URLs by reversing the URL patterns
-import uuid # Required for unique book instances
 from django.contrib.auth.models import User
 from datetime import date
+from django.utils import timezone
+
+from catalog.identifiers import new_copy_id, short_id
 
 
 # Create your models here.
@@ -21,7 +24,27 @@ class Language(models.Model):
         return self.name
 
 
-class Book(models.Model):
+class CopyCounts(models.Model):
+    """Abstract model holding copy counters, kept up to date by catalog.counters."""
+    copies_total = models.PositiveIntegerField(default=0, editable=False)
+    copies_available = models.PositiveIntegerField(default=0, editable=False)
+    copies_on_loan = models.PositiveIntegerField(default=0, editable=False)
+    copies_maintenance = models.PositiveIntegerField(default=0, editable=False)
+    copies_reserved = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+
+class LibraryCounter(CopyCounts):
+    """Model holding the library-wide copy counters (a single row)."""
+    SINGLETON_ID = 1
+
+    def __str__(self):
+        return f'{self.copies_available} of {self.copies_total} copies available'
+
+
+class Book(CopyCounts):
     """Model representing a book (but not a specific copy of a book)."""
     title = models.CharField(max_length=200)
 
@@ -38,12 +61,36 @@ class Book(models.Model):
 
     language = models.ForeignKey('Language', on_delete=models.SET_NULL, null=True)
 
+    # Time the book or anything shown with it (copies, genres, language) last changed, see catalog.conditional
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
     def display_genre(self):
         """Create a string for the Genre. This is required to display genre in admin."""
         return ', '.join(genre.name for genre in self.genre.all()[:3])
     
     display_genre.short_description = 'Genre'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the related rows as loaded, so signal handlers can tell what a save changed.
+        instance._loaded_relations = {
+            name: value for name, value in zip(field_names, values) if name in ('author_id', 'language_id')
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        # The copy counters are only adjusted with F() updates (see catalog.counters); writing back the
+        # values loaded with the instance would undo the loans, returns and holds since.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            from catalog.counters import COUNTER_FIELDS
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_relations = {'author_id': self.author_id, 'language_id': self.language_id}
+
     def __str__(self):
         """String representing the Model object."""
         return self.title
@@ -52,13 +99,54 @@ class Book(models.Model):
         """Returns the url to access a detail record for this book."""
         return reverse('book-detail', args=[str(self.id)])
 
+class FacetCount(models.Model):
+    """Model holding the number of books in one facet of the catalog, kept up to date by catalog.facets.
+
+    A row counts the books of a genre, a language or an author (the other
+    two fields empty), or of a genre in a language (the author empty).
+    """
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE, null=True)
+    language = models.ForeignKey(Language, on_delete=models.CASCADE, null=True)
+    author = models.ForeignKey('Author', on_delete=models.CASCADE, null=True)
+    books = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['genre'], condition=Q(language=None, author=None), name='facet_genre_once'),
+            models.UniqueConstraint(fields=['language'], condition=Q(genre=None, author=None), name='facet_language_once'),
+            models.UniqueConstraint(fields=['author'], condition=Q(genre=None, language=None), name='facet_author_once'),
+            models.UniqueConstraint(fields=['genre', 'language'], name='facet_genre_language_once'),
+        ]
+        indexes = [
+            # The authors with the most books, for the browse sidebar
+            models.Index(fields=['-books', 'author'], name='facet_top_authors_idx',
+                         condition=Q(genre=None, language=None, author__isnull=False)),
+        ]
+
+    def __str__(self):
+        facet = ', '.join(str(value) for value in (self.genre, self.language, self.author) if value is not None)
+        return f'{facet}: {self.books} books'
+
+class BookInstanceQuerySet(models.QuerySet):
+    def on_loan(self):
+        return self.filter(status__exact='o')
+
+    def overdue(self, today=None):
+        """Copies on loan that were due back before today, found with the on-loan index."""
+        return self.on_loan().filter(due_back__lt=today or date.today())
+
 class BookInstance(models.Model):
     """Model representing a specific copy of a book (i.e. that can be borrowed from the library)."""
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, help_text='Unique ID for this particular book across the whole library')
+    id = models.UUIDField(primary_key=True, default=new_copy_id, help_text='Unique ID for this particular book across the whole library')
     book = models.ForeignKey('Book', on_delete=models.CASCADE, null=True)
     imprint = models.CharField(max_length=200)
     due_back = models.DateField(null=True, blank=True)
     borrower = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Incremented by every change, for the compare-and-set updates of catalog.loans
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = BookInstanceQuerySet.as_manager()
 
     @property
     def is_overdue(self):
@@ -84,17 +172,104 @@ class BookInstance(models.Model):
     class Meta:
         ordering = ['due_back']
         permissions = (("can_mark_returned", "Set book as returned"),)
+        indexes = [
+            # Copies by status, e.g. available copies on the index page
+            models.Index(fields=['status', 'due_back'], name='bookinst_status_due_idx'),
+            # A borrower's loans ordered by due date (LoanedBooksByUserListView)
+            models.Index(fields=['borrower', 'status', 'due_back'], name='bookinst_borrower_loan_idx'),
+            # Only the copies on loan, ordered like LoanedBooksView and its cursor pages
+            models.Index(fields=['due_back', 'id'], name='bookinst_on_loan_idx', condition=Q(status='o')),
+            # All copies by due date, as listed and filtered by BookInstanceAdmin
+            models.Index(fields=['due_back', 'id'], name='bookinst_due_back_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember how the copy counters currently account for this copy (see catalog.counters).
+        if 'book_id' in field_names and 'status' in field_names:
+            instance._counted_as = (instance.book_id, instance.status)
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Ordinary saves move the version too, so that pending compare-and-set updates notice them
+        if not self._state.adding:
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+
+    @property
+    def short_id(self):
+        """The copy id as printed on barcodes and used in URLs (see catalog.identifiers)."""
+        return short_id(self.id)
 
     def __str__(self):
         """String for representing the Model object."""
         return f'{self.id} ({self.book.title})'
 
+class OverdueNotice(models.Model):
+    """Record of an overdue reminder sent to a borrower (see the notify_overdue command)."""
+    borrower = models.ForeignKey(User, on_delete=models.CASCADE)
+    notice_date = models.DateField(help_text='Day of the overdue scan that produced the notice')
+    loans = models.PositiveIntegerField(help_text='Number of overdue copies')
+    oldest_due_back = models.DateField()
+    sent_at = models.DateTimeField(null=True, blank=True, help_text='When the email went out, empty if there was no address')
+
+    class Meta:
+        ordering = ['-notice_date', 'borrower']
+        constraints = [
+            # One notice per borrower and scan, so a rerun of the scan does not email anyone twice
+            models.UniqueConstraint(fields=['borrower', 'notice_date'], name='overdue_notice_once_per_day'),
+        ]
+
+    def __str__(self):
+        return f'{self.borrower} ({self.loans} overdue on {self.notice_date})'
+
+class Hold(models.Model):
+    """Model representing a patron's place in the queue for a copy of a book (see catalog.holds)."""
+    book = models.ForeignKey('Book', on_delete=models.CASCADE)
+    patron = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Queue order: holds are served by created_at, then id
+    created_at = models.DateTimeField(default=timezone.now)
+    copy = models.ForeignKey('BookInstance', on_delete=models.SET_NULL, null=True, blank=True,
+                             help_text='The copy set aside for the patron, once the hold is ready')
+    ready_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, help_text='Pickup deadline of a ready hold')
+
+    HOLD_STATUS = (
+        ('w', 'Waiting'),
+        ('r', 'Ready for pickup'),
+        ('f', 'Fulfilled'),
+        ('c', 'Cancelled'),
+        ('e', 'Expired'),
+    )
+
+    status = models.CharField(max_length=1, choices=HOLD_STATUS, default='w')
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            # A book's queue in order: the next patrons to serve are the first rows of the range
+            models.Index(fields=['book', 'status', 'created_at', 'id'], name='hold_queue_idx'),
+            # Ready holds by pickup deadline, for expiring them
+            models.Index(fields=['expires_at'], name='hold_ready_expiry_idx', condition=Q(status='r')),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'patron'], condition=Q(status__in=['w', 'r']),
+                                    name='hold_one_active_per_patron'),
+        ]
+
+    def __str__(self):
+        return f'{self.patron} for {self.book} ({self.get_status_display()})'
+
 class Author(models.Model):
     """Model representing an author."""
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
     date_of_birth = models.DateField(null=True, blank=True)
     date_of_death = models.DateField('died', null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['last_name', 'first_name']
@@ -0,0 +1,125 @@
+"""Finding overdue loans in bulk and reminding their borrowers.
+
+Overdue copies are read with one query over the on-loan index, ordered by
+borrower and streamed with QuerySet.iterator(), so only one borrower's
+loans and one batch of notices are held in memory at a time however many
+loans are overdue.
+
+Borrowers are handled in batches: the batch's existing notices for the day
+are looked up with one query, the emails go out through a
+RateLimitedSender over a single mail connection, and the OverdueNotice
+rows are then written with one bulk insert. A batch whose emails fail is
+not recorded, so running the scan again for the same day only reminds the
+borrowers who have not been reminded yet.
+"""
+import time
+from itertools import groupby
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from catalog.models import BookInstance, OverdueNotice
+
+
+def overdue_loans_by_borrower(today, chunk_size=2000):
+    """Yield (borrower_id, [(copy_id, title, due_back), ...]) for every borrower with overdue loans."""
+    rows = (
+        BookInstance.objects.overdue(today)
+        .filter(borrower__isnull=False)
+        .order_by('borrower_id', 'due_back', 'id')
+        .values_list('borrower_id', 'id', 'book__title', 'due_back')
+        .iterator(chunk_size=chunk_size)
+    )
+    for borrower_id, loans in groupby(rows, key=lambda row: row[0]):
+        yield borrower_id, [loan[1:] for loan in loans]
+
+
+class RateLimitedSender:
+    """Send emails in batches over one connection, at most `rate` messages per second on average."""
+
+    def __init__(self, rate=10, batch_size=100, connection=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.batch_size = batch_size
+        self.connection = connection
+        self.clock = clock
+        self.sleep = sleep
+        self._next_send = None
+        self.sent = 0
+
+    def send(self, messages):
+        """Send the messages, waiting between batches as needed. Returns how many were sent."""
+        sent = 0
+        for start in range(0, len(messages), self.batch_size):
+            batch = messages[start:start + self.batch_size]
+            if self._next_send is not None and self.rate:
+                delay = self._next_send - self.clock()
+                if delay > 0:
+                    self.sleep(delay)
+            sent += self._connection().send_messages(batch) or 0
+            if self.rate:
+                self._next_send = self.clock() + len(batch) / self.rate
+        self.sent += sent
+        return sent
+
+    def _connection(self):
+        if self.connection is None:
+            self.connection = get_connection()
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+def _message(user, loans, today):
+    body = render_to_string('overdue_notice_email.txt', {'user': user, 'loans': loans, 'today': today})
+    return EmailMessage('Overdue library books', body, settings.DEFAULT_FROM_EMAIL, [user.email])
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def notify_overdue(today=None, sender=None, batch_size=500, chunk_size=2000, dry_run=False):
+    """Remind every borrower with overdue loans on `today`. Returns (borrowers, loans, notices created)."""
+    today = today or timezone.localdate()
+    sender = sender or RateLimitedSender()
+    borrowers = loans = created = 0
+    for batch in _batches(overdue_loans_by_borrower(today, chunk_size), batch_size):
+        borrowers += len(batch)
+        loans += sum(len(borrower_loans) for _borrower_id, borrower_loans in batch)
+        if dry_run:
+            continue
+
+        borrower_ids = [borrower_id for borrower_id, _loans in batch]
+        already_notified = set(
+            OverdueNotice.objects.filter(notice_date=today, borrower_id__in=borrower_ids).values_list('borrower_id', flat=True)
+        )
+        users = User.objects.only('id', 'username', 'first_name', 'email').in_bulk(borrower_ids)
+
+        notices, messages = [], []
+        for borrower_id, borrower_loans in batch:
+            if borrower_id in already_notified:
+                continue
+            user = users[borrower_id]
+            notice = OverdueNotice(borrower_id=borrower_id, notice_date=today, loans=len(borrower_loans),
+                                   oldest_due_back=borrower_loans[0][2])
+            if user.email:
+                messages.append(_message(user, borrower_loans, today))
+                notice.sent_at = timezone.now()
+            notices.append(notice)
+
+        sender.send(messages)
+        OverdueNotice.objects.bulk_create(notices, ignore_conflicts=True)
+        created += len(notices)
+    return borrowers, loans, created
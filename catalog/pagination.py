@@ -0,0 +1,236 @@
+"""Keyset (cursor) pagination for the catalog list views.
+
+Django's Paginator counts the whole result set and skips rows with OFFSET,
+so every page costs more than the one before it. A CursorPaginator instead
+remembers the ordering key of the last row it returned and asks for the
+rows after it, which an index on the ordering columns answers directly no
+matter how deep the page is. There is no total count and no page numbers,
+only opaque next/previous tokens.
+
+Views opt in with CursorPaginationMixin; the offset paginator stays the
+default and cursor mode is used when the request carries a ``cursor``
+parameter (an empty one means the first page).
+
+EstimatedCountPaginator is a page-numbered Paginator for the admin that
+takes the row count of an unfiltered, very large table from the database's
+statistics instead of a COUNT(*) over every row.
+"""
+from django.core import signing
+from django.core.paginator import Paginator
+from django.db import connections
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+from django.http import Http404
+from django.utils.translation import gettext as _
+
+CURSOR_SALT = 'catalog.pagination.cursor'
+
+
+class InvalidCursor(Exception):
+    """The cursor token is malformed, tampered with or does not fit the ordering."""
+
+
+class CursorPage:
+    """One page of results from a CursorPaginator."""
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Paginate a queryset by the values of `ordering`, which must end with a unique field.
+
+    Ordering entries are field names on the queryset's model, optionally
+    prefixed with '-' for descending order. NULLs sort after every other
+    value in ascending order (and before them in descending order) on every
+    database backend.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        opts = queryset.model._meta
+        self.fields = [opts.pk if name == 'pk' else opts.get_field(name) for name, _desc in self.ordering]
+
+    def _order_by(self, reverse=False):
+        expressions = []
+        for (name, descending), field in zip(self.ordering, self.fields):
+            descending = descending != reverse
+            if not field.null:
+                expressions.append(F(name).desc() if descending else F(name).asc())
+            elif descending:
+                expressions.append(F(name).desc(nulls_first=True))
+            else:
+                expressions.append(F(name).asc(nulls_last=True))
+        return expressions
+
+    def _after(self, values, reverse=False):
+        """Q object matching the rows that sort after `values` (before them when reverse)."""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), field, value in zip(self.ordering, self.fields, values):
+            descending = descending != reverse
+            if value is None:
+                # NULL sorts last ascending and first descending
+                later = Q(**{f'{name}__isnull': False}) if descending else Q(pk__in=[])
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                later = Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+                if field.null and not descending:
+                    later |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            condition |= equal & later
+            equal &= same
+        return condition
+
+    def _key(self, obj):
+        return [getattr(obj, field.attname) for field in self.fields]
+
+    def encode_cursor(self, obj, backwards=False):
+        values = [None if value is None else str(value) for value in self._key(obj)]
+        return signing.dumps({'b': backwards, 'v': values}, salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = signing.loads(cursor, salt=CURSOR_SALT)
+            values = payload['v']
+            backwards = bool(payload['b'])
+        except (signing.BadSignature, KeyError, TypeError):
+            raise InvalidCursor(_('Invalid cursor'))
+        if len(values) != len(self.fields):
+            raise InvalidCursor(_('Invalid cursor'))
+        try:
+            values = [None if value is None else field.to_python(value) for field, value in zip(self.fields, values)]
+        except (ValidationError, ValueError):
+            raise InvalidCursor(_('Invalid cursor'))
+        return values, backwards
+
+    def page(self, cursor=None):
+        """Return the page that `cursor` points at, or the first page if it is empty."""
+        if not cursor:
+            rows = list(self.queryset.order_by(*self._order_by())[:self.per_page + 1])
+            return self._forward_page(rows, first=True)
+
+        values, backwards = self.decode_cursor(cursor)
+        if backwards:
+            queryset = self.queryset.filter(self._after(values, reverse=True)).order_by(*self._order_by(reverse=True))
+            rows = list(queryset[:self.per_page + 1])
+            return self._backward_page(rows)
+
+        queryset = self.queryset.filter(self._after(values)).order_by(*self._order_by())
+        rows = list(queryset[:self.per_page + 1])
+        return self._forward_page(rows, first=False)
+
+    def _forward_page(self, rows, first):
+        object_list = rows[:self.per_page]
+        next_cursor = previous_cursor = None
+        if len(rows) > self.per_page:
+            next_cursor = self.encode_cursor(object_list[-1])
+        if object_list and not first:
+            previous_cursor = self.encode_cursor(object_list[0], backwards=True)
+        return CursorPage(object_list, self, next_cursor, previous_cursor)
+
+    def _backward_page(self, rows):
+        object_list = rows[:self.per_page][::-1]
+        next_cursor = previous_cursor = None
+        if object_list:
+            next_cursor = self.encode_cursor(object_list[-1])
+        if len(rows) > self.per_page:
+            previous_cursor = self.encode_cursor(object_list[0], backwards=True)
+        return CursorPage(object_list, self, next_cursor, previous_cursor)
+
+
+class CursorPaginationMixin:
+    """ListView mixin adding an opt-in cursor pagination mode keyed on `cursor_ordering`."""
+    cursor_ordering = None
+    cursor_query_param = 'cursor'
+
+    def uses_cursor_pagination(self):
+        return self.cursor_query_param in self.request.GET
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.uses_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering)
+        try:
+            page = paginator.page(self.request.GET[self.cursor_query_param])
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_pagination'] = self.uses_cursor_pagination()
+        return context
+
+
+def estimated_count(model, using='default'):
+    """The planner's estimate of the number of rows of a model's table, or None if there is none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # -1 (or 0 before PostgreSQL 14) until the table has been analyzed
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)', [connection.ops.quote_name(table)])
+        elif connection.vendor == 'sqlite':
+            # sqlite_stat1 only exists once ANALYZE has run. The first number of a row is the number of rows
+            # in the index, which is smaller than the table's for a partial index, so take the largest.
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(
+                "SELECT MAX(CAST(substr(stat, 1, instr(stat || ' ', ' ') - 1) AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s",
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    estimate = int(float(str(row[0]).split()[0]))
+    return estimate if estimate > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator using estimated_count() for unfiltered querysets of more than `estimate_above` rows.
+
+    Filtered querysets are still counted exactly; their filters are expected to
+    be answered by an index.
+    """
+    estimate_above = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where and not queryset.query.distinct:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.estimate_above:
+                return estimate
+        return super().count
@@ -0,0 +1,184 @@
+"""Database connection pooling and health checks, which Django 3.1 does not have.
+
+Django opens a connection per thread and closes it at the end of the
+request (or keeps it for CONN_MAX_AGE seconds, for that thread only). The
+catalog.backends engines instead hand a closed connection to the
+ConnectionPool of its database, and take their next connection from it,
+so every thread of the process reuses the same few connections:
+
+    DATABASES['default']['ENGINE'] = 'catalog.backends.postgresql'  # or catalog.backends.sqlite3
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['POOL'] = {'MAX_IDLE': 5, 'MAX_IDLE_SECONDS': 300}
+
+A pooled connection that has been idle longer than MAX_IDLE_SECONDS is
+closed, and one that fails a ``SELECT 1`` on checkout is replaced, so a
+database restart does not surface as errors.
+
+The same engines check connections kept by CONN_MAX_AGE when the database
+has CONN_HEALTH_CHECKS (the setting Django 4.1 adds), the way Django 4.1
+does: check_connections() marks every connection unchecked when a request
+starts, and a connection is checked, and reopened if it is not usable any
+more, the first time the request uses it. Requests that do not touch a
+database (static files, cached pages) cost no check, and a connection is
+checked at most once per request. Without POOL, the engines do not pool:
+
+    DATABASES['default']['ENGINE'] = 'catalog.backends.postgresql'
+    DATABASES['default']['CONN_MAX_AGE'] = 500
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+"""
+import threading
+import time
+
+from django.db import connections
+
+DEFAULT_MAX_IDLE = 5
+DEFAULT_MAX_IDLE_SECONDS = 300
+
+
+class ConnectionPool:
+    """Idle DB-API connections of one database, shared by the threads of the process."""
+
+    def __init__(self, max_idle=DEFAULT_MAX_IDLE, max_idle_seconds=DEFAULT_MAX_IDLE_SECONDS, health_check=True,
+                 clock=time.monotonic):
+        self.max_idle = max_idle
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check = health_check
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._idle = []
+        self.reused = 0
+        self.discarded = 0
+
+    def checkout(self):
+        """A usable idle connection, or None when a new one has to be opened."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                # The most recently used connection is the least likely to have been dropped
+                raw, returned_at = self._idle.pop()
+            if self.clock() - returned_at > self.max_idle_seconds or (self.health_check and not self.usable(raw)):
+                self.discard(raw)
+                continue
+            self.reused += 1
+            return raw
+
+    def checkin(self, raw):
+        """Keep a connection for reuse. False if it has to be closed instead."""
+        try:
+            # Never hand over an open transaction
+            raw.rollback()
+        except Exception:
+            return False
+        with self._lock:
+            if len(self._idle) >= self.max_idle:
+                return False
+            self._idle.append((raw, self.clock()))
+        return True
+
+    def discard(self, raw):
+        self.discarded += 1
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for raw, _returned_at in idle:
+            self.discard(raw)
+
+    def __len__(self):
+        return len(self._idle)
+
+    @staticmethod
+    def usable(raw):
+        try:
+            cursor = raw.cursor()
+            try:
+                cursor.execute('SELECT 1')
+            finally:
+                cursor.close()
+        except Exception:
+            return False
+        return True
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+    """The pool of a database alias, created from the POOL entry of its settings."""
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                options = settings_dict.get('POOL', {})
+                pool = _pools[alias] = ConnectionPool(
+                    max_idle=options.get('MAX_IDLE', DEFAULT_MAX_IDLE),
+                    max_idle_seconds=options.get('MAX_IDLE_SECONDS', DEFAULT_MAX_IDLE_SECONDS),
+                    health_check=options.get('HEALTH_CHECK', True),
+                )
+    return pool
+
+
+class PooledDatabaseWrapperMixin:
+    """DatabaseWrapper mixin taking connections from the database's ConnectionPool and returning them to it.
+
+    Only databases with a POOL entry are pooled.
+    """
+
+    @property
+    def pool(self):
+        if 'POOL' not in self.settings_dict:
+            return None
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        raw = pool.checkout() if pool is not None else None
+        if raw is None:
+            raw = super().get_new_connection(conn_params)
+        return raw
+
+    def _close(self):
+        pool = self.pool
+        if pool is not None and self.connection is not None and pool.checkin(self.connection):
+            return
+        return super()._close()
+
+
+class HealthCheckedDatabaseWrapperMixin:
+    """DatabaseWrapper mixin checking a persistent connection on its first use in a request (CONN_HEALTH_CHECKS)."""
+    # Set to False by check_connections() when a request starts
+    health_check_done = True
+
+    def connect(self):
+        super().connect()
+        # A new connection needs no check
+        self.health_check_done = True
+
+    def ensure_connection(self):
+        if not self.health_check_done:
+            self.health_check_done = True
+            self.close_if_unusable()
+        super().ensure_connection()
+
+    def close_if_unusable(self):
+        if self.settings_dict.get('CONN_HEALTH_CHECKS') and self.connection is not None and not self.in_atomic_block:
+            if not self.is_usable():
+                self.close()
+
+
+def check_connections(**kwargs):
+    """request_started receiver having each connection checked on its first use in the request."""
+    mark_unchecked(connections)
+
+
+def mark_unchecked(handler):
+    for connection in handler.all():
+        if connection.settings_dict.get('CONN_HEALTH_CHECKS'):
+            connection.health_check_done = False
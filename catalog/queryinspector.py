@@ -0,0 +1,196 @@
+"""Development and staging inspector of the SQL each view issues.
+
+Statements are grouped by shape: the SQL with its literals, placeholders
+and IN lists normalized, so that ``WHERE id = 1`` and ``WHERE id = 2`` are
+the same shape. A shape repeated CATALOG_QUERY_REPEAT_THRESHOLD times or
+more within one request is flagged as a probable N+1, and a statement
+slower than CATALOG_SLOW_QUERY_MS as slow; each finding names the template
+that was being rendered when the statement ran, if any.
+
+Statements are captured by an execute wrapper installed on every database
+connection when it is opened, for the requests being inspected (found
+through a context variable, so the worker threads of async views count).
+
+RequestMetricsMiddleware runs the inspector on every request when
+CATALOG_QUERY_INSPECTOR is set, logs findings to the 'catalog.queryinspector'
+logger and rewrites the ranked report at CATALOG_QUERY_REPORT. Tests use
+QueryInspector.inspect() directly, see catalog/tests/test_query_inspector.py.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from catalog.metrics import current_template
+
+logger = logging.getLogger(__name__)
+
+_inspected = ContextVar('catalog_inspected_request', default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """The shape of `sql`: literals and placeholders become ?, IN lists IN (...) and whitespace one space."""
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _IN_LIST.sub('IN (...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class InspectedRequest:
+    """The statements captured during one request, as (shape, milliseconds, template) tuples."""
+
+    def __init__(self):
+        self.statements = []
+
+    def repeated(self, threshold):
+        """{shape: count} of the shapes issued `threshold` times or more."""
+        counts = Counter(shape for shape, _ms, _template in self.statements)
+        return {shape: count for shape, count in counts.items() if count >= threshold}
+
+    def slow(self, slow_ms):
+        """The (shape, milliseconds, template) statements that took `slow_ms` or longer."""
+        return [statement for statement in self.statements if statement[1] >= slow_ms]
+
+    def templates(self, shape):
+        return sorted({template for statement_shape, _ms, template in self.statements
+                       if statement_shape == shape and template})
+
+
+def inspect_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query to the request being inspected, if any."""
+    inspected = _inspected.get()
+    if inspected is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        # list.append is atomic, so the worker threads of async views need no lock
+        inspected.statements.append((normalize(sql), (time.perf_counter() - started) * 1000, current_template()))
+
+
+def install_query_inspector(sender, connection, **kwargs):
+    """connection_created receiver adding inspect_query to every new database connection."""
+    if inspect_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(inspect_query)
+
+
+class ShapeStats:
+    __slots__ = ('count', 'total_ms', 'max_ms', 'requests', 'max_per_request', 'repeated', 'slow', 'templates')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.requests = 0
+        self.max_per_request = 0
+        self.repeated = 0
+        self.slow = 0
+        self.templates = set()
+
+
+class QueryInspector:
+    """Aggregates the statement shapes of inspected requests per view."""
+
+    def __init__(self, repeat_threshold=3, slow_ms=100):
+        self.repeat_threshold = repeat_threshold
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._shapes = {}
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            repeat_threshold=getattr(settings, 'CATALOG_QUERY_REPEAT_THRESHOLD', 3),
+            slow_ms=getattr(settings, 'CATALOG_SLOW_QUERY_MS', 100),
+        )
+
+    @contextmanager
+    def inspect(self):
+        """Capture the statements run inside the block."""
+        request = InspectedRequest()
+        token = _inspected.set(request)
+        try:
+            yield request
+        finally:
+            _inspected.reset(token)
+
+    def record(self, view_name, request):
+        """Add an inspected request to the totals of `view_name`. Returns its findings as messages."""
+        repeated = request.repeated(self.repeat_threshold)
+        slow = request.slow(self.slow_ms)
+        per_request = Counter()
+        with self._lock:
+            for shape, milliseconds, template in request.statements:
+                stats = self._shapes.get((view_name, shape))
+                if stats is None:
+                    stats = self._shapes[(view_name, shape)] = ShapeStats()
+                stats.count += 1
+                stats.total_ms += milliseconds
+                stats.max_ms = max(stats.max_ms, milliseconds)
+                stats.slow += milliseconds >= self.slow_ms
+                if template:
+                    stats.templates.add(template)
+                per_request[shape] += 1
+            for shape, count in per_request.items():
+                stats = self._shapes[(view_name, shape)]
+                stats.requests += 1
+                stats.max_per_request = max(stats.max_per_request, count)
+                stats.repeated += shape in repeated
+
+        findings = []
+        for shape, count in repeated.items():
+            templates = ', '.join(request.templates(shape)) or 'no template'
+            findings.append(f'{view_name}: probable N+1, {count} x {shape} (in {templates})')
+        for shape, milliseconds, template in slow:
+            findings.append(f'{view_name}: slow query, {milliseconds:.1f} ms {shape} (in {template or "no template"})')
+        return findings
+
+    def report(self):
+        """Shapes of every view as dicts, the most expensive (by total time) first."""
+        with self._lock:
+            rows = [
+                {
+                    'view': view_name,
+                    'shape': shape,
+                    'count': stats.count,
+                    'requests': stats.requests,
+                    'max_per_request': stats.max_per_request,
+                    'total_ms': round(stats.total_ms, 3),
+                    'max_ms': round(stats.max_ms, 3),
+                    'n_plus_one': stats.repeated,
+                    'slow': stats.slow,
+                    'templates': sorted(stats.templates),
+                }
+                for (view_name, shape), stats in self._shapes.items()
+            ]
+        rows.sort(key=lambda row: (-row['total_ms'], row['view'], row['shape']))
+        return rows
+
+    def write_report(self, path):
+        with open(path, 'w') as f:
+            f.write(f'{"rank":>4} {"total ms":>10} {"max ms":>8} {"count":>6} {"requests":>8} '
+                    f'{"max/req":>7}  flags         view\n')
+            for rank, row in enumerate(self.report(), start=1):
+                flags = ' '.join(flag for flag, present in (('N+1', row['n_plus_one']), ('SLOW', row['slow'])) if present)
+                f.write(f'{rank:>4} {row["total_ms"]:>10.1f} {row["max_ms"]:>8.1f} {row["count"]:>6} {row["requests"]:>8} '
+                        f'{row["max_per_request"]:>7}  {flags:<12}  {row["view"]}\n')
+                f.write(f'     {row["shape"]}\n')
+                if row['templates']:
+                    f.write(f'     templates: {", ".join(row["templates"])}\n')
+
+    def reset(self):
+        with self._lock:
+            self._shapes = {}
@@ -0,0 +1,144 @@
+"""Routing catalog reads to read replicas, with read-your-writes.
+
+The replicas are the CATALOG_REPLICAS aliases of DATABASES (set from the
+DATABASE_REPLICA_URLS environment variable). ReplicaRouter sends reads of
+catalog models made while serving a request to them in turn; everything
+else (writes, reads of other apps such as sessions and users, reads
+outside requests, e.g. in management commands) uses the primary.
+
+A replica lags behind the primary, so once a request writes to a catalog
+table, its later reads go to the primary too, and
+ReplicaStickinessMiddleware sets a cookie that keeps the browser's
+requests on the primary for CATALOG_REPLICA_STICKY_SECONDS, long enough
+for the page shown after a loan change to include it. Reads inside a
+transaction also stay on the primary.
+
+A replica that cannot be connected to is skipped for
+CATALOG_REPLICA_RETRY_SECONDS; with every replica down, reads go to the
+primary.
+"""
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections as default_connections
+
+logger = logging.getLogger(__name__)
+
+_state = ContextVar('catalog_replica_state', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'CATALOG_REPLICAS', [])
+
+
+class ReplicaState:
+    """Whether the current request must read from the primary."""
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        # Pinned by the cookie of an earlier request that wrote
+        self.pinned = pinned
+        # Wrote to a catalog table itself
+        self.wrote = False
+
+    @property
+    def reads_primary(self):
+        return self.pinned or self.wrote
+
+
+def start_request(pinned=False):
+    """Allow replica reads for the current request. Returns its state and the token for end_request()."""
+    state = ReplicaState(pinned)
+    return state, _state.set(state)
+
+
+def end_request(token):
+    _state.reset(token)
+
+
+class ReplicaHealth:
+    """Replicas that failed to connect, skipped until `retry_after` seconds have passed."""
+
+    def __init__(self, retry_after=30, clock=time.monotonic):
+        self.retry_after = retry_after
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._down_until = {}
+
+    def is_up(self, alias):
+        until = self._down_until.get(alias)
+        return until is None or self.clock() >= until
+
+    def mark_down(self, alias):
+        with self._lock:
+            self._down_until[alias] = self.clock() + self.retry_after
+
+    def mark_up(self, alias):
+        with self._lock:
+            self._down_until.pop(alias, None)
+
+
+HEALTH = ReplicaHealth(getattr(settings, 'CATALOG_REPLICA_RETRY_SECONDS', 30))
+
+
+class ReplicaRouter:
+    """Database router sending the catalog reads of requests to healthy replicas, round robin."""
+
+    def __init__(self, replicas=None, connections=None, health=None):
+        self._replicas = replicas
+        self.connections = connections or default_connections
+        self.health = health or HEALTH
+        self._next = itertools.count()
+
+    @property
+    def replicas(self):
+        return get_replicas() if self._replicas is None else self._replicas
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'catalog':
+            return None
+        state = _state.get()
+        if state is None or state.reads_primary:
+            return None
+        replicas = self.replicas
+        if not replicas or self.connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return self._pick(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label == 'catalog':
+            state.wrote = True
+        # Also for objects read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *self.replicas}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def _pick(self, replicas):
+        start = next(self._next)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if self.health.is_up(alias) and self._connected(alias):
+                return alias
+        return None
+
+    def _connected(self, alias):
+        """Connect to a replica if this thread has no connection to it yet. False if that fails."""
+        connection = self.connections[alias]
+        if connection.connection is not None:
+            return True
+        try:
+            connection.ensure_connection()
+        except DatabaseError as e:
+            logger.warning('Replica %s is unavailable, reading from the primary instead: %s', alias, e)
+            self.health.mark_down(alias)
+            return False
+        return True
@@ -0,0 +1,187 @@
+"""Full-text search over book titles, summaries, ISBNs and author names.
+
+The search index is maintained by the database itself:
+
+* on PostgreSQL, a ``search_vector`` tsvector column on ``catalog_book``
+  with a GIN index;
+* on SQLite, an FTS5 virtual table ``catalog_book_fts`` keyed by book id.
+
+Both are created by migration 0008 and updated incrementally when a Book
+or Author is saved or deleted (see catalog.signals). Other backends fall
+back to ``icontains`` filters. ``rebuild()`` (the ``rebuild_search_index``
+management command) re-indexes every book, e.g. after bulk loads that
+bypass model signals.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from catalog.models import Author, Book
+
+SEARCH_RESULT_LIMIT = 100
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'catalog_book_fts'
+
+# Books are re-indexed in chunks to stay below the SQLite bound-variable limit
+INDEX_CHUNK_SIZE = 500
+
+
+def _tables():
+    quote = connection.ops.quote_name
+    return {
+        'book': quote(Book._meta.db_table),
+        'author': quote(Author._meta.db_table),
+        'fts': quote(FTS_TABLE),
+    }
+
+
+def _chunks(ids, size=INDEX_CHUNK_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def search_terms(query):
+    """Split a free-text query into the words that are searched for."""
+    return re.findall(r'\w+', query)
+
+
+def prefix_tsquery(terms):
+    """A PostgreSQL to_tsquery() text matching every term as a prefix, like the FTS5 query on SQLite."""
+    # The tsquery parser splits words on underscores, so each part becomes its own prefix
+    return ' & '.join(f'{part}:*' for term in terms for part in term.split('_') if part)
+
+
+def index_books(book_ids):
+    """(Re-)index the given books, including the name of their author."""
+    if connection.vendor == 'postgresql':
+        _index_books_postgresql(book_ids)
+    elif connection.vendor == 'sqlite':
+        _index_books_sqlite(book_ids)
+
+
+def remove_books(book_ids):
+    """Remove deleted books from the search index."""
+    if connection.vendor != 'sqlite':
+        # The search vector is stored on the book row itself
+        return
+    with connection.cursor() as cursor:
+        for chunk in _chunks(book_ids):
+            cursor.execute(f'DELETE FROM {_tables()["fts"]} WHERE rowid IN ({_placeholders(chunk)})', chunk)
+
+
+def _index_books_postgresql(book_ids):
+    tables = _tables()
+    with connection.cursor() as cursor:
+        for chunk in _chunks(book_ids):
+            cursor.execute(
+                f"""
+                UPDATE {tables['book']} SET search_vector =
+                    setweight(to_tsvector(%s, coalesce(b.title, '')), 'A') ||
+                    setweight(to_tsvector(%s, coalesce(b.isbn, '')), 'A') ||
+                    setweight(to_tsvector(%s, coalesce(a.first_name, '') || ' ' || coalesce(a.last_name, '')), 'B') ||
+                    setweight(to_tsvector(%s, coalesce(b.summary, '')), 'C')
+                FROM {tables['book']} b LEFT JOIN {tables['author']} a ON a.id = b.author_id
+                WHERE b.id = {tables['book']}.id AND b.id IN ({_placeholders(chunk)})
+                """,
+                [SEARCH_CONFIG] * 4 + chunk,
+            )
+
+
+def _index_books_sqlite(book_ids):
+    tables = _tables()
+    with connection.cursor() as cursor:
+        for chunk in _chunks(book_ids):
+            cursor.execute(f'DELETE FROM {tables["fts"]} WHERE rowid IN ({_placeholders(chunk)})', chunk)
+            cursor.execute(
+                f"""
+                INSERT INTO {tables['fts']} (rowid, title, summary, isbn, author)
+                SELECT b.id, b.title, b.summary, b.isbn, coalesce(a.first_name, '') || ' ' || coalesce(a.last_name, '')
+                FROM {tables['book']} b LEFT JOIN {tables['author']} a ON a.id = b.author_id
+                WHERE b.id IN ({_placeholders(chunk)})
+                """,
+                chunk,
+            )
+
+
+def rebuild(batch_size=INDEX_CHUNK_SIZE):
+    """Re-index every book. Returns the number of books indexed."""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {_tables()["fts"]}')
+
+    count = 0
+    book_ids = []
+    for book_id in Book.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size):
+        book_ids.append(book_id)
+        if len(book_ids) >= batch_size:
+            index_books(book_ids)
+            count += len(book_ids)
+            book_ids = []
+    index_books(book_ids)
+    return count + len(book_ids)
+
+
+def search_book_ids(query, limit=SEARCH_RESULT_LIMIT):
+    """Return the ids of the books best matching `query`, best match first."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    if connection.vendor == 'postgresql':
+        sql = f"""
+            SELECT id FROM {_tables()['book']}, to_tsquery(%s, %s) query
+            WHERE search_vector @@ query
+            ORDER BY ts_rank(search_vector, query) DESC, id
+            LIMIT %s
+        """
+        # Every term must match, as a prefix; the terms are words only, so no tsquery operators get through
+        params = [SEARCH_CONFIG, prefix_tsquery(terms), limit]
+    elif connection.vendor == 'sqlite':
+        # Every term must match, as a prefix; quoting keeps FTS5 operators in the input inert
+        match = ' '.join(f'"{term}"*' for term in terms)
+        sql = f"""
+            SELECT rowid FROM {_tables()['fts']}
+            WHERE {_tables()['fts']} MATCH %s
+            ORDER BY bm25({_tables()['fts']}, 10.0, 1.0, 10.0, 5.0), rowid
+            LIMIT %s
+        """
+        params = [match, limit]
+    else:
+        queryset = Book.objects.all()
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(summary__icontains=term) | Q(isbn__icontains=term)
+                | Q(author__first_name__icontains=term) | Q(author__last_name__icontains=term)
+            )
+        return list(queryset.order_by('title', 'pk').values_list('pk', flat=True)[:limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def book_saved(sender, instance, **kwargs):
+    index_books([instance.pk])
+
+
+def book_deleted(sender, instance, **kwargs):
+    remove_books([instance.pk])
+
+
+def author_saved(sender, instance, **kwargs):
+    index_books(instance.book_set.values_list('pk', flat=True))
+
+
+def author_pre_delete(sender, instance, **kwargs):
+    # Deleting the author nulls Book.author without saving the books, so remember which to re-index.
+    instance._search_book_ids = list(instance.book_set.values_list('pk', flat=True))
+
+
+def author_deleted(sender, instance, **kwargs):
+    index_books(getattr(instance, '_search_book_ids', []))
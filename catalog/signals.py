@@ -0,0 +1,83 @@
+from django.contrib.auth.models import Group, Permission, User
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+
+from catalog import authcache, conditional, counters, facets, holds, loans, metrics, pool, queryinspector, search, stats, versions
+from catalog.models import Author, Book, BookInstance, Genre, Language
+
+
+def connect_signals():
+    """Wire up the cache invalidation, counter, facet and search index handlers. Called from CatalogConfig.ready()."""
+    # Query timing of the request metrics and the query inspector, on every database connection opened
+    connection_created.connect(metrics.install_query_timer, dispatch_uid='metrics-query-timer')
+    connection_created.connect(queryinspector.install_query_inspector, dispatch_uid='query-inspector')
+    # Health checks of the persistent connections of databases with CONN_HEALTH_CHECKS
+    request_started.connect(pool.check_connections, dispatch_uid='connection-health-checks')
+
+    for model in (Book, BookInstance, Author, Genre):
+        post_save.connect(stats.invalidate_index_counts, sender=model, dispatch_uid=f'index-counts-save-{model.__name__}')
+        post_delete.connect(stats.invalidate_index_counts, sender=model, dispatch_uid=f'index-counts-delete-{model.__name__}')
+
+    # Changing the genres of a book can change the number of fiction books.
+    m2m_changed.connect(stats.invalidate_index_counts, sender=Book.genre.through, dispatch_uid='index-counts-book-genre')
+
+    # Move changed objects to a new version so that their cached page fragments are re-rendered.
+    # The copy handlers run before the counter handlers below, which forget the copy's previous book.
+    for name, signal in (('save', post_save), ('delete', post_delete)):
+        signal.connect(versions.book_changed, sender=Book, dispatch_uid=f'versions-book-{name}')
+        signal.connect(versions.copy_changed, sender=BookInstance, dispatch_uid=f'versions-copy-{name}')
+        signal.connect(versions.author_changed, sender=Author, dispatch_uid=f'versions-author-{name}')
+        signal.connect(versions.table_changed, sender=Genre, dispatch_uid=f'versions-genre-{name}')
+        signal.connect(versions.table_changed, sender=Language, dispatch_uid=f'versions-language-{name}')
+    m2m_changed.connect(versions.book_genres_changed, sender=Book.genre.through, dispatch_uid='versions-book-genre')
+    # Books and authors added or deleted, for the list pages' ETags
+    for model in (Book, Author):
+        for name, signal in (('save', post_save), ('delete', post_delete)):
+            signal.connect(versions.rows_added_or_removed, sender=model,
+                           dispatch_uid=f'versions-{model.__name__}-rows-{name}')
+
+    # Keep Book.updated_at, which the conditional GET validators use, moving with everything shown on the book's page.
+    # The copy handler also runs before the counter handlers.
+    post_save.connect(conditional.touch_books_of_copy, sender=BookInstance, dispatch_uid='updated-at-copy-save')
+    post_delete.connect(conditional.touch_books_of_copy, sender=BookInstance, dispatch_uid='updated-at-copy-delete')
+    m2m_changed.connect(conditional.touch_books_of_genres, sender=Book.genre.through, dispatch_uid='updated-at-book-genre')
+    post_save.connect(conditional.touch_books_of_genre, sender=Genre, dispatch_uid='updated-at-genre-save')
+    pre_delete.connect(conditional.touch_books_of_genre, sender=Genre, dispatch_uid='updated-at-genre-delete')
+    post_save.connect(conditional.touch_books_of_language, sender=Language, dispatch_uid='updated-at-language-save')
+    pre_delete.connect(conditional.touch_books_of_language, sender=Language, dispatch_uid='updated-at-language-delete')
+    pre_delete.connect(conditional.touch_books_of_author, sender=Author, dispatch_uid='updated-at-author-delete')
+
+    # Keep the per-book and library-wide copy counters in step with BookInstance rows.
+    pre_save.connect(counters.copy_pre_save, sender=BookInstance, dispatch_uid='copy-counters-pre-save')
+    post_save.connect(counters.copy_post_save, sender=BookInstance, dispatch_uid='copy-counters-save')
+    post_delete.connect(counters.copy_post_delete, sender=BookInstance, dispatch_uid='copy-counters-delete')
+
+    # Keep the book counts of the browse facets in step with books and their genres.
+    pre_save.connect(facets.book_pre_save, sender=Book, dispatch_uid='facets-book-pre-save')
+    post_save.connect(facets.book_saved, sender=Book, dispatch_uid='facets-book-save')
+    pre_delete.connect(facets.book_pre_delete, sender=Book, dispatch_uid='facets-book-pre-delete')
+    m2m_changed.connect(facets.book_genres_changed, sender=Book.genre.through, dispatch_uid='facets-book-genre')
+
+    # Hand copies that become available to the patrons holding their book. After the counter handlers,
+    # which must count the copy as available before the allocation counts it as reserved.
+    post_save.connect(holds.copy_saved, sender=BookInstance, dispatch_uid='holds-copy-save')
+    loans.copies_changed.connect(holds.copies_changed, sender=BookInstance, dispatch_uid='holds-copies-changed')
+
+    # Drop the cached users, permissions and groups of catalog.authcache when they change.
+    post_save.connect(authcache.user_changed, sender=User, dispatch_uid='authcache-user-save')
+    post_delete.connect(authcache.user_changed, sender=User, dispatch_uid='authcache-user-delete')
+    m2m_changed.connect(authcache.memberships_changed, sender=User.groups.through, dispatch_uid='authcache-user-groups')
+    m2m_changed.connect(authcache.memberships_changed, sender=User.user_permissions.through,
+                        dispatch_uid='authcache-user-permissions')
+    m2m_changed.connect(authcache.auth_changed, sender=Group.permissions.through, dispatch_uid='authcache-group-permissions')
+    for model in (Group, Permission):
+        post_save.connect(authcache.auth_changed, sender=model, dispatch_uid=f'authcache-save-{model.__name__}')
+        post_delete.connect(authcache.auth_changed, sender=model, dispatch_uid=f'authcache-delete-{model.__name__}')
+
+    # Keep the full-text search index up to date with book and author changes.
+    post_save.connect(search.book_saved, sender=Book, dispatch_uid='search-book-save')
+    post_delete.connect(search.book_deleted, sender=Book, dispatch_uid='search-book-delete')
+    post_save.connect(search.author_saved, sender=Author, dispatch_uid='search-author-save')
+    pre_delete.connect(search.author_pre_delete, sender=Author, dispatch_uid='search-author-pre-delete')
+    post_delete.connect(search.author_deleted, sender=Author, dispatch_uid='search-author-delete')
@@ -0,0 +1,91 @@
+"""Aggregated counters shown on the catalog home page.
+
+All of the index counters are computed together in a single SQL statement
+(one scalar subquery per counter) and the result is kept in the cache until
+a Book, BookInstance, Author or Genre row changes. Copy counts are read from
+the materialized LibraryCounter row (see catalog.counters) instead of
+counting BookInstance rows, and the fiction count from the genre facets
+(see catalog.facets) instead of joining every book to its genres.
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+from catalog.models import Author, Book, FacetCount, Genre, LibraryCounter
+
+INDEX_COUNTS_CACHE_KEY = 'catalog:index-counts'
+INDEX_COUNTS_TIMEOUT = 60 * 60
+
+
+def _count(queryset):
+    """SQL for a scalar subquery counting the rows of queryset."""
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    return f'(SELECT COUNT(*) FROM ({sql}) counted_rows)', params
+
+
+def _library_counter(field):
+    """SQL for a scalar subquery reading one field of the library-wide counters."""
+    queryset = LibraryCounter.objects.filter(pk=LibraryCounter.SINGLETON_ID).values(field)
+    sql, params = queryset.query.sql_with_params()
+    return f'COALESCE(({sql}), 0)', params
+
+
+def _index_counters():
+    """Scalar subqueries making up the index counters."""
+    return {
+        'num_books': _count(Book.objects.all()),
+        'num_instances': _library_counter('copies_total'),
+        'num_instances_available': _library_counter('copies_available'),
+        'num_authors': _count(Author.objects.all()),
+        'num_fictional_books': _fictional_books(),
+    }
+
+
+def _fictional_books():
+    """SQL for the number of books not in a Non-fiction genre.
+
+    With at most one such genre that is the number of books less the
+    genre's facet count (see catalog.facets); with several, a book can be
+    in more than one of them, so the books are counted.
+    """
+    non_fiction = Genre.objects.filter(name__contains='Non-fiction')
+    genres_sql, genres_params = _count(non_fiction)
+    books_sql, books_params = _count(Book.objects.all())
+    facet_sql, facet_params = (
+        FacetCount.objects.filter(genre__in=non_fiction, language=None, author=None).values('books').query.sql_with_params()
+    )
+    counted_sql, counted_params = _count(Book.objects.filter(~Q(genre__name__contains='Non-fiction')))
+    return (
+        f'CASE WHEN {genres_sql} <= 1 THEN {books_sql} - (SELECT COALESCE(SUM(books), 0) FROM ({facet_sql}) facet_rows) ELSE {counted_sql} END',
+        [*genres_params, *books_params, *facet_params, *counted_params],
+    )
+
+
+def compute_index_counts():
+    """Count everything shown on the index page with one database query."""
+    counters = _index_counters()
+    selects = []
+    params = []
+    for name, (sql, sql_params) in counters.items():
+        selects.append(f'{sql} AS {name}')
+        params.extend(sql_params)
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(selects), params)
+        row = cursor.fetchone()
+
+    return dict(zip(counters, row))
+
+
+def get_index_counts():
+    """Return the index counters, from the cache when they are still valid."""
+    counts = cache.get(INDEX_COUNTS_CACHE_KEY)
+    if counts is None:
+        counts = compute_index_counts()
+        cache.set(INDEX_COUNTS_CACHE_KEY, counts, INDEX_COUNTS_TIMEOUT)
+    return counts
+
+
+def invalidate_index_counts(**kwargs):
+    """Drop the cached index counters. Connected to model change signals."""
+    cache.delete(INDEX_COUNTS_CACHE_KEY)
@@ -0,0 +1,91 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance, Genre
+from catalog.pagination import EstimatedCountPaginator, estimated_count
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='deeznuts1', email='admin@example.com')
+        genres = [Genre.objects.create(name=f'Genre {number}') for number in range(3)]
+        for number in range(20):
+            author = Author.objects.create(first_name='John', last_name=f'Smith {number}')
+            book = Book.objects.create(title=f'Book {number}', summary='My book summary', isbn='ABCDEFG', author=author)
+            book.genre.set(genres)
+            BookInstance.objects.create(book=book, imprint='Imprint', status='o', borrower=cls.admin,
+                                        due_back=datetime.date.today() + datetime.timedelta(days=number))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, model, count):
+        """Query count of the changelist of model after deleting all but `count` of its rows."""
+        model.objects.exclude(pk__in=model.objects.order_by('pk').values('pk')[:count]).delete()
+        url = reverse(f'admin:catalog_{model._meta.model_name}_changelist')
+        # The session and user are cached after the first request (catalog.authcache)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, count)
+        return len(context.captured_queries)
+
+    def test_book_changelist_queries_do_not_grow_with_rows(self):
+        many = self.changelist_queries(Book, 20)
+        self.assertEqual(self.changelist_queries(Book, 2), many)
+
+    def test_copy_changelist_queries_do_not_grow_with_rows(self):
+        many = self.changelist_queries(BookInstance, 20)
+        self.assertEqual(self.changelist_queries(BookInstance, 2), many)
+
+    def test_copy_change_form_uses_raw_id_widgets(self):
+        copy = BookInstance.objects.first()
+        response = self.client.get(reverse('admin:catalog_bookinstance_change', args=[copy.pk]))
+        self.assertContains(response, 'vForeignKeyRawIdAdminField')
+        self.assertNotContains(response, 'Smith 19')
+
+
+class EstimatedCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Genre.objects.bulk_create([Genre(name=f'Genre {number}') for number in range(30)])
+
+    def test_estimate_used_for_large_unfiltered_tables(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(estimated_count(Genre), 30)
+
+        paginator = EstimatedCountPaginator(Genre.objects.order_by('pk'), 10)
+        paginator.estimate_above = 10
+        # Rows added since ANALYZE are not in the estimate
+        Genre.objects.create(name='Genre 30')
+        self.assertEqual(paginator.count, 30)
+
+        filtered = EstimatedCountPaginator(Genre.objects.filter(name__startswith='Genre 1'), 10)
+        filtered.estimate_above = 10
+        self.assertEqual(filtered.count, 11)
+
+    def test_small_tables_are_counted(self):
+        self.assertEqual(EstimatedCountPaginator(Genre.objects.all(), 10).count, 30)
+
+    def test_estimate_ignores_partial_indexes(self):
+        book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+        BookInstance.objects.bulk_create([
+            BookInstance(book=book, imprint='Imprint', status='o' if number < 3 else 'a') for number in range(20)
+        ])
+        table = BookInstance._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            # Put the row of the partial index on copies on loan first, where a LIMIT 1 would find it
+            cursor.execute('SELECT tbl, idx, stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+            rows = sorted(cursor.fetchall(), key=lambda row: row[1] != 'bookinst_on_loan_idx')
+            cursor.execute('DELETE FROM sqlite_stat1 WHERE tbl = %s', [table])
+            cursor.executemany('INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (%s, %s, %s)', rows)
+        self.assertEqual(rows[0][2].split()[0], '3')
+        self.assertEqual(estimated_count(BookInstance), 20)
@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.tests.utils import QueryBudgetMixin
+
+class ApiTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.language = Language.objects.create(name='English')
+        cls.genre = Genre.objects.create(name='Fantasy')
+        cls.books = []
+        for number in range(25):
+            author = Author.objects.create(first_name=f'John {number}', last_name=f'Smith {number:02}')
+            book = Book.objects.create(title=f'Book {number:02}', summary='My book summary', isbn='ABCDEFG',
+                                       author=author, language=cls.language)
+            book.genre.add(cls.genre)
+            BookInstance.objects.create(book=book, imprint='Unlikely Imprint, 2016', status='a')
+            cls.books.append(book)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, budget, status_code=200):
+        return self.assertPageQueryBudget(url, budget, status_code=status_code).json()
+
+    def test_list_pages_with_cursor(self):
+        url = reverse('api-list', kwargs={'resource': 'books'})
+        page = self.get(url + '?limit=10&fields=title', 1)
+        self.assertEqual(page['data'][0], {'id': self.books[0].pk, 'title': 'Book 00'})
+        self.assertIsNone(page['previous'])
+
+        titles = [book['title'] for book in page['data']]
+        while page['next']:
+            page = self.get(page['next'], 1)
+            titles += [book['title'] for book in page['data']]
+        self.assertEqual(titles, [f'Book {number:02}' for number in range(25)])
+
+    def test_sparse_fields_are_not_loaded(self):
+        url = reverse('api-list', kwargs={'resource': 'books'})
+        with self.assertMaxQueries(1) as context:
+            self.client.get(url + '?fields=isbn')
+        self.assertNotIn('summary', context.captured_queries[0]['sql'])
+
+    def test_includes_cost_one_query_each_whatever_the_page_size(self):
+        url = reverse('api-list', kwargs={'resource': 'books'}) + '?include=author,language,genre,copies'
+        for limit in (5, 25):
+            page = self.get(f'{url}&limit={limit}', 5)
+            self.assertEqual(len(page['data']), limit)
+        book = page['data'][0]
+        self.assertEqual(book['author']['last_name'], 'Smith 00')
+        self.assertEqual(book['language'], {'id': self.language.pk, 'name': 'English'})
+        self.assertEqual(book['genre'], [{'id': self.genre.pk, 'name': 'Fantasy'}])
+        self.assertEqual(book['copies'][0]['imprint'], 'Unlikely Imprint, 2016')
+
+    def test_fields_of_included_resource(self):
+        url = reverse('api-list', kwargs={'resource': 'authors'}) + '?fields=last_name&include=books&fields[books]=title&limit=1'
+        self.assertEqual(self.get(url, 2)['data'][0]['books'], [{'id': self.books[0].pk, 'title': 'Book 00'}])
+
+    def test_batch_lookup_by_ids(self):
+        ids = [self.books[3].pk, 999, self.books[1].pk]
+        url = reverse('api-list', kwargs={'resource': 'books'}) + f'?ids={",".join(map(str, ids))}&fields=title&include=author'
+        result = self.get(url, 2)
+        self.assertEqual([book['title'] for book in result['data']], ['Book 03', 'Book 01'])
+        self.assertEqual(result['missing'], [999])
+
+    def test_detail(self):
+        copy = BookInstance.objects.first()
+        url = reverse('api-detail', kwargs={'resource': 'copies', 'pk': copy.pk}) + '?include=book&fields[books]=title'
+        data = self.get(url, 2)['data']
+        self.assertEqual(data['id'], str(copy.pk))
+        self.assertEqual(data['book']['title'], copy.book.title)
+
+        self.get(reverse('api-detail', kwargs={'resource': 'copies', 'pk': 'not-a-uuid'}), 0, status_code=400)
+        self.get(reverse('api-detail', kwargs={'resource': 'books', 'pk': 999}), 1, status_code=404)
+
+    def test_errors(self):
+        list_url = reverse('api-list', kwargs={'resource': 'books'})
+        self.assertEqual(self.client.get(list_url + '?fields=nope').status_code, 400)
+        self.assertEqual(self.client.get(list_url + '?include=nope').status_code, 400)
+        self.assertEqual(self.client.get(list_url + '?limit=1000').status_code, 400)
+        self.assertEqual(self.client.get(list_url + '?cursor=bad').status_code, 400)
+        self.assertEqual(self.client.get(reverse('api-list', kwargs={'resource': 'users'})).status_code, 404)
+        self.assertEqual(self.client.post(list_url).status_code, 405)
@@ -0,0 +1,72 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.tests.utils import QueryBudgetMixin
+
+class AsyncViewsTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        language = Language.objects.create(name='English')
+        genre = Genre.objects.create(name='Fantasy')
+        for number in range(13):
+            author = Author.objects.create(first_name=f'John {number}', last_name=f'Smith {number}')
+            book = Book.objects.create(title=f'Book {number}', summary='My book summary', isbn='ABCDEFG',
+                                       author=author, language=language)
+            book.genre.add(genre)
+            BookInstance.objects.create(book=book, imprint='Unlikely Imprint, 2016', status='a')
+        cls.author = author
+        cls.book = book
+
+    def setUp(self):
+        cache.clear()
+
+    def test_index(self):
+        self.client.force_login(User.objects.create_user(username='user'))
+        response = self.client.get(reverse('async-index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'index.html')
+        self.assertEqual(response.context['num_books'], 13)
+        self.assertEqual(response.context['num_visits'], 0)
+        response = self.client.get(reverse('async-index'))
+        self.assertEqual(response.context['num_visits'], 1)
+
+    def test_book_list_pages(self):
+        # count + page
+        response = self.assertPageQueryBudget(reverse('async-books'), 2)
+        self.assertTrue(response.context['is_paginated'])
+        self.assertEqual(len(response.context['book_list']), 10)
+
+        response = self.client.get(reverse('async-books') + '?page=2')
+        self.assertEqual(len(response.context['book_list']), 3)
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 2)
+
+        self.assertEqual(self.client.get(reverse('async-books') + '?page=3').status_code, 404)
+        self.assertEqual(self.client.get(reverse('async-books') + '?page=x').status_code, 404)
+
+    def test_author_list(self):
+        response = self.assertPageQueryBudget(reverse('async-authors'), 2)
+        self.assertEqual(len(response.context['author_list']), 10)
+
+    def test_book_detail_matches_sync_view(self):
+        url = reverse('async-book-detail', kwargs={'pk': self.book.pk})
+        # book with author and language + genres + copies, read inside the cached fragment
+        response = self.assertPageQueryBudget(url, 3)
+        self.assertContains(response, 'Book 12')
+        self.assertContains(response, 'Fantasy')
+        self.assertContains(response, 'Unlikely Imprint, 2016')
+        self.assertContains(response, '1 of 1 copies available')
+        # Once the fragment is cached, only the book is loaded
+        response = self.assertPageQueryBudget(url, 1)
+        self.assertContains(response, 'Unlikely Imprint, 2016')
+
+    def test_author_detail(self):
+        response = self.assertPageQueryBudget(reverse('async-author-detail', kwargs={'pk': self.author.pk}), 2)
+        self.assertContains(response, 'Smith 12')
+        self.assertContains(response, 'Book 12')
+
+    def test_missing_objects(self):
+        self.assertEqual(self.client.get(reverse('async-book-detail', kwargs={'pk': 999})).status_code, 404)
+        self.assertEqual(self.client.get(reverse('async-author-detail', kwargs={'pk': 999})).status_code, 404)
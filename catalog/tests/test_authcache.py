@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.test import TestCase
+
+from catalog import authcache
+
+class CachedModelBackendTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='1X<ISRUkw+tuK')
+        cls.group = Group.objects.create(name='Librarian')
+        cls.permission = Permission.objects.get(codename='can_mark_returned')
+
+    def setUp(self):
+        cache.clear()
+        self.backend = authcache.CachedModelBackend()
+
+    def load(self):
+        return self.backend.get_user(self.user.pk)
+
+    def test_user_permissions_and_groups_are_cached(self):
+        with self.assertNumQueries(4):
+            # user + user permissions + group permissions + groups
+            user = self.load()
+            self.assertFalse(user.has_perm('catalog.can_mark_returned'))
+            self.assertFalse(authcache.in_group(user, 'Librarian'))
+        with self.assertNumQueries(0):
+            user = self.load()
+            self.assertFalse(user.has_perm('catalog.can_mark_returned'))
+            self.assertFalse(authcache.in_group(user, 'Librarian'))
+
+    def test_group_membership_change(self):
+        self.load()
+        self.user.groups.add(self.group)
+        self.assertTrue(authcache.in_group(self.load(), 'Librarian'))
+        self.group.user_set.remove(self.user)
+        self.assertFalse(authcache.in_group(self.load(), 'Librarian'))
+
+    def test_permission_changes(self):
+        self.user.groups.add(self.group)
+        self.assertFalse(self.load().has_perm('catalog.can_mark_returned'))
+        self.group.permissions.add(self.permission)
+        self.assertTrue(self.load().has_perm('catalog.can_mark_returned'))
+        self.group.permissions.clear()
+        self.assertFalse(self.load().has_perm('catalog.can_mark_returned'))
+
+        self.user.user_permissions.add(self.permission)
+        self.assertTrue(self.load().has_perm('catalog.can_mark_returned'))
+        self.permission.user_set.clear()
+        self.assertFalse(self.load().has_perm('catalog.can_mark_returned'))
+
+    def test_user_changes(self):
+        self.load()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        # Writes that bypass signals are not seen until the entry expires
+        self.assertIsNotNone(self.load())
+        user = User.objects.get(pk=self.user.pk)
+        user.save()
+        self.assertIsNone(self.load())
+        user.delete()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_only_enabled_with_a_shared_cache(self):
+        # The tests run with the per-process LocMemCache
+        self.assertFalse(settings.SHARED_DEFAULT_CACHE)
+        self.assertEqual(settings.AUTHENTICATION_BACKENDS, ['django.contrib.auth.backends.ModelBackend'])
+        self.assertNotEqual(settings.SESSION_ENGINE, 'django.contrib.sessions.backends.cached_db')
@@ -0,0 +1,126 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance, Genre, Language
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.genre = Genre.objects.create(name='Fantasy')
+        cls.language = Language.objects.create(name='English')
+        cls.book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG',
+                                       author=cls.author, language=cls.language)
+        cls.book.genre.add(cls.genre)
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint='Unlikely Imprint, 2016', status='a')
+
+    def setUp(self):
+        cache.clear()
+
+    def assertNotModified(self, url, response):
+        revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def assertModified(self, url, response):
+        revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 200)
+
+    def test_validators_sent_on_read_views(self):
+        for url in (reverse('books'), reverse('authors'), self.book.get_absolute_url(), self.author.get_absolute_url()):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('ETag', response)
+            self.assertNotModified(url, response)
+        self.assertIn('Last-Modified', self.client.get(self.book.get_absolute_url()))
+
+    def test_no_last_modified_on_pages_changed_by_deletions(self):
+        # Deleting or moving a book does not advance any updated_at shown on these pages
+        for url in (reverse('books'), reverse('authors'), self.author.get_absolute_url()):
+            response = self.client.get(url)
+            self.assertNotIn('Last-Modified', response)
+        response = self.client.get(self.author.get_absolute_url())
+        book = Book.objects.get(pk=self.book.pk)
+        book.author = Author.objects.create(first_name='Big', last_name='Bob')
+        book.save()
+        self.assertModified(self.author.get_absolute_url(), response)
+
+    def test_not_modified_skips_rendering(self):
+        url = self.book.get_absolute_url()
+        response = self.client.get(url)
+        # Only the validator query runs, no template is rendered
+        with self.assertNumQueries(1):
+            revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.templates, [])
+
+    def test_if_modified_since(self):
+        url = self.book.get_absolute_url()
+        response = self.client.get(url)
+        revalidated = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_copy_change_modifies_book_detail(self):
+        url = self.book.get_absolute_url()
+        response = self.client.get(url)
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        copy.status = 'o'
+        copy.save()
+        self.assertModified(url, response)
+
+    def test_genre_and_language_changes_modify_book_detail(self):
+        url = self.book.get_absolute_url()
+        response = self.client.get(url)
+        Genre.objects.get(pk=self.genre.pk).save()
+        self.assertModified(url, response)
+
+        response = self.client.get(url)
+        Language.objects.get(pk=self.language.pk).save()
+        self.assertModified(url, response)
+
+        response = self.client.get(url)
+        Book.objects.get(pk=self.book.pk).genre.clear()
+        self.assertModified(url, response)
+
+    def test_book_change_modifies_author_detail_and_book_list(self):
+        responses = {url: self.client.get(url) for url in (self.author.get_absolute_url(), reverse('books'))}
+        Book.objects.get(pk=self.book.pk).save()
+        for url, response in responses.items():
+            self.assertModified(url, response)
+
+    def test_deletion_modifies_lists(self):
+        other = Author.objects.create(first_name='Big', last_name='Bob')
+        url = reverse('authors')
+        response = self.client.get(url)
+        other.delete()
+        self.assertModified(url, response)
+
+        other = Book.objects.create(title='Other Title', summary='My book summary', isbn='ABCDEFG')
+        url = reverse('books')
+        response = self.client.get(url)
+        other.delete()
+        self.assertModified(url, response)
+
+    def test_list_validators_do_not_count_rows(self):
+        for url in (reverse('books'), reverse('authors')):
+            response = self.client.get(url)
+            with CaptureQueriesContext(connection) as context:
+                self.assertNotModified(url, response)
+            self.assertFalse([query['sql'] for query in context.captured_queries if 'COUNT(' in query['sql']])
+
+    def test_etag_differs_per_user(self):
+        url = reverse('books')
+        anonymous = self.client.get(url)
+        User.objects.create_user(username='testuser1', password='deeznuts1')
+        self.client.login(username='testuser1', password='deeznuts1')
+        self.assertModified(url, anonymous)
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        self.assertNotModified(url, response)
+
+    def test_missing_book_is_404(self):
+        response = self.client.get(reverse('book-detail', args=[self.book.pk + 100]))
+        self.assertEqual(response.status_code, 404)
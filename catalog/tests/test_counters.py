@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from catalog import counters
+from catalog.models import Book, BookInstance, LibraryCounter
+
+class CopyCountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+        cls.other_book = Book.objects.create(title='Other Title', summary='My book summary', isbn='ABCDEFG')
+
+    def assertCounters(self, obj, **expected):
+        obj.refresh_from_db()
+        actual = {field: getattr(obj, field) for field in counters.COUNTER_FIELDS}
+        expected = {field: expected.get(field, 0) for field in counters.COUNTER_FIELDS}
+        self.assertEqual(actual, expected)
+
+    def library_counter(self):
+        return LibraryCounter.objects.get(pk=LibraryCounter.SINGLETON_ID)
+
+    def test_create_counts_copy(self):
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        self.assertCounters(self.book, copies_total=1, copies_available=1)
+        self.assertCounters(self.library_counter(), copies_total=1, copies_available=1)
+
+    def test_status_change_moves_copy_between_counters(self):
+        copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        copy = BookInstance.objects.get(pk=copy.pk)
+        copy.status = 'o'
+        copy.save()
+        self.assertCounters(self.book, copies_total=1, copies_on_loan=1)
+        self.assertCounters(self.library_counter(), copies_total=1, copies_on_loan=1)
+
+    def test_status_change_on_deferred_instance(self):
+        copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='m')
+        copy = BookInstance.objects.only('pk', 'imprint').get(pk=copy.pk)
+        copy.status = 'r'
+        copy.save()
+        self.assertCounters(self.book, copies_total=1, copies_reserved=1)
+
+    def test_moving_copy_to_another_book(self):
+        copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        copy.book = self.other_book
+        copy.save()
+        self.assertCounters(self.book)
+        self.assertCounters(self.other_book, copies_total=1, copies_available=1)
+        self.assertCounters(self.library_counter(), copies_total=1, copies_available=1)
+
+    def test_delete_uncounts_copy(self):
+        copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='o')
+        BookInstance.objects.get(pk=copy.pk).delete()
+        self.assertCounters(self.book)
+        self.assertCounters(self.library_counter())
+
+    def test_saving_a_stale_book_keeps_counters(self):
+        book = Book.objects.get(pk=self.book.pk)
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        book.title = 'New Title'
+        book.save()
+        self.assertCounters(book, copies_total=1, copies_available=1)
+        self.assertEqual(book.title, 'New Title')
+
+    def test_rebuild_command_repairs_counters(self):
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='m')
+        BookInstance.objects.create(book=self.other_book, imprint='Imprint', status='o')
+        # update() bypasses the model signals, leaving the counters stale.
+        BookInstance.objects.filter(status='m').update(status='a')
+
+        call_command('rebuild_counters', stdout=StringIO())
+
+        self.assertCounters(self.book, copies_total=2, copies_available=2)
+        self.assertCounters(self.other_book, copies_total=1, copies_on_loan=1)
+        self.assertCounters(self.library_counter(), copies_total=3, copies_available=2, copies_on_loan=1)
@@ -0,0 +1,69 @@
+import csv
+import json
+from io import StringIO
+
+from django.contrib.auth.models import Permission, User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog import export
+from catalog.models import Author, Book, BookInstance, Genre, Language
+
+class CatalogExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='Frank', last_name='Herbert')
+        language = Language.objects.create(name='English')
+        science_fiction = Genre.objects.create(name='Science Fiction')
+        classic = Genre.objects.create(name='Classic')
+        for number in range(5):
+            book = Book.objects.create(title=f'Dune {number}', summary='Spice', isbn='9780441172719',
+                                       author=author, language=language)
+            book.genre.set([science_fiction, classic])
+            BookInstance.objects.create(book=book, imprint='Chilton', status='a')
+        Book.objects.create(title='Anonymous Poems', summary='Verse', isbn='1')
+
+        cls.librarian = User.objects.create_user(username='librarian', password='deeznuts1')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+
+    def test_books_are_read_in_chunks(self):
+        # 6 books in chunks of 2: three chunks of (books + genres) and a final empty chunk
+        with self.assertNumQueries(7):
+            rows = list(export.export_books(chunk_size=2))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]['genres'], ['Science Fiction', 'Classic'])
+        self.assertEqual(rows[-1]['author_last_name'], '')
+
+    def test_csv_export_command(self):
+        out = StringIO()
+        call_command('export_catalog', 'books', stdout=out)
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]['genres'], 'Science Fiction;Classic')
+        self.assertEqual(rows[0]['copies'], '1')
+
+    def test_ndjson_export_command(self):
+        out = StringIO()
+        call_command('export_catalog', 'copies', '--format', 'ndjson', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['imprint'], 'Chilton')
+
+    def test_export_view_streams(self):
+        self.client.login(username='librarian', password='deeznuts1')
+        response = self.client.get(reverse('export-catalog', kwargs={'kind': 'authors', 'fmt': 'csv'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.splitlines()[1].split(',')[1:3], ['Frank', 'Herbert'])
+
+    def test_export_view_requires_permission(self):
+        response = self.client.get(reverse('export-catalog', kwargs={'kind': 'books', 'fmt': 'csv'}))
+        self.assertEqual(response.status_code, 302)
+
+    def test_unknown_export_is_404(self):
+        self.client.login(username='librarian', password='deeznuts1')
+        response = self.client.get(reverse('export-catalog', kwargs={'kind': 'users', 'fmt': 'csv'}))
+        self.assertEqual(response.status_code, 404)
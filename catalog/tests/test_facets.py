@@ -0,0 +1,175 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog import facets
+from catalog.models import Author, Book, FacetCount, Genre, Language
+
+class FacetCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [Author.objects.create(first_name='John', last_name=f'Smith {number}') for number in range(2)]
+        cls.english, cls.french = Language.objects.create(name='English'), Language.objects.create(name='French')
+        cls.fantasy, cls.poetry = Genre.objects.create(name='Fantasy'), Genre.objects.create(name='Poetry')
+
+    def create_book(self, author=None, language=None, genres=()):
+        book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG',
+                                   author=author, language=language)
+        book.genre.set(genres)
+        return book
+
+    def counts(self):
+        """{(genre_id, language_id, author_id): books} of the rows that count any books."""
+        return {
+            (row.genre_id, row.language_id, row.author_id): row.books
+            for row in FacetCount.objects.filter(books__gt=0)
+        }
+
+    def assertMatchesRebuild(self):
+        incremental = self.counts()
+        facets.rebuild()
+        self.assertEqual(incremental, self.counts())
+
+    def test_counted_when_created(self):
+        self.create_book(self.authors[0], self.english, [self.fantasy, self.poetry])
+        self.create_book(self.authors[0], self.english, [self.fantasy])
+        self.assertEqual(self.counts(), {
+            (self.fantasy.pk, None, None): 2,
+            (self.poetry.pk, None, None): 1,
+            (None, self.english.pk, None): 2,
+            (None, None, self.authors[0].pk): 2,
+            (self.fantasy.pk, self.english.pk, None): 2,
+            (self.poetry.pk, self.english.pk, None): 1,
+        })
+        self.assertMatchesRebuild()
+
+    def test_moved_when_language_or_author_changes(self):
+        book = self.create_book(self.authors[0], self.english, [self.fantasy])
+        book = Book.objects.get(pk=book.pk)
+        book.language = self.french
+        book.author = self.authors[1]
+        book.save()
+        self.assertEqual(self.counts(), {
+            (self.fantasy.pk, None, None): 1,
+            (None, self.french.pk, None): 1,
+            (None, None, self.authors[1].pk): 1,
+            (self.fantasy.pk, self.french.pk, None): 1,
+        })
+
+        # An instance not loaded from the database, e.g. built by a form
+        Book(pk=book.pk, title='Book Title', summary='My book summary', isbn='ABCDEFG',
+             author=self.authors[1], language=None).save()
+        self.assertMatchesRebuild()
+        self.assertNotIn((None, self.french.pk, None), self.counts())
+
+    def test_genre_changes_in_both_directions(self):
+        book = self.create_book(self.authors[0], self.english, [self.fantasy])
+        other = self.create_book(None, self.french)
+
+        book.genre.remove(self.fantasy)
+        book.genre.add(self.poetry)
+        self.poetry.book_set.add(other)
+        self.assertMatchesRebuild()
+        self.assertEqual(self.counts()[(self.poetry.pk, None, None)], 2)
+
+        self.poetry.book_set.remove(book)
+        self.assertMatchesRebuild()
+        self.poetry.book_set.clear()
+        self.assertMatchesRebuild()
+        other.genre.add(self.fantasy)
+        other.genre.clear()
+        self.assertMatchesRebuild()
+        self.assertNotIn((self.poetry.pk, None, None), self.counts())
+
+    def test_uncounted_when_deleted(self):
+        book = self.create_book(self.authors[0], self.english, [self.fantasy, self.poetry])
+        self.create_book(self.authors[1], self.english, [self.fantasy])
+        book.delete()
+        self.assertEqual(self.counts(), {
+            (self.fantasy.pk, None, None): 1,
+            (None, self.english.pk, None): 1,
+            (None, None, self.authors[1].pk): 1,
+            (self.fantasy.pk, self.english.pk, None): 1,
+        })
+
+        # Deleting a language leaves its books without one, and drops its rows
+        self.english.delete()
+        self.assertMatchesRebuild()
+
+    def test_imported_books_are_counted(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(
+                'title,author_first_name,author_last_name,summary,isbn,genres,language,copies,imprint,status\n'
+                'The Hobbit,John,Tolkien,There and back again,9780261102217,Fantasy;Adventure,English,1,Allen,a\n'
+                'Dune,Frank,Herbert,Spice,9780441172719,Science Fiction,English,0,,\n'
+            )
+        self.addCleanup(os.remove, path)
+        call_command('import_catalog', path, stdout=StringIO())
+        self.assertEqual(self.counts()[(None, self.english.pk, None)], 2)
+        self.assertMatchesRebuild()
+
+    def test_rebuild_command(self):
+        self.create_book(self.authors[0], self.english, [self.fantasy])
+        FacetCount.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_facets', stdout=out)
+        self.assertIn('Rebuilt 4 facet counts.', out.getvalue())
+        self.assertEqual(facets.count_books(genre=self.fantasy.pk, language=self.english.pk), 1)
+
+
+class BrowseViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.english, cls.french = Language.objects.create(name='English'), Language.objects.create(name='French')
+        cls.fantasy, cls.poetry = Genre.objects.create(name='Fantasy'), Genre.objects.create(name='Poetry')
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        for number in range(12):
+            book = Book.objects.create(title=f'Book {number:02}', summary='My book summary', isbn='ABCDEFG',
+                                       author=cls.author, language=cls.french if number % 3 else cls.english)
+            book.genre.set([cls.poetry] if number % 2 else [cls.fantasy])
+
+    def setUp(self):
+        cache.clear()
+
+    def sidebar(self, response, name):
+        facet = next(facet for facet in response.context['facets'] if facet['name'] == name)
+        return {str(obj): books for obj, books, _url, _selected in facet['choices']}
+
+    def test_unfiltered(self):
+        response = self.client.get(reverse('browse'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        self.assertEqual(len(response.context['book_list']), 10)
+        self.assertEqual(self.sidebar(response, 'genre'), {'Fantasy': 6, 'Poetry': 6})
+        self.assertEqual(self.sidebar(response, 'language'), {'English': 4, 'French': 8})
+        self.assertEqual(self.sidebar(response, 'author'), {'Smith, John': 12})
+
+    def test_filtered(self):
+        response = self.client.get(reverse('browse'), {'genre': self.fantasy.pk, 'page': 1})
+        self.assertEqual([book.title for book in response.context['book_list']],
+                         ['Book 00', 'Book 02', 'Book 04', 'Book 06', 'Book 08', 'Book 10'])
+        self.assertEqual(self.sidebar(response, 'language'), {'English': 2, 'French': 4})
+        self.assertContains(response, f'?genre={self.fantasy.pk}&amp;language={self.english.pk}')
+
+        response = self.client.get(reverse('browse'), {'language': self.english.pk, 'author': self.author.pk})
+        self.assertEqual(response.context['page_obj'].paginator.count, 4)
+        self.assertEqual(self.sidebar(response, 'genre'), {'Fantasy': 2, 'Poetry': 2})
+
+        # Filters that are not ids are ignored
+        response = self.client.get(reverse('browse'), {'genre': 'fantasy'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+
+    def test_sidebars_do_not_group_the_catalog(self):
+        # index counts + page + genre, language and author rows with their objects
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('browse'))
+        self.assertEqual(len(context.captured_queries), 8)
+        self.assertFalse([query['sql'] for query in context.captured_queries if 'GROUP BY' in query['sql']])
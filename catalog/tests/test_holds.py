@@ -0,0 +1,138 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog import counters, holds, loans
+from catalog.models import Book, BookInstance, Hold
+
+class HoldQueueTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.patrons = [User.objects.create_user(username=f'patron{number}') for number in range(3)]
+        cls.book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint='Imprint', status='o', borrower=cls.patrons[0],
+                                               due_back=datetime.date.today())
+
+    def place_holds(self):
+        return [holds.place_hold(self.book, patron) for patron in self.patrons]
+
+    def assertReservedFor(self, patron):
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        self.assertEqual((copy.status, copy.borrower), ('r', patron))
+        hold = Hold.objects.get(patron=patron, status='r')
+        self.assertEqual(hold.copy_id, self.copy.pk)
+        return hold
+
+    def test_waiting_while_no_copy_available(self):
+        placed = self.place_holds()
+        self.assertEqual([hold.status for hold in placed], ['w', 'w', 'w'])
+        self.assertEqual(holds.place_hold(self.book, self.patrons[0]).pk, placed[0].pk)
+        self.assertEqual(Hold.objects.count(), 3)
+
+    def test_ready_at_once_when_a_copy_is_available(self):
+        available = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        hold = holds.place_hold(self.book, self.patrons[1])
+        self.assertEqual((hold.status, hold.copy_id), ('r', available.pk))
+        self.assertEqual(hold.expires_at, hold.ready_at + datetime.timedelta(days=7))
+        book = Book.objects.get(pk=self.book.pk)
+        self.assertEqual((book.copies_available, book.copies_reserved), (0, 1))
+
+    def test_returned_copy_goes_to_the_first_in_the_queue(self):
+        self.place_holds()
+        results = loans.return_copies([self.copy.pk])
+        self.assertTrue(results[0].ok)
+        self.assertReservedFor(self.patrons[0])
+        self.assertEqual(Hold.objects.filter(status='w').count(), 2)
+        book = Book.objects.get(pk=self.book.pk)
+        self.assertEqual((book.copies_available, book.copies_on_loan, book.copies_reserved), (0, 0, 1))
+
+    def test_copy_saved_as_available_is_allocated(self):
+        self.place_holds()
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        copy.status = 'a'
+        copy.borrower = None
+        copy.save()
+        self.assertEqual((copy.status, copy.borrower_id), ('r', self.patrons[0].pk))
+        self.assertReservedFor(self.patrons[0])
+        self.assertEqual(Book.objects.get(pk=self.book.pk).copies_reserved, 1)
+
+    def test_checkout_to_the_patron_fulfils_the_hold(self):
+        self.place_holds()
+        loans.return_copies([self.copy.pk])
+        loans.checkout([self.copy.pk], self.patrons[0], datetime.date.today() + datetime.timedelta(weeks=3))
+        self.assertEqual(Hold.objects.get(patron=self.patrons[0]).status, 'f')
+
+    def test_checkout_to_someone_else_keeps_the_place_in_the_queue(self):
+        placed = self.place_holds()
+        loans.return_copies([self.copy.pk])
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        loans.transition(copy, 'o', borrower=self.patrons[2])
+        hold = Hold.objects.get(pk=placed[0].pk)
+        self.assertEqual((hold.status, hold.copy), ('w', None))
+
+        loans.return_copies([self.copy.pk])
+        self.assertReservedFor(self.patrons[0])
+
+    def test_cancelling_a_ready_hold_passes_the_copy_on(self):
+        placed = self.place_holds()
+        loans.return_copies([self.copy.pk])
+        holds.cancel(placed[0])
+        self.assertEqual(Hold.objects.get(pk=placed[0].pk).status, 'c')
+        self.assertReservedFor(self.patrons[1])
+
+    def test_reallocate_expires_holds_and_serves_bulk_returns(self):
+        placed = self.place_holds()
+        loans.return_copies([self.copy.pk])
+        later = timezone.now() + datetime.timedelta(days=8)
+        self.assertEqual(holds.reallocate(later), (1, 1))
+        self.assertEqual(Hold.objects.get(pk=placed[0].pk).status, 'e')
+        self.assertReservedFor(self.patrons[1])
+
+        # A copy made available without signals is only found by the nightly pass
+        extra = BookInstance.objects.create(book=self.book, imprint='Imprint', status='m')
+        BookInstance.objects.filter(pk=extra.pk).update(status='a')
+        counters.rebuild()
+        call_command('allocate_holds', stdout=StringIO())
+        self.assertEqual(Hold.objects.get(pk=placed[2].pk).copy_id, extra.pk)
+
+    def test_positions(self):
+        placed = self.place_holds()
+        positions = {hold.pk: hold.position for hold in holds.with_positions(Hold.objects.all())}
+        self.assertEqual([positions[hold.pk] for hold in placed], [1, 2, 3])
+
+    def test_next_holds_are_read_through_the_queue_index(self):
+        Hold.objects.bulk_create([
+            Hold(book=self.book, patron=User.objects.create_user(username=f'queued{number}'))
+            for number in range(50)
+        ])
+        with connection.cursor() as cursor:
+            queryset = Hold.objects.filter(book_id=self.book.pk, status='w').order_by('created_at', 'id')[:1]
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('hold_queue_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_hold_views(self):
+        self.client.force_login(self.patrons[1])
+        holds.place_hold(self.book, self.patrons[0])
+        response = self.client.post(reverse('place-hold', kwargs={'pk': self.book.pk}))
+        self.assertRedirects(response, reverse('my-holds'))
+
+        response = self.client.get(reverse('my-holds'))
+        self.assertContains(response, 'number 2 in the queue')
+
+        hold = Hold.objects.get(patron=self.patrons[1])
+        response = self.client.post(reverse('cancel-hold', kwargs={'pk': hold.pk}))
+        self.assertRedirects(response, reverse('my-holds'))
+        self.assertContains(self.client.get(reverse('my-holds')), 'You have no holds.')
+
+        # Someone else's hold cannot be cancelled
+        other = Hold.objects.get(patron=self.patrons[0])
+        self.assertEqual(self.client.post(reverse('cancel-hold', kwargs={'pk': other.pk})).status_code, 404)
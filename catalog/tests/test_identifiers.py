@@ -0,0 +1,67 @@
+import datetime
+import time
+import uuid
+
+from django.contrib.auth.models import Permission, User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog import identifiers
+from catalog.forms import BatchLoanForm
+from catalog.models import Book, BookInstance
+
+class CopyIdTest(TestCase):
+    def test_uuid7_is_time_ordered(self):
+        before = time.time_ns() // 1000000
+        ids = [identifiers.uuid7() for _ in range(5000)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual((ids[0].version, ids[0].variant), (7, uuid.RFC_4122))
+        self.assertGreaterEqual(ids[0].int >> 80, before)
+
+    def test_new_copy_id_version_setting(self):
+        self.assertEqual(identifiers.new_copy_id().version, 7)
+        with override_settings(CATALOG_COPY_UUID_VERSION=4):
+            self.assertEqual(identifiers.new_copy_id().version, 4)
+
+    def test_short_id_round_trip(self):
+        for value in (uuid.UUID(int=0), uuid.UUID(int=2 ** 128 - 1), identifiers.uuid7(), uuid.uuid4()):
+            short = identifiers.short_id(value)
+            self.assertEqual(len(short), 26)
+            self.assertEqual(identifiers.parse_copy_id(short), value)
+            self.assertEqual(identifiers.parse_copy_id(short.lower()), value)
+            self.assertEqual(identifiers.parse_copy_id(str(value)), value)
+
+    def test_short_ids_sort_like_the_uuids(self):
+        ids = [identifiers.uuid7() for _ in range(100)]
+        self.assertEqual(sorted(identifiers.short_id(value) for value in ids), [identifiers.short_id(value) for value in ids])
+
+    def test_parse_rejects_other_values(self):
+        for value in ('not-an-id', 'U' * 26, '8' + '0' * 25):
+            with self.assertRaises(ValueError):
+                identifiers.parse_copy_id(value)
+
+
+class CopyIdUrlTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = User.objects.create_user(username='librarian', password='deeznuts1')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+        cls.copy = BookInstance.objects.create(book=book, imprint='Imprint', status='o', borrower=cls.librarian,
+                                               due_back=datetime.date.today())
+
+    def test_new_copies_get_time_ordered_ids(self):
+        self.assertEqual(self.copy.pk.version, 7)
+
+    def test_renewal_url_accepts_both_forms(self):
+        self.client.force_login(self.librarian)
+        url = reverse('renew-book-librarian', kwargs={'pk': self.copy.pk})
+        self.assertIn(self.copy.short_id, url)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(f'/catalog/book/{self.copy.pk}/renew/').status_code, 200)
+
+    def test_batch_form_accepts_short_ids(self):
+        form = BatchLoanForm({'copy_ids': f'{self.copy.short_id}\n{self.copy.pk}'}, action='return')
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['copy_ids'], [self.copy.pk, self.copy.pk])
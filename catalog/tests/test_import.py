@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from catalog import search, stats
+from catalog.models import Author, Book, BookInstance, Genre, Language, LibraryCounter
+
+class ImportCatalogCommandTest(TestCase):
+    def write_file(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_file(self, path, *args):
+        out = StringIO()
+        call_command('import_catalog', path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_csv(self):
+        Author.objects.create(first_name='John', last_name='Tolkien')
+        path = self.write_file('.csv', (
+            'title,author_first_name,author_last_name,summary,isbn,genres,language,copies,imprint,status\n'
+            'The Hobbit,John,Tolkien,There and back again,9780261102217,Fantasy;Adventure,English,3,Allen,a\n'
+            'Dune,Frank,Herbert,Spice,9780441172719,Science Fiction,English,2,Chilton,o\n'
+            'The Silmarillion,John,Tolkien,Elves,9780261102736,Fantasy,English,0,,\n'
+        ))
+        output = self.import_file(path, '--batch-size', '2')
+
+        self.assertIn('rows/s', output)
+        self.assertIn('Imported 3 books with 5 copies.', output)
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(set(Genre.objects.values_list('name', flat=True)), {'Fantasy', 'Adventure', 'Science Fiction'})
+        self.assertEqual(Language.objects.count(), 1)
+
+        hobbit = Book.objects.get(title='The Hobbit')
+        self.assertEqual(str(hobbit.author), 'Tolkien, John')
+        self.assertEqual(hobbit.display_genre(), 'Fantasy, Adventure')
+        self.assertEqual(hobbit.bookinstance_set.filter(status='a').count(), 3)
+        self.assertEqual((hobbit.copies_total, hobbit.copies_available), (3, 3))
+
+        library = LibraryCounter.objects.get(pk=LibraryCounter.SINGLETON_ID)
+        self.assertEqual((library.copies_total, library.copies_available, library.copies_on_loan), (5, 3, 2))
+        self.assertEqual(search.search_book_ids('herbert'), [Book.objects.get(title='Dune').pk])
+
+    def test_import_jsonl(self):
+        rows = [
+            {'title': 'Dune', 'author_first_name': 'Frank', 'author_last_name': 'Herbert',
+             'genres': ['Science Fiction'], 'copies': 1, 'status': 'm'},
+            {'title': 'Anonymous Poems'},
+        ]
+        path = self.write_file('.jsonl', '\n'.join(json.dumps(row) for row in rows) + '\n')
+        self.import_file(path)
+
+        self.assertEqual(Book.objects.count(), 2)
+        self.assertIsNone(Book.objects.get(title='Anonymous Poems').author)
+        self.assertEqual(BookInstance.objects.get().status, 'm')
+
+    def test_import_from_stdin_leaves_it_open(self):
+        stdin = StringIO('title,copies\nDune,1\n')
+        with mock.patch('sys.stdin', stdin):
+            self.import_file('-', '--format', 'csv')
+        self.assertFalse(stdin.closed)
+        self.assertEqual(Book.objects.get().title, 'Dune')
+
+    def test_invalid_row_rolls_back_its_batch(self):
+        cache.clear()
+        self.assertEqual(stats.get_index_counts()['num_books'], 0)
+        path = self.write_file('.csv', 'title,copies\nFirst,1\nSecond,1\n,1\n')
+        with self.assertRaisesMessage(CommandError, 'Row 3: title is required (2 rows imported before the error)'):
+            self.import_file(path, '--batch-size', '2')
+        self.assertEqual(list(Book.objects.values_list('title', flat=True).order_by('title')), ['First', 'Second'])
+        self.assertEqual(stats.get_index_counts()['num_books'], 2)
@@ -0,0 +1,168 @@
+import datetime
+import threading
+import time
+
+from django.contrib.auth.models import Permission, User
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from catalog import loans
+from catalog.models import Book, BookInstance
+
+class TransitionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.borrower = User.objects.create_user(username='borrower')
+        cls.book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+
+    def setUp(self):
+        self.copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+
+    def test_transition_updates_copy_and_counters(self):
+        due_back = datetime.date.today() + datetime.timedelta(weeks=2)
+        loans.transition(self.copy, 'o', borrower=self.borrower, due_back=due_back)
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        self.assertEqual((copy.status, copy.borrower, copy.due_back, copy.version), ('o', self.borrower, due_back, 1))
+        self.assertEqual(self.copy.version, 1)
+        book = Book.objects.get(pk=self.book.pk)
+        self.assertEqual((book.copies_available, book.copies_on_loan), (0, 1))
+
+    def test_stale_copy_is_rejected(self):
+        stale = BookInstance.objects.get(pk=self.copy.pk)
+        loans.transition(self.copy, 'r')
+        with self.assertRaises(loans.LoanStateError):
+            loans.transition(stale, 'o')
+        self.assertEqual(BookInstance.objects.get(pk=self.copy.pk).status, 'r')
+
+    def test_save_moves_version(self):
+        stale = BookInstance.objects.get(pk=self.copy.pk)
+        self.copy.imprint = 'Another Imprint'
+        self.copy.save()
+        with self.assertRaises(loans.LoanStateError):
+            loans.transition(stale, 'm')
+
+    def test_disallowed_transition(self):
+        loans.transition(self.copy, 'm')
+        with self.assertRaisesMessage(loans.LoanStateError, 'cannot be made on loan'):
+            loans.transition(self.copy, 'o')
+
+    def test_batch_operations_follow_the_state_machine(self):
+        for operation, new_status in ((loans.Checkout, 'o'), (loans.Return, 'a')):
+            for status in operation.from_statuses:
+                self.assertIn(new_status, loans.ALLOWED_TRANSITIONS[status])
+
+    def test_renewal_form_rendered_with_stale_version(self):
+        librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        loans.transition(self.copy, 'o', borrower=self.borrower)
+
+        url = reverse('renew-book-librarian', kwargs={'pk': self.copy.pk})
+        renewal_date = datetime.date.today() + datetime.timedelta(weeks=2)
+        response = self.client.post(url, {'renewal_date': renewal_date, 'version': 0})
+        self.assertFormError(response, 'form', None, 'The copy was changed by someone else. Reload it and try again.')
+
+        response = self.client.post(url, {'renewal_date': renewal_date, 'version': 1})
+        self.assertRedirects(response, reverse('all-borrowed'), fetch_redirect_response=False)
+        self.assertEqual(BookInstance.objects.get(pk=self.copy.pk).due_back, renewal_date)
+
+    def test_only_copies_on_loan_can_be_renewed(self):
+        due_back = datetime.date.today() + datetime.timedelta(weeks=2)
+        with self.assertRaisesMessage(loans.LoanStateError, 'Only a copy on loan can be renewed'):
+            loans.renew_copy(self.copy, due_back)
+
+        librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        url = reverse('renew-book-librarian', kwargs={'pk': self.copy.pk})
+        response = self.client.post(url, {'renewal_date': due_back, 'version': 0})
+        self.assertEqual(response.status_code, 200)
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        self.assertEqual((copy.status, copy.borrower, copy.due_back), ('a', None, None))
+        book = Book.objects.get(pk=self.book.pk)
+        self.assertEqual((book.copies_available, book.copies_on_loan), (1, 0))
+
+class ConcurrentTransitionTest(TransactionTestCase):
+    """Many threads changing the same copies at once, each with its own database connection."""
+    THREADS = 8
+
+    def setUp(self):
+        self.book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+        self.borrowers = [User.objects.create_user(username=f'borrower{number}') for number in range(self.THREADS)]
+
+    def run_threads(self, target):
+        errors = []
+
+        def run(number):
+            try:
+                target(number)
+            except Exception as e:  # reported in the main thread
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(number,)) for number in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def retry_when_locked(self, function):
+        # SQLite allows one writer at a time and reports the others as locked rather than waiting
+        while True:
+            try:
+                return function()
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                time.sleep(0.001)
+
+    def test_only_one_checkout_wins(self):
+        copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        winners = []
+        barrier = threading.Barrier(self.THREADS)
+
+        def checkout(number):
+            mine = self.retry_when_locked(lambda: BookInstance.objects.get(pk=copy.pk))
+            barrier.wait()
+            try:
+                self.retry_when_locked(lambda: loans.transition(mine, 'o', borrower=self.borrowers[number]))
+            except loans.LoanStateError:
+                return
+            winners.append(number)
+
+        self.run_threads(checkout)
+        self.assertEqual(len(winners), 1)
+        copy = BookInstance.objects.get(pk=copy.pk)
+        self.assertEqual((copy.borrower_id, copy.version), (self.borrowers[winners[0]].pk, 1))
+        self.assertEqual(Book.objects.get(pk=self.book.pk).copies_on_loan, 1)
+
+    def test_no_lost_renewals(self):
+        copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='o')
+        renewals_per_thread = 10
+        claimed_versions = []
+
+        def renew(number):
+            done = 0
+            due_back = datetime.date.today() + datetime.timedelta(days=number + 1)
+
+            def attempt():
+                mine = BookInstance.objects.get(pk=copy.pk)
+                version = mine.version
+                loans.renew_copy(mine, due_back)
+                return version
+
+            while done < renewals_per_thread:
+                try:
+                    claimed_versions.append(self.retry_when_locked(attempt))
+                except loans.LoanStateError:
+                    continue
+                done += 1
+
+        self.run_threads(renew)
+        # Every renewal was applied on top of a distinct version: none overwrote another
+        total = self.THREADS * renewals_per_thread
+        self.assertEqual(sorted(claimed_versions), list(range(total)))
+        self.assertEqual(BookInstance.objects.get(pk=copy.pk).version, total)
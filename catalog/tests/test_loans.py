@@ -0,0 +1,88 @@
+import datetime
+import uuid
+
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog import loans, stats
+from catalog.models import Book, BookInstance, LibraryCounter
+
+class BatchLoansTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.borrower = User.objects.create_user(username='borrower', password='1X<ISRUkw+tuK')
+        cls.librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        cls.book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+        cls.available = [BookInstance.objects.create(book=cls.book, imprint='Imprint', status='a') for _ in range(3)]
+        cls.on_loan = BookInstance.objects.create(book=cls.book, imprint='Imprint', status='o', borrower=cls.borrower,
+                                                  due_back=datetime.date.today())
+        cls.maintenance = BookInstance.objects.create(book=cls.book, imprint='Imprint', status='m')
+
+    def setUp(self):
+        cache.clear()
+
+    def due_back(self, weeks=2):
+        return datetime.date.today() + datetime.timedelta(weeks=weeks)
+
+    def test_checkout_reports_each_copy(self):
+        missing = uuid.uuid4()
+        ids = [copy.pk for copy in self.available] + [self.on_loan.pk, missing]
+        with self.assertNumQueries(9):
+            # select + one update of the copies, book and library counters, touch the book, and savepoints
+            results = loans.checkout(ids, self.borrower, self.due_back())
+
+        self.assertEqual([result.ok for result in results], [True, True, True, False, False])
+        self.assertEqual(results[3].message, 'Not possible for a copy that is on loan')
+        self.assertEqual(results[4].message, 'No such copy')
+        self.assertEqual(BookInstance.objects.filter(status='o', borrower=self.borrower).count(), 4)
+
+        book = Book.objects.get(pk=self.book.pk)
+        self.assertEqual((book.copies_available, book.copies_on_loan), (0, 4))
+        counter = LibraryCounter.objects.get()
+        self.assertEqual((counter.copies_available, counter.copies_on_loan), (0, 4))
+
+    def test_return_and_renew(self):
+        stats.get_index_counts()
+        results = loans.return_copies([self.on_loan.pk, self.maintenance.pk])
+        self.assertEqual([result.ok for result in results], [True, False])
+        copy = BookInstance.objects.get(pk=self.on_loan.pk)
+        self.assertEqual((copy.status, copy.borrower, copy.due_back), ('a', None, None))
+        self.assertEqual(stats.get_index_counts()['num_instances_available'], 4)
+
+        results = loans.renew([self.on_loan.pk], self.due_back())
+        self.assertFalse(results[0].ok)
+
+    def test_renew(self):
+        updated_at = Book.objects.get(pk=self.book.pk).updated_at
+        results = loans.renew([self.on_loan.pk, self.on_loan.pk], self.due_back(3))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(BookInstance.objects.get(pk=self.on_loan.pk).due_back, self.due_back(3))
+        self.assertGreater(Book.objects.get(pk=self.book.pk).updated_at, updated_at)
+
+    def test_view(self):
+        url = reverse('batch-loans', kwargs={'action': 'checkout'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        ids = '\n'.join(str(copy.pk) for copy in self.available[:2])
+        response = self.client.post(url, {'copy_ids': ids, 'borrower': 'borrower', 'due_back': self.due_back()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['succeeded'], 2)
+        self.assertContains(response, 'Checked out', count=2)
+
+    def test_view_validation(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        url = reverse('batch-loans', kwargs={'action': 'renew'})
+        response = self.client.post(url, {'copy_ids': f'{self.on_loan.pk}, not-an-id', 'due_back': self.due_back(5)})
+        self.assertFormError(response, 'form', 'copy_ids', 'Invalid copy IDs: not-an-id')
+        self.assertFormError(response, 'form', 'due_back', 'Invalid date - renewal more than 4 weeks ahead')
+
+        url = reverse('batch-loans', kwargs={'action': 'checkout'})
+        response = self.client.post(url, {'copy_ids': str(self.available[0].pk), 'borrower': 'nobody', 'due_back': self.due_back()})
+        self.assertFormError(response, 'form', 'borrower', 'No borrower with username nobody')
+
+        self.assertEqual(self.client.get(reverse('batch-loans', kwargs={'action': 'steal'})).status_code, 404)
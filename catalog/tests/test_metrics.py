@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog import metrics
+from catalog.models import Author
+
+class RequestMetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Author.objects.create(first_name='John', last_name='Smith')
+
+    def setUp(self):
+        cache.clear()
+        metrics.REGISTRY.reset()
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('authors'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="3 queries", tpl;dur=[\d.]+;desc="templates", total;dur=[\d.]+$')
+
+    def test_requests_aggregated_per_view(self):
+        self.client.get(reverse('authors'))
+        self.client.get(reverse('authors'))
+        self.client.get('/catalog/no-such-page/')
+
+        snapshot = metrics.REGISTRY.snapshot()
+        self.assertEqual(snapshot['authors']['requests'], 2)
+        self.assertEqual(snapshot['authors']['queries'], 6)
+        self.assertEqual(sum(snapshot['authors']['total_ms']['buckets'].values()), 2)
+        self.assertGreater(snapshot['authors']['template_ms']['sum_ms'], 0)
+        self.assertEqual(snapshot['<unresolved>']['requests'], 1)
+
+    def test_histogram_buckets(self):
+        histogram = metrics.Histogram()
+        for milliseconds in (1, 5, 6, 10000):
+            histogram.observe(milliseconds)
+        buckets = histogram.as_dict()['buckets']
+        self.assertEqual((buckets['5'], buckets['10'], buckets['+Inf']), (2, 1, 1))
+
+    def test_metrics_endpoint_is_staff_only(self):
+        response = self.client.get(reverse('request-metrics'))
+        self.assertEqual(response.status_code, 302)
+
+        User.objects.create_user(username='admin', password='deeznuts1', is_staff=True)
+        self.client.login(username='admin', password='deeznuts1')
+        self.client.get(reverse('authors'))
+        response = self.client.get(reverse('request-metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['views']['authors']['requests'], 1)
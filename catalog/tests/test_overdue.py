@@ -0,0 +1,91 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import Permission, User
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.models import Book, BookInstance, OverdueNotice
+from catalog.overdue import RateLimitedSender, notify_overdue, overdue_loans_by_borrower
+
+TODAY = datetime.date(2026, 3, 10)
+
+class OverdueTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice', email='alice@example.com', password='1X<ISRUkw+tuK')
+        cls.bob = User.objects.create_user(username='bob', email='bob@example.com')
+        cls.carol = User.objects.create_user(username='carol')
+        book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+
+        def loan(borrower, days, status='o'):
+            return BookInstance.objects.create(book=book, imprint='Unlikely Imprint, 2016', status=status,
+                                               borrower=borrower, due_back=TODAY + datetime.timedelta(days=days))
+
+        cls.alice_overdue = [loan(cls.alice, -3), loan(cls.alice, -10)]
+        loan(cls.alice, 0)  # due today, not overdue yet
+        loan(cls.alice, -5, status='a')  # returned
+        loan(cls.bob, -1)
+        loan(cls.carol, -2)
+        loan(None, -2)
+
+    def test_overdue_queryset(self):
+        self.assertEqual(BookInstance.objects.overdue(TODAY).count(), 5)
+
+    def test_loans_grouped_by_borrower(self):
+        groups = dict(overdue_loans_by_borrower(TODAY, chunk_size=2))
+        self.assertEqual(set(groups), {self.alice.pk, self.bob.pk, self.carol.pk})
+        self.assertEqual([loan[0] for loan in groups[self.alice.pk]],
+                         [self.alice_overdue[1].pk, self.alice_overdue[0].pk])
+
+    def test_notify_overdue(self):
+        borrowers, loans, created = notify_overdue(TODAY, sender=RateLimitedSender(rate=0), batch_size=2)
+        self.assertEqual((borrowers, loans, created), (3, 4, 3))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['alice@example.com', 'bob@example.com'])
+        self.assertIn('- Book Title (due Feb. 28, 2026)\n- Book Title (due March 7, 2026)\n', mail.outbox[0].body)
+
+        notice = OverdueNotice.objects.get(borrower=self.alice)
+        self.assertEqual((notice.loans, notice.oldest_due_back), (2, TODAY - datetime.timedelta(days=10)))
+        self.assertIsNotNone(notice.sent_at)
+        self.assertIsNone(OverdueNotice.objects.get(borrower=self.carol).sent_at)
+
+        # A second scan on the same day does not remind anyone again
+        self.assertEqual(notify_overdue(TODAY, sender=RateLimitedSender(rate=0))[2], 0)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_sender_rate_limit(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        sender = RateLimitedSender(rate=2, batch_size=2, clock=lambda: now[0], sleep=sleep)
+        messages = [mail.EmailMessage('Subject', 'Body', 'from@example.com', ['to@example.com']) for _ in range(5)]
+        self.assertEqual(sender.send(messages), 5)
+        self.assertEqual(sleeps, [1.0, 1.0])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('notify_overdue', '--date', TODAY.isoformat(), '--dry-run', stdout=out)
+        self.assertIn('4 overdue loans held by 3 borrowers', out.getvalue())
+        self.assertFalse(OverdueNotice.objects.exists())
+
+        call_command('notify_overdue', '--date', TODAY.isoformat(), '--rate', '0', stdout=out)
+        self.assertEqual(OverdueNotice.objects.count(), 3)
+        self.assertIn('2 emails sent', out.getvalue())
+
+    def test_librarian_view_filters_overdue(self):
+        self.alice.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.alice.groups.create(name='Librarian')
+        self.client.login(username='alice', password='1X<ISRUkw+tuK')
+
+        BookInstance.objects.create(imprint='Unlikely Imprint, 2016', status='o',
+                                    due_back=datetime.date.today() + datetime.timedelta(days=1))
+        response = self.client.get(reverse('all-borrowed') + '?overdue')
+        self.assertEqual(len(response.context['bookinstance_list']), BookInstance.objects.overdue().count())
+        self.assertTrue(all(copy.is_overdue for copy in response.context['bookinstance_list']))
+        self.assertContains(response, 'Show all loans')
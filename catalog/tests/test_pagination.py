@@ -0,0 +1,109 @@
+import datetime
+from urllib.parse import quote
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance
+from catalog.pagination import CursorPaginator
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Duplicate last names so the tie-breaking columns matter
+        for number in range(13):
+            Author.objects.create(first_name=f'Bob {number:02}', last_name=f'Bill {number % 4}')
+
+        book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+        for number in range(7):
+            # A few copies without a due date, which must sort after all the others
+            due_back = None if number % 3 == 0 else datetime.date.today() + datetime.timedelta(days=number % 2)
+            BookInstance.objects.create(book=book, imprint='Imprint', due_back=due_back, status='o')
+
+    def walk(self, queryset, ordering, per_page):
+        """Follow next cursors from the first page to the last, then previous cursors back."""
+        paginator = CursorPaginator(queryset, per_page, ordering)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+
+        backwards = [pages[-1]]
+        while backwards[-1].has_previous():
+            backwards.append(paginator.page(backwards[-1].previous_cursor))
+        return pages, backwards[::-1]
+
+    def test_forward_and_backward_walks_match_offset_order(self):
+        queryset = Author.objects.all()
+        expected = list(queryset.order_by('last_name', 'first_name', 'id'))
+        pages, backwards = self.walk(queryset, ('last_name', 'first_name', 'id'), 5)
+
+        self.assertEqual([len(page) for page in pages], [5, 5, 3])
+        self.assertEqual([author for page in pages for author in page], expected)
+        self.assertEqual([list(page) for page in backwards], [list(page) for page in pages])
+
+    def test_descending_ordering(self):
+        queryset = Author.objects.all()
+        expected = list(queryset.order_by('-last_name', '-first_name', '-id'))
+        pages, backwards = self.walk(queryset, ('-last_name', '-first_name', '-id'), 4)
+        self.assertEqual([author for page in pages for author in page], expected)
+        self.assertEqual([list(page) for page in backwards], [list(page) for page in pages])
+
+    def test_nullable_ordering_column(self):
+        pages, backwards = self.walk(BookInstance.objects.all(), ('due_back', 'id'), 2)
+        copies = [copy for page in pages for copy in page]
+
+        self.assertEqual(len(copies), 7)
+        self.assertEqual(len(set(copy.pk for copy in copies)), 7)
+        due_dates = [copy.due_back for copy in copies]
+        self.assertEqual(due_dates, sorted(due_dates, key=lambda due_back: (due_back is None, due_back)))
+        self.assertEqual([list(page) for page in backwards], [list(page) for page in pages])
+
+    def test_page_does_not_count(self):
+        paginator = CursorPaginator(Author.objects.all(), 5, ('last_name', 'first_name', 'id'))
+        first_page = paginator.page()
+        with self.assertNumQueries(1):
+            paginator.page(first_page.next_cursor)
+
+
+class CursorPaginationViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(13):
+            Author.objects.create(first_name=f'Bob {number}', last_name=f'Bill {number}')
+
+    def test_offset_pagination_is_default(self):
+        response = self.client.get(reverse('authors'))
+        self.assertFalse(response.context['cursor_pagination'])
+        self.assertEqual(response.context['paginator'].num_pages, 2)
+
+    def test_cursor_pages(self):
+        response = self.client.get(reverse('authors') + '?cursor=')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['cursor_pagination'])
+        self.assertTrue(response.context['is_paginated'])
+        self.assertEqual(len(response.context['author_list']), 10)
+
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, quote(next_cursor))
+        response = self.client.get(reverse('authors'), {'cursor': next_cursor})
+        self.assertEqual(len(response.context['author_list']), 3)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(reverse('authors'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_loaned_books_cursor_pages(self):
+        librarian = User.objects.create_user(username='librarian', password='deeznuts1')
+        librarian.groups.add(Group.objects.create(name='Librarian'))
+        book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+        for number in range(12):
+            BookInstance.objects.create(book=book, imprint='Imprint', status='o',
+                                        due_back=datetime.date.today() + datetime.timedelta(days=number))
+
+        self.client.login(username='librarian', password='deeznuts1')
+        response = self.client.get(reverse('all-borrowed') + '?cursor=')
+        self.assertEqual(len(response.context['bookinstance_list']), 10)
+        response = self.client.get(reverse('all-borrowed'), {'cursor': response.context['page_obj'].next_cursor})
+        self.assertEqual(len(response.context['bookinstance_list']), 2)
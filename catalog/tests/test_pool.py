@@ -0,0 +1,91 @@
+import os
+import tempfile
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from catalog import pool
+
+class ConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.connections = ConnectionHandler({DEFAULT_DB_ALIAS: {
+            'ENGINE': 'catalog.backends.sqlite3',
+            'NAME': os.path.join(directory.name, 'pooled.sqlite3'),
+            'POOL': {'MAX_IDLE': 1},
+        }})
+        self.connection = self.connections[DEFAULT_DB_ALIAS]
+        # A fresh pool for the temporary database
+        self.connection.alias = f'pooled-{id(self)}'
+        self.addCleanup(pool.get_pool(self.connection.alias, self.connection.settings_dict).close_all)
+        self.addCleanup(self.connections.close_all)
+
+    def query(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            return cursor.fetchone()[0]
+
+    def test_closed_connections_are_reused(self):
+        self.query()
+        raw = self.connection.connection
+        self.connection.close()
+        self.assertEqual(len(self.connection.pool), 1)
+
+        self.assertEqual(self.query(), 1)
+        self.assertIs(self.connection.connection, raw)
+        self.assertEqual((self.connection.pool.reused, len(self.connection.pool)), (1, 0))
+
+    def test_broken_connections_are_replaced(self):
+        self.query()
+        raw = self.connection.connection
+        self.connection.close()
+        raw.close()
+
+        self.assertEqual(self.query(), 1)
+        self.assertIsNot(self.connection.connection, raw)
+        self.assertEqual(self.connection.pool.discarded, 1)
+
+    def test_idle_limits(self):
+        clock = [0]
+        connection_pool = pool.ConnectionPool(max_idle=1, max_idle_seconds=60, clock=lambda: clock[0])
+        first = self.connection.get_new_connection(self.connection.get_connection_params())
+        self.assertTrue(connection_pool.checkin(first))
+        second = self.connection.get_new_connection(self.connection.get_connection_params())
+        self.assertFalse(connection_pool.checkin(second))
+        second.close()
+
+        clock[0] = 61
+        self.assertIsNone(connection_pool.checkout())
+        self.assertEqual(connection_pool.discarded, 1)
+
+    def test_health_check_on_first_use_in_a_request(self):
+        # Persistent connections without a pool
+        del self.connection.settings_dict['POOL']
+        self.connection.settings_dict['CONN_HEALTH_CHECKS'] = True
+        self.assertIsNone(self.connection.pool)
+        self.query()
+        raw = self.connection.connection
+        checks = []
+
+        def is_usable():
+            checks.append(raw)
+            return len(checks) > 1
+
+        self.connection.is_usable = is_usable
+        # Nothing is checked when the request starts
+        pool.mark_unchecked(self.connections)
+        self.assertEqual(checks, [])
+
+        # The first query of the request finds the connection unusable and opens another one
+        self.assertEqual(self.query(), 1)
+        self.assertEqual(len(checks), 1)
+        self.assertIsNot(self.connection.connection, raw)
+        self.query()
+        self.assertEqual(len(checks), 1)
+
+        pool.mark_unchecked(self.connections)
+        self.query()
+        self.query()
+        self.assertEqual(len(checks), 2)
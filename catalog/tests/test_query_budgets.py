@@ -0,0 +1,79 @@
+import datetime
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.tests.utils import QueryBudgetMixin
+
+# Session, user, user permission, group permission and group lookups of a logged in user's first page.
+# With a shared cache, later pages find all of them in it (catalog.authcache), so they cost no auth queries.
+AUTH_QUERIES = 5
+
+# The settings used with a shared default cache; the tests run in one process, so the local cache will do
+shared_cache_auth = override_settings(
+    AUTHENTICATION_BACKENDS=['catalog.authcache.CachedModelBackend', 'django.contrib.auth.backends.ModelBackend'],
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+)
+
+class PageQueryBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = User.objects.create_user(username='librarian', password='deeznuts1')
+        cls.librarian.groups.add(Group.objects.create(name='Librarian'))
+
+        language = Language.objects.create(name='English')
+        genre = Genre.objects.create(name='Fantasy')
+        due_back = datetime.date.today() + datetime.timedelta(days=5)
+
+        # Every book has its own author and copy, so per-row lookups would show up as extra queries
+        for number in range(12):
+            author = Author.objects.create(first_name=f'John {number}', last_name=f'Smith {number}')
+            book = Book.objects.create(
+                title=f'Book {number}',
+                summary='My book summary',
+                isbn='ABCDEFG',
+                author=author,
+                language=language,
+            )
+            book.genre.add(genre)
+            BookInstance.objects.create(book=book, imprint='Unlikely Imprint, 2016', due_back=due_back,
+                                        borrower=cls.librarian, status='o')
+        cls.author = author
+        cls.book = book
+
+    def setUp(self):
+        cache.clear()
+
+    def test_book_list(self):
+        # conditional GET validators (books, authors) + count + page
+        response = self.assertPageQueryBudget(reverse('books'), 4)
+        self.assertEqual(len(response.context['book_list']), 10)
+
+    def test_author_list(self):
+        # conditional GET validators + count + page
+        self.assertPageQueryBudget(reverse('authors'), 3)
+
+    def test_book_detail(self):
+        # conditional GET validators + book with author and language + genres + copies
+        self.assertPageQueryBudget(self.book.get_absolute_url(), 4)
+
+    def test_author_detail(self):
+        # conditional GET validators + author + books
+        self.assertPageQueryBudget(self.author.get_absolute_url(), 3)
+
+    @shared_cache_auth
+    def test_loaned_books(self):
+        self.client.login(username='librarian', password='deeznuts1')
+        # count + page
+        self.assertPageQueryBudget(reverse('all-borrowed'), AUTH_QUERIES + 2)
+        self.assertPageQueryBudget(reverse('all-borrowed'), 2)
+
+    @shared_cache_auth
+    def test_my_borrowed_books(self):
+        self.client.login(username='librarian', password='deeznuts1')
+        # count + page
+        self.assertPageQueryBudget(reverse('my-borrowed'), AUTH_QUERIES + 2)
+        self.assertPageQueryBudget(reverse('my-borrowed'), 2)
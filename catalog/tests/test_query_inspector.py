@@ -0,0 +1,90 @@
+import datetime
+import os
+import tempfile
+
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.queryinspector import QueryInspector, normalize
+
+class NormalizeTest(TestCase):
+    def test_literals_and_placeholders(self):
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE id = %s AND name = 'x''y'\n  LIMIT 21"),
+            'SELECT * FROM t WHERE id = ? AND name = ? LIMIT ?',
+        )
+
+    def test_in_lists_of_any_length(self):
+        self.assertEqual(normalize('WHERE id IN (%s, %s, %s)'), normalize('WHERE id IN (%s)'))
+
+class QueryInspectorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = User.objects.create_user(username='librarian', password='deeznuts1')
+        cls.librarian.groups.add(Group.objects.create(name='Librarian'))
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+
+        language = Language.objects.create(name='English')
+        genre = Genre.objects.create(name='Fantasy')
+        due_back = datetime.date.today() + datetime.timedelta(days=5)
+
+        # Every book has its own author and copy, so per-row lookups repeat a query shape
+        for number in range(12):
+            author = Author.objects.create(first_name=f'John {number}', last_name=f'Smith {number}')
+            book = Book.objects.create(title=f'Book {number}', summary='My book summary', isbn='ABCDEFG',
+                                       author=author, language=language)
+            book.genre.add(genre)
+            BookInstance.objects.create(book=book, imprint='Unlikely Imprint, 2016', due_back=due_back,
+                                        borrower=cls.librarian, status='o')
+        cls.author = author
+        cls.book = book
+
+    def setUp(self):
+        cache.clear()
+        self.inspector = QueryInspector()
+
+    def test_views_have_no_n_plus_one_queries(self):
+        self.client.login(username='librarian', password='deeznuts1')
+        urls = [
+            reverse('index'),
+            reverse('books'),
+            reverse('authors'),
+            self.book.get_absolute_url(),
+            self.author.get_absolute_url(),
+            reverse('all-borrowed'),
+            reverse('my-borrowed'),
+            reverse('search') + '?q=book',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with self.inspector.inspect() as inspected:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(inspected.repeated(self.inspector.repeat_threshold), {})
+
+    def test_detects_repeated_shapes(self):
+        with self.inspector.inspect() as inspected:
+            titles = [copy.book.title for copy in BookInstance.objects.all()]
+        self.assertEqual(len(titles), 12)
+
+        repeated = inspected.repeated(self.inspector.repeat_threshold)
+        self.assertEqual(list(repeated.values()), [12])
+        findings = self.inspector.record('loans', inspected)
+        self.assertIn('probable N+1, 12 x', findings[0])
+
+        top = self.inspector.report()[0]
+        self.assertEqual((top['view'], top['count'], top['n_plus_one']), ('loans', 12, 1))
+
+    @override_settings(CATALOG_QUERY_INSPECTOR=True)
+    def test_middleware_writes_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.txt')
+            with self.settings(CATALOG_QUERY_REPORT=path):
+                self.client.get(reverse('books'))
+            with open(path) as f:
+                report = f.read()
+        self.assertIn('FROM "catalog_book"', report)
+        self.assertIn('books', report)
@@ -0,0 +1,112 @@
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from catalog import replicas
+from catalog.middleware import ReplicaStickinessMiddleware
+from catalog.models import Book, BookInstance
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+def sqlite_stand_ins(directory, *names):
+    """Databases settings of file-based SQLite databases standing in for a primary and replicas."""
+    return ConnectionHandler({
+        alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(directory, name)}
+        for alias, name in zip((DEFAULT_DB_ALIAS, 'replica1', 'replica2'), names)
+    })
+
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.clock = FakeClock()
+        self.health = replicas.ReplicaHealth(retry_after=30, clock=self.clock)
+        # replica1 lives in a directory that does not exist, so it cannot be connected to
+        self.connections = sqlite_stand_ins(directory.name, 'primary.sqlite3', 'missing/replica1.sqlite3', 'replica2.sqlite3')
+        self.addCleanup(self.connections.close_all)
+        self.router = replicas.ReplicaRouter(['replica1', 'replica2'], self.connections, self.health)
+
+    def in_request(self, pinned=False):
+        state, token = replicas.start_request(pinned)
+        self.addCleanup(replicas.end_request, token)
+        return state
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertIsNone(self.router.db_for_read(Book))
+
+    def test_catalog_reads_skip_unavailable_replicas(self):
+        self.in_request()
+        with self.assertLogs('catalog.replicas', 'WARNING'):
+            self.assertEqual([self.router.db_for_read(Book) for _ in range(3)], ['replica2'] * 3)
+        self.assertFalse(self.health.is_up('replica1'))
+
+        self.clock.now = 31
+        self.assertTrue(self.health.is_up('replica1'))
+
+    def test_other_apps_read_the_primary(self):
+        self.in_request()
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_reads_your_writes(self):
+        state = self.in_request()
+        self.assertEqual(self.router.db_for_write(User), DEFAULT_DB_ALIAS)
+        self.assertFalse(state.wrote)
+        self.assertEqual(self.router.db_for_write(BookInstance), DEFAULT_DB_ALIAS)
+        self.assertTrue(state.wrote)
+        self.assertIsNone(self.router.db_for_read(Book))
+
+    def test_pinned_request_reads_the_primary(self):
+        self.in_request(pinned=True)
+        self.assertIsNone(self.router.db_for_read(Book))
+
+    def test_every_replica_down(self):
+        self.health.mark_down('replica2')
+        self.in_request()
+        with self.assertLogs('catalog.replicas', 'WARNING'):
+            self.assertIsNone(self.router.db_for_read(Book))
+
+class ReplicaTransactionTest(TestCase):
+    def test_reads_in_a_transaction_use_the_primary(self):
+        router = replicas.ReplicaRouter(['replica1'])
+        state, token = replicas.start_request()
+        try:
+            # TestCase wraps every test in a transaction
+            self.assertIsNone(router.db_for_read(Book))
+        finally:
+            replicas.end_request(token)
+
+@override_settings(CATALOG_REPLICAS=['replica1'], CATALOG_REPLICA_STICKY_SECONDS=5)
+class ReplicaStickinessMiddlewareTest(SimpleTestCase):
+    def run_middleware(self, view, cookies=None):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        return ReplicaStickinessMiddleware(view)(request)
+
+    def test_write_sets_the_cookie(self):
+        def view(request):
+            replicas.ReplicaRouter().db_for_write(BookInstance)
+            return HttpResponse()
+
+        response = self.run_middleware(view)
+        self.assertEqual(response.cookies['catalog_primary']['max-age'], 5)
+
+    def test_cookie_pins_the_request(self):
+        seen = []
+
+        def view(request):
+            seen.append(replicas._state.get().reads_primary)
+            return HttpResponse()
+
+        self.assertNotIn('catalog_primary', self.run_middleware(view).cookies)
+        self.run_middleware(view, {'catalog_primary': '1'})
+        self.assertEqual(seen, [False, True])
@@ -0,0 +1,75 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog import search
+from catalog.models import Author, Book
+
+class BookSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tolkien = Author.objects.create(first_name='John', last_name='Tolkien')
+        cls.herbert = Author.objects.create(first_name='Frank', last_name='Herbert')
+        cls.hobbit = Book.objects.create(title='The Hobbit', summary='A journey there and back again.',
+                                         isbn='9780261102217', author=cls.tolkien)
+        cls.dune = Book.objects.create(title='Dune', summary='A desert planet and its spice.',
+                                       isbn='9780441172719', author=cls.herbert)
+
+    def test_search_by_title_summary_isbn_and_author(self):
+        self.assertEqual(search.search_book_ids('hobbit'), [self.hobbit.pk])
+        self.assertEqual(search.search_book_ids('spice'), [self.dune.pk])
+        self.assertEqual(search.search_book_ids('9780441172719'), [self.dune.pk])
+        self.assertEqual(search.search_book_ids('tolkien'), [self.hobbit.pk])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(search.search_book_ids('desert herbert'), [self.dune.pk])
+        self.assertEqual(search.search_book_ids('desert tolkien'), [])
+
+    def test_title_match_ranks_first(self):
+        book = Book.objects.create(title='Planet of Sand', summary='Nothing in common.', isbn='1', author=self.tolkien)
+        self.assertEqual(search.search_book_ids('planet'), [book.pk, self.dune.pk])
+
+    def test_terms_match_as_prefixes(self):
+        self.assertEqual(search.search_book_ids('hobb'), [self.hobbit.pk])
+        self.assertEqual(search.search_book_ids('des herb'), [self.dune.pk])
+        self.assertEqual(search.prefix_tsquery(search.search_terms("des herb's snake_case")),
+                         'des:* & herb:* & s:* & snake:* & case:*')
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(search.search_book_ids('"hobbit" OR NEAR('), [])
+        self.assertEqual(search.search_book_ids('***'), [])
+
+    def test_book_save_updates_index(self):
+        book = Book.objects.get(pk=self.dune.pk)
+        book.title = 'Children of Dune'
+        book.save()
+        self.assertEqual(search.search_book_ids('children'), [self.dune.pk])
+
+    def test_book_delete_removes_from_index(self):
+        Book.objects.get(pk=self.hobbit.pk).delete()
+        self.assertEqual(search.search_book_ids('hobbit'), [])
+
+    def test_author_rename_updates_index(self):
+        author = Author.objects.get(pk=self.herbert.pk)
+        author.last_name = 'Herbertson'
+        author.save()
+        self.assertEqual(search.search_book_ids('herbertson'), [self.dune.pk])
+
+    def test_author_delete_updates_index(self):
+        Author.objects.get(pk=self.tolkien.pk).delete()
+        self.assertEqual(search.search_book_ids('tolkien'), [])
+        self.assertEqual(search.search_book_ids('hobbit'), [self.hobbit.pk])
+
+    def test_rebuild(self):
+        self.assertEqual(search.rebuild(), 2)
+        self.assertEqual(search.search_book_ids('hobbit'), [self.hobbit.pk])
+
+    def test_search_view(self):
+        response = self.client.get(reverse('search'), {'q': 'dune'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'book_search.html')
+        self.assertEqual(response.context['book_list'], [self.dune])
+
+    def test_search_view_without_query(self):
+        response = self.client.get(reverse('search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['book_list'], [])
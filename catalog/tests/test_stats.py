@@ -0,0 +1,59 @@
+from django.core.cache import cache
+from django.db.models import Q
+from django.test import TestCase
+
+from catalog import stats
+from catalog.models import Author, Book, BookInstance, Genre, Language
+
+class IndexCountsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        language = Language.objects.create(name='English')
+        fantasy = Genre.objects.create(name='Fantasy')
+        non_fiction = Genre.objects.create(name='Non-fiction')
+
+        for number in range(3):
+            book = Book.objects.create(
+                title=f'Book {number}',
+                summary='My book summary',
+                isbn='ABCDEFG',
+                author=author,
+                language=language,
+            )
+            book.genre.set([fantasy] if number else [fantasy, non_fiction])
+            BookInstance.objects.create(book=book, imprint='Unlikely Imprint, 2016', status='a')
+            BookInstance.objects.create(book=book, imprint='Unlikely Imprint, 2016', status='o')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_match_individual_queries(self):
+        expected = {
+            'num_books': Book.objects.count(),
+            'num_instances': BookInstance.objects.count(),
+            'num_instances_available': BookInstance.objects.filter(status__exact='a').count(),
+            'num_authors': Author.objects.count(),
+            'num_fictional_books': Book.objects.filter(~Q(genre__name__contains='Non-fiction')).count(),
+        }
+        self.assertEqual(stats.compute_index_counts(), expected)
+        self.assertEqual(expected['num_fictional_books'], 2)
+
+    def test_counts_use_a_single_query(self):
+        with self.assertNumQueries(1):
+            stats.compute_index_counts()
+
+    def test_cached_counts_use_no_queries(self):
+        stats.get_index_counts()
+        with self.assertNumQueries(0):
+            stats.get_index_counts()
+
+    def test_cache_invalidated_on_change(self):
+        self.assertEqual(stats.get_index_counts()['num_authors'], 1)
+        Author.objects.create(first_name='Big', last_name='Bob')
+        self.assertEqual(stats.get_index_counts()['num_authors'], 2)
+
+    def test_cache_invalidated_on_genre_change(self):
+        self.assertEqual(stats.get_index_counts()['num_fictional_books'], 2)
+        Book.objects.get(title='Book 1').genre.add(Genre.objects.get(name='Non-fiction'))
+        self.assertEqual(stats.get_index_counts()['num_fictional_books'], 1)
@@ -0,0 +1,90 @@
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.test import TestCase
+
+from catalog import versions
+from catalog.models import Author, Book, BookInstance, Genre
+
+class VersionsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_version_is_stable_until_bumped(self):
+        version = versions.get_versions(('book', 1))
+        self.assertEqual(versions.get_versions(('book', 1)), version)
+        versions.bump('book', 1)
+        self.assertNotEqual(versions.get_versions(('book', 1)), version)
+
+    def test_evicted_version_does_not_come_back(self):
+        version = versions.get_versions(('book', 1))
+        cache.clear()
+        self.assertNotEqual(versions.get_versions(('book', 1)), version)
+
+
+class DetailFragmentCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        cls.genre = Genre.objects.create(name='Fantasy')
+        cls.book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG', author=cls.author)
+        cls.book.genre.add(cls.genre)
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint='Unlikely Imprint, 2016', status='a')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_book_detail_skips_fragment_queries(self):
+        self.client.get(self.book.get_absolute_url())
+        # Only the conditional GET validators and the book itself are loaded;
+        # genres and copies come from the cached fragment
+        with self.assertNumQueries(2):
+            response = self.client.get(self.book.get_absolute_url())
+        self.assertContains(response, 'Unlikely Imprint, 2016')
+
+    def test_copy_change_refreshes_book_detail(self):
+        self.assertContains(self.client.get(self.book.get_absolute_url()), 'Available')
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        copy.status = 'm'
+        copy.save()
+        self.assertContains(self.client.get(self.book.get_absolute_url()), 'Maintenance')
+
+    def test_genre_and_author_changes_refresh_book_detail(self):
+        self.client.get(self.book.get_absolute_url())
+        genre = Genre.objects.get(pk=self.genre.pk)
+        genre.name = 'High Fantasy'
+        genre.save()
+        author = Author.objects.get(pk=self.author.pk)
+        author.last_name = 'Smithers'
+        author.save()
+
+        response = self.client.get(self.book.get_absolute_url())
+        self.assertContains(response, 'High Fantasy')
+        self.assertContains(response, 'Smithers')
+
+    def test_genre_cleared_from_its_side_refreshes_book_detail(self):
+        self.assertContains(self.client.get(self.book.get_absolute_url()), 'Fantasy')
+        self.genre.book_set.clear()
+        self.assertNotContains(self.client.get(self.book.get_absolute_url()), 'Fantasy')
+
+    def test_book_change_refreshes_author_detail(self):
+        self.assertContains(self.client.get(self.author.get_absolute_url()), 'My book summary')
+        book = Book.objects.get(pk=self.book.pk)
+        book.summary = 'A new summary'
+        book.save()
+        self.assertContains(self.client.get(self.author.get_absolute_url()), 'A new summary')
+
+    def test_book_moved_to_another_author_leaves_old_author_page(self):
+        self.assertContains(self.client.get(self.author.get_absolute_url()), 'Book Title')
+        book = Book.objects.get(pk=self.book.pk)
+        book.author = Author.objects.create(first_name='Big', last_name='Bob')
+        book.save()
+        self.assertNotContains(self.client.get(self.author.get_absolute_url()), 'Book Title')
+
+    def test_permission_links_rendered_per_user(self):
+        self.client.get(self.book.get_absolute_url())
+        user = User.objects.create_user(username='librarian', password='deeznuts1')
+        user.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.client.login(username='librarian', password='deeznuts1')
+        self.assertContains(self.client.get(self.book.get_absolute_url()), 'Update book')
+        self.client.logout()
+        self.assertNotContains(self.client.get(self.book.get_absolute_url()), 'Update book')
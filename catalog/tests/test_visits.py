@@ -0,0 +1,65 @@
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+def writes(context):
+    return [query['sql'] for query in context.captured_queries
+            if query['sql'].split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE')]
+
+class SignedCookieVisitCounterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_visits_without_database_writes(self):
+        self.client.force_login(User.objects.create_user(username='user'))
+        sessions = Session.objects.count()
+        for expected in range(3):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(reverse('index'))
+            self.assertEqual(response.context['num_visits'], expected)
+            self.assertEqual(writes(context), [])
+        self.assertEqual(Session.objects.count(), sessions)
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_anonymous_visits_set_no_cookie(self):
+        response = self.client.get(reverse('index'))
+        self.assertIsNone(response.context['num_visits'])
+        self.assertFalse(response.cookies)
+
+    def test_tampered_cookie_restarts_count(self):
+        self.client.force_login(User.objects.create_user(username='user'))
+        self.client.cookies['num_visits'] = '41'
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['num_visits'], 0)
+
+@override_settings(CATALOG_VISIT_COUNTER='catalog.visits.CacheVisitCounter')
+class CacheVisitCounterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_visits_are_not_counted(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('index'))
+        self.assertIsNone(response.context['num_visits'])
+        self.assertNotContains(response, 'You have visited')
+        self.assertEqual(writes(context), [])
+        self.assertFalse(response.cookies)
+
+    def test_counts_visits_of_logged_in_user(self):
+        User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        for expected in range(3):
+            response = self.client.get(reverse('index'))
+            self.assertEqual(response.context['num_visits'], expected)
+
+@override_settings(CATALOG_VISIT_COUNTER='catalog.visits.SessionVisitCounter')
+class SessionVisitCounterTest(TestCase):
+    def test_counts_visits_in_session(self):
+        self.client.get(reverse('index'))
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['num_visits'], 1)
+        self.assertEqual(self.client.session['num_visits'], 2)
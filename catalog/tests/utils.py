@@ -0,0 +1,25 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+class QueryBudgetMixin:
+    """TestCase mixin asserting that code or pages stay within a fixed number of queries."""
+
+    @contextmanager
+    def assertMaxQueries(self, budget, using=DEFAULT_DB_ALIAS):
+        """Fail if the block runs more than `budget` queries (assertNumQueries wants an exact number)."""
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(f'{number}. {query["sql"]}' for number, query in enumerate(context.captured_queries, start=1))
+            self.fail(f'{executed} queries executed, budget is {budget}\nCaptured queries were:\n{queries}')
+
+    def assertPageQueryBudget(self, url, budget, status_code=200):
+        """GET url with the test client and fail if rendering it took more than `budget` queries."""
+        with self.assertMaxQueries(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status_code)
+        return response
@@ -1,5 +1,8 @@
-from django.urls import path
-from . import views
+from django.urls import path, register_converter
+from . import api, async_views, views
+from .identifiers import CopyIdConverter
+
+register_converter(CopyIdConverter, 'copyid')
 
 urlpatterns = [
     path('', views.index, name='index'),
@@ -7,6 +10,8 @@ urlpatterns = [
     path('book/<int:pk>', views.BookDetailView.as_view(), name='book-detail'),
     path('authors/', views.AuthorListView.as_view(), name='authors'),
     path('author/<int:pk>', views.AuthorDetailView.as_view(), name='author-detail'),
+    path('search/', views.book_search, name='search'),
+    path('browse/', views.browse, name='browse'),
 ]
 
 # View all books borrowed by logged-in user
@@ -14,6 +19,13 @@ urlpatterns += [
     path('mybooks/', views.LoanedBooksByUserListView.as_view(), name='my-borrowed'),
 ]
 
+# Holds on books: the logged-in user's holds, placing and cancelling them
+urlpatterns += [
+    path('myholds/', views.HoldsByUserListView.as_view(), name='my-holds'),
+    path('book/<int:pk>/hold/', views.place_hold, name='place-hold'),
+    path('hold/<int:pk>/cancel/', views.cancel_hold, name='cancel-hold'),
+]
+
 # View all books borrowed right now, only available to librarian users
 urlpatterns += [
     path('borrowedbooks/', views.LoanedBooksView.as_view(), name='all-borrowed')
@@ -21,7 +33,7 @@ urlpatterns += [
 
 
 urlpatterns += [
-    path('book/<uuid:pk>/renew/', views.renew_book_librarian, name='renew-book-librarian'),
+    path('book/<copyid:pk>/renew/', views.renew_book_librarian, name='renew-book-librarian'),
 ]
 
 # Views to create, update, and delete authors
@@ -36,4 +48,34 @@ urlpatterns += [
     path('book/create/', views.BookCreate.as_view(), name='book_create'),
     path('book/<int:pk>/update/', views.BookUpdate.as_view(), name='book_update'),
     path('book/<int:pk>/delete/', views.BookDelete.as_view(), name='book_delete'),
-]
\ No newline at end of file
+]
+
+# Full catalog exports, streamed, only available to librarians
+urlpatterns += [
+    path('export/<slug:kind>.<slug:fmt>', views.export_catalog, name='export-catalog'),
+]
+
+# Request timing histograms of this process, only available to staff
+urlpatterns += [
+    path('metrics/', views.request_metrics, name='request-metrics'),
+]
+
+# Async versions of the read views, for serving under ASGI
+urlpatterns += [
+    path('async/', async_views.index, name='async-index'),
+    path('async/books/', async_views.book_list, name='async-books'),
+    path('async/book/<int:pk>', async_views.book_detail, name='async-book-detail'),
+    path('async/authors/', async_views.author_list, name='async-authors'),
+    path('async/author/<int:pk>', async_views.author_detail, name='async-author-detail'),
+]
+
+# Read-only JSON API, see catalog/api.py
+urlpatterns += [
+    path('api/<slug:resource>/', api.resource_list, name='api-list'),
+    path('api/<slug:resource>/<str:pk>/', api.resource_detail, name='api-detail'),
+]
+
+# Batch checkout, return and renewal for the circulation desk
+urlpatterns += [
+    path('loans/<slug:action>/', views.batch_loans, name='batch-loans'),
+]
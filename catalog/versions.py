@@ -0,0 +1,88 @@
+"""Cache version counters for catalog objects.
+
+Cached fragments of the detail pages are keyed on the versions of the
+objects they render. Saving or deleting an object bumps its version (see
+catalog.signals), so the next request renders and caches a fresh fragment
+while the stale one simply expires; nothing has to be deleted.
+
+Versions live in the cache themselves. A missing version (never set, or
+evicted) starts from the current time rather than from 1, so it can never
+collide with a version that stale fragments were cached under.
+"""
+import time
+
+from django.core.cache import cache
+
+# How long rendered fragments are kept
+FRAGMENT_TIMEOUT = 60 * 60
+
+# Whole-table versions, for rows shown on many pages (a genre name, a language name), and of the
+# set of books and authors, which catalog.conditional folds into the list pages' ETags
+ALL = 'all'
+
+
+def _key(model_name, pk):
+    return f'catalog:version:{model_name}:{pk}'
+
+
+def get_versions(*objects):
+    """Return the current version of each (model_name, pk) pair, as one string."""
+    keys = [_key(model_name, pk) for model_name, pk in objects]
+    versions = cache.get_many(keys)
+
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def bump(model_name, *pks):
+    """Move the given objects to a new version."""
+    for pk in pks:
+        if pk is None:
+            continue
+        key = _key(model_name, pk)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def book_changed(sender, instance, **kwargs):
+    bump('book', instance.pk)
+    # The author detail page lists the author's books; a book moved to another author leaves the old page too.
+    previous_author_id = getattr(instance, '_loaded_relations', {}).get('author_id')
+    bump('author', instance.author_id, previous_author_id)
+
+
+def book_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            bump('book', instance.pk)
+    elif action == 'pre_clear':
+        # genre.book_set.clear(): the books are only known before the clear
+        bump('book', *instance.book_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        bump('book', *pk_set)
+
+
+def copy_changed(sender, instance, **kwargs):
+    # Must run before catalog.counters updates _counted_as, which still names the copy's previous book here
+    previous = getattr(instance, '_counted_as', None)
+    bump('book', instance.book_id, previous[0] if previous else None)
+
+
+def author_changed(sender, instance, **kwargs):
+    bump('author', instance.pk)
+
+
+def table_changed(sender, **kwargs):
+    bump(sender._meta.model_name, ALL)
+
+
+def rows_added_or_removed(sender, created=True, **kwargs):
+    # post_save with created=False is an edit, which the conditional GET validators see in updated_at
+    if created:
+        bump(sender._meta.model_name, ALL)
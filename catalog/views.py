@@ -1,51 +1,50 @@
 import datetime
+from urllib.parse import urlencode
 
+from django.core.paginator import Paginator
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
-from catalog.models import Book, Author, BookInstance, Genre
-from django.db.models import Q
+from catalog.models import Book, Author, BookInstance, Genre, Hold
 from django.views import generic
-from django.contrib.auth.decorators import permission_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin
 
+from django.views.decorators.http import require_POST
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 
-from catalog.forms import RenewBookForm
+from catalog import authcache, export, facets, holds, loans, metrics, search, stats, versions, visits
+from catalog.conditional import (
+    author_detail_validators, author_list_validators, book_detail_validators, book_list_validators,
+    conditional_class_view,
+)
+from catalog.pagination import CursorPaginationMixin
+from catalog.forms import BatchLoanForm, RenewBookForm
 
 def index(request):
     """View function for home page of the site."""
 
-    # Generate counts of some of the main objects
-    num_books = Book.objects.all().count()
-    num_instances = BookInstance.objects.all().count()
+    # Book, copy and author counts, computed together and cached between catalog changes
+    counts = stats.get_index_counts()
 
-    # Available books (status = 'a')
-    num_instances_available = BookInstance.objects.filter(status__exact='a').count()
-
-    # The 'all()' is implied by default
-    num_authors = Author.objects.count()
-
-    num_fictional_books = Book.objects.filter(~Q(genre__name__contains='Non-fiction')).count()
-
-    # Number of visits to this view, as counted in the session variable.
-    num_visits = request.session.get('num_visits', 0)
-    request.session['num_visits'] = num_visits + 1
+    # Number of visits of a logged in user to this view, as counted by the CATALOG_VISIT_COUNTER (a signed cookie by default).
+    visit_counter = visits.get_visit_counter()
+    num_visits = visit_counter.visit(request)
 
     context = {
-        'num_books': num_books,
-        'num_instances': num_instances,
-        'num_instances_available': num_instances_available,
-        'num_authors': num_authors,
-        'num_fictional_books': num_fictional_books,
+        **counts,
         'num_visits': num_visits,
     }
 
     # Render the HTML template index.html with the data in the context variable
-    return render(request, 'index.html', context=context)
+    response = render(request, 'index.html', context=context)
+    visit_counter.save(request, response)
+    return response
 
-class BookListView(generic.ListView):
+@conditional_class_view(book_list_validators, send_last_modified=False)
+class BookListView(CursorPaginationMixin, generic.ListView):
     model = Book
     ## Can define context_object, queryset, and template_name
     # context_object_name = 'my_book_list' # your own name for the list as a template variable
@@ -53,9 +52,16 @@ class BookListView(generic.ListView):
     # template_name = 'books/my_arbitrary_template_name_list.html' # Specify your own template name/location
     template_name = 'book_list.html'
     paginate_by = 10
+    cursor_ordering = ('title', 'id')
 
-    # def get_queryset(self):
-    #     return Book.objects.filter(title__icontains='war')[:5] # Get 5 books containing the title war
+    def get_queryset(self):
+        # book_list.html only shows the title and author of each book, so join the author
+        # in the same query and leave the other columns (summary, counters, ...) unloaded.
+        return (
+            Book.objects.select_related('author')
+            .only('id', 'title', 'author__id', 'author__first_name', 'author__last_name')
+            .order_by('title', 'id')
+        )
 
     # def get_context_data(self, **kwargs):
     #     # Call the base implementation first to get the context
@@ -64,43 +70,185 @@ class BookListView(generic.ListView):
     #     context['some_data'] = 'This is just some data'
     #     return context
 
+def book_search(request):
+    """View function for full-text search over books and their authors."""
+    query = request.GET.get('q', '').strip()
+
+    # Ranked ids come from the search index; only the books on the current page are loaded.
+    paginator = Paginator(search.search_book_ids(query), 10)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    books = (
+        Book.objects.select_related('author')
+        .only('id', 'title', 'author__id', 'author__first_name', 'author__last_name')
+        .in_bulk(page_obj.object_list)
+    )
+
+    context = {
+        'query': query,
+        'book_list': [books[book_id] for book_id in page_obj.object_list if book_id in books],
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+    }
+    return render(request, 'book_search.html', context=context)
+
+BROWSE_FACETS = ('genre', 'language', 'author')
+
+
+def _facet_filter(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def browse(request):
+    """View function for browsing books by genre, language and author."""
+    filters = {name: _facet_filter(request.GET.get(name)) for name in BROWSE_FACETS}
+
+    def query_string(**changes):
+        return urlencode({name: value for name, value in {**filters, **changes}.items() if value is not None})
+
+    def browse_url(**changes):
+        query = query_string(**changes)
+        return f'{request.path}?{query}' if query else request.path
+
+    # The number of books and the sidebar counts come from the precomputed facets (see catalog.facets)
+    paginator = Paginator(
+        facets.filter_books(
+            Book.objects.select_related('author')
+            .only('id', 'title', 'author__id', 'author__first_name', 'author__last_name')
+            .order_by('title', 'id'),
+            **filters,
+        ),
+        10,
+    )
+    paginator.count = facets.count_books(**filters)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    sidebars = {
+        'genre': facets.genre_facets(filters['language'], filters['author']),
+        'language': facets.language_facets(filters['genre'], filters['author']),
+        'author': facets.author_facets(filters['genre'], filters['language']),
+    }
+    context = {
+        'facets': [
+            {
+                'name': name,
+                'choices': [
+                    (obj, books, browse_url(**{name: obj.pk}), obj.pk == filters[name])
+                    for obj, books in sidebars[name]
+                ],
+                'clear_url': browse_url(**{name: None}) if filters[name] is not None else None,
+            }
+            for name in BROWSE_FACETS
+        ],
+        'book_list': page_obj.object_list,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+        'filter_query': query_string(),
+    }
+    return render(request, 'browse.html', context=context)
+
+@conditional_class_view(book_detail_validators)
 class BookDetailView(generic.DetailView):
     """Generic view to view the details of a single book."""
     model = Book
     template_name = 'book_detail.html'
 
-class AuthorListView(generic.ListView):
+    def get_queryset(self):
+        return Book.objects.select_related('author', 'language')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # The cached part of book_detail.html shows the book, its author, genres, language and copies
+        context['fragment_timeout'] = versions.FRAGMENT_TIMEOUT
+        context['fragment_version'] = versions.get_versions(
+            ('book', self.object.pk),
+            ('author', self.object.author_id),
+            ('genre', versions.ALL),
+            ('language', versions.ALL),
+        )
+        return context
+
+@conditional_class_view(author_list_validators, send_last_modified=False)
+class AuthorListView(CursorPaginationMixin, generic.ListView):
     """Generic view to list all of the authors in the database."""
     model = Author
     template_name = 'author_list.html'
     paginate_by = 10
+    cursor_ordering = ('last_name', 'first_name', 'id')
 
+    def get_queryset(self):
+        return Author.objects.only('id', 'first_name', 'last_name')
+
+@conditional_class_view(author_detail_validators, send_last_modified=False)
 class AuthorDetailView(generic.DetailView):
     """Generic view to view the details of an author."""
     model = Author
     template_name = 'author_detail.html'
 
-class LoanedBooksView(LoginRequiredMixin, UserPassesTestMixin,  generic.ListView):
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # author_detail.html only shows the title and summary of each book. The queryset is lazy,
+        # so it is not run at all while the cached fragment listing the books is still valid.
+        context['book_list'] = self.object.book_set.only('id', 'title', 'summary', 'author_id').order_by('title', 'id')
+        context['fragment_timeout'] = versions.FRAGMENT_TIMEOUT
+        context['fragment_version'] = versions.get_versions(('author', self.object.pk))
+        return context
+
+class LoanedBooksView(LoginRequiredMixin, UserPassesTestMixin, CursorPaginationMixin, generic.ListView):
     """Generic view that lists all the books that are currently on loan. Only available to librarian users."""
     model = BookInstance
     template_name = 'loanedbooks_list.html'
     paginate_by = 10
+    cursor_ordering = ('due_back', 'id')
     permission_required = 'catalog.can_mark_returned'
     
     def get_queryset(self):
-        return BookInstance.objects.filter(status__exact='o').order_by('due_back')
+        queryset = BookInstance.objects.on_loan()
+        if self.show_overdue_only():
+            queryset = queryset.overdue()
+        return (
+            queryset
+            .select_related('book')
+            .only('id', 'due_back', 'status', 'book__id', 'book__title')
+            .order_by('due_back')
+        )
+
+    def show_overdue_only(self):
+        return 'overdue' in self.request.GET
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['overdue_only'] = self.show_overdue_only()
+        # Keep the filter on the pagination links
+        context['pagination_query'] = 'overdue&' if context['overdue_only'] else ''
+        return context
 
     def test_func(self):
-        return self.request.user.groups.filter(name="Librarian").exists()
+        return authcache.in_group(self.request.user, 'Librarian')
 
-class LoanedBooksByUserListView(LoginRequiredMixin, generic.ListView):
+class LoanedBooksByUserListView(LoginRequiredMixin, CursorPaginationMixin, generic.ListView):
     """Generic class-based view listing books on loan to current user."""
     model = BookInstance
     template_name = 'bookinstance_list_borrowed_user.html'
     paginate_by = 10
+    cursor_ordering = ('due_back', 'id')
 
     def get_queryset(self):
-        return BookInstance.objects.filter(borrower=self.request.user).filter(status__exact='o').order_by('due_back')
+        return (
+            BookInstance.objects.filter(borrower=self.request.user).filter(status__exact='o')
+            .select_related('book')
+            .only('id', 'due_back', 'status', 'borrower', 'book__id', 'book__title')
+            .order_by('due_back')
+        )
+
+def _posted_version(request, book_instance):
+    """The copy version the submitted form was rendered with (the current one if it did not say)."""
+    try:
+        return int(request.POST['version'])
+    except (KeyError, ValueError):
+        return book_instance.version
 
 @permission_required('catalog.can_mark_returned')
 def renew_book_librarian(request, pk):
@@ -115,12 +263,15 @@ def renew_book_librarian(request, pk):
 
         # Check if the form is valid
         if form.is_valid():
-            # process the data in form.cleaned_data as required (here we just write it to the model due_back field)
-            book_instance.due_back = form.cleaned_data['renewal_date']
-            book_instance.save()
-
-            # redirect to a new URL:
-            return HttpResponseRedirect(reverse('all-borrowed'))
+            # Write the new due date only if nobody changed the copy since this form was shown
+            try:
+                loans.renew_copy(book_instance, form.cleaned_data['renewal_date'],
+                                 expected_version=_posted_version(request, book_instance))
+            except loans.LoanStateError as e:
+                form.add_error(None, str(e))
+            else:
+                # redirect to a new URL:
+                return HttpResponseRedirect(reverse('all-borrowed'))
     
     # If this is a GET (or any other method) create the default form.
     else:
@@ -176,4 +327,84 @@ class BookDelete(DeleteView, PermissionRequiredMixin):
     model = Book
     success_url = reverse_lazy('books')
     permission_required = 'catalog.can_mark_returned'
-    template_name = 'book_confirm_delete.html'
\ No newline at end of file
+    template_name = 'book_confirm_delete.html'
+
+@permission_required('catalog.can_mark_returned')
+def export_catalog(request, kind, fmt):
+    """Stream a full export of books, authors or copies as CSV or NDJSON."""
+    if kind not in export.EXPORTS or fmt not in export.FORMATS:
+        raise Http404('Unknown export')
+
+    content_type, _lines = export.FORMATS[fmt]
+    response = StreamingHttpResponse(export.export_lines(kind, fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
+
+@staff_member_required
+def request_metrics(request):
+    """Per-view request, query and template time histograms aggregated by this process."""
+    return JsonResponse({'buckets_ms': metrics.BUCKETS_MS, 'views': metrics.REGISTRY.snapshot()})
+
+BATCH_LOAN_ACTIONS = {
+    'checkout': ('Batch checkout', lambda data: loans.checkout(data['copy_ids'], data['borrower'], data['due_back'])),
+    'return': ('Batch return', lambda data: loans.return_copies(data['copy_ids'])),
+    'renew': ('Batch renewal', lambda data: loans.renew(data['copy_ids'], data['due_back'])),
+}
+
+@permission_required('catalog.can_mark_returned')
+def batch_loans(request, action):
+    """Check out, return or renew many copies at once, reporting the outcome for each copy."""
+    if action not in BATCH_LOAN_ACTIONS:
+        raise Http404('Unknown loan action')
+    title, apply = BATCH_LOAN_ACTIONS[action]
+
+    results = None
+    if request.method == 'POST':
+        form = BatchLoanForm(request.POST, action=action)
+        if form.is_valid():
+            results = apply(form.cleaned_data)
+            # Start the next batch with an empty list of copies
+            form = BatchLoanForm(action=action, initial={
+                key: value for key, value in form.cleaned_data.items() if key != 'copy_ids'
+            })
+    else:
+        form = BatchLoanForm(action=action, initial={'due_back': datetime.date.today() + datetime.timedelta(weeks=3)})
+
+    context = {
+        'title': title,
+        'action': action,
+        'actions': BATCH_LOAN_ACTIONS,
+        'form': form,
+        'results': results,
+        'succeeded': sum(result.ok for result in results) if results is not None else 0,
+    }
+    return render(request, 'batch_loans.html', context)
+
+
+class HoldsByUserListView(LoginRequiredMixin, generic.ListView):
+    """Generic class-based view listing the current user's holds, with their place in each queue."""
+    model = Hold
+    template_name = 'hold_list_user.html'
+
+    def get_queryset(self):
+        return holds.with_positions(
+            Hold.objects.filter(patron=self.request.user, status__in=holds.ACTIVE_STATUSES)
+            .select_related('book', 'copy')
+            .only('id', 'status', 'created_at', 'expires_at', 'book__id', 'book__title', 'copy__id')
+        )
+
+@login_required
+@require_POST
+def place_hold(request, pk):
+    """Queue the current user for a copy of a book."""
+    book = get_object_or_404(Book.objects.only('id'), pk=pk)
+    holds.place_hold(book, request.user)
+    return HttpResponseRedirect(reverse('my-holds'))
+
+@login_required
+@require_POST
+def cancel_hold(request, pk):
+    """Cancel one of the current user's holds."""
+    hold = get_object_or_404(Hold, pk=pk, patron=request.user)
+    holds.cancel(hold)
+    return HttpResponseRedirect(reverse('my-holds'))
@@ -0,0 +1,83 @@
+"""Visit counters for the home page.
+
+The counter class is chosen with the CATALOG_VISIT_COUNTER setting:
+
+* SignedCookieVisitCounter (the default) keeps the count of each logged
+  in user in a signed cookie: no session row is read or written.
+* CacheVisitCounter keeps the count of each logged in user in the cache
+  named by CATALOG_VISIT_CACHE, using the atomic cache.incr() (Redis and
+  memcached backends share it between processes; local memory is a
+  single-process stand-in).
+* SessionVisitCounter is the original ``request.session['num_visits']``,
+  which saves the session on every visit.
+
+The first two do not count anonymous visits, so those pages set no cookie
+and stay cacheable by shared caches.
+A counter's visit() returns the number of earlier visits (None when the
+visitor is not counted); save() is then called with the response.
+"""
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+class SessionVisitCounter:
+    def visit(self, request):
+        num_visits = request.session.get('num_visits', 0)
+        request.session['num_visits'] = num_visits + 1
+        return num_visits
+
+    def save(self, request, response):
+        pass
+
+
+class SignedCookieVisitCounter:
+    cookie_name = 'num_visits'
+    salt = 'catalog.visits'
+    max_age = 365 * 24 * 60 * 60
+
+    def visit(self, request):
+        if not request.user.is_authenticated:
+            return None
+        try:
+            num_visits = int(request.get_signed_cookie(self.cookie_name, default=0, salt=self.salt))
+        except (signing.BadSignature, ValueError):
+            num_visits = 0
+        request._catalog_num_visits = num_visits + 1
+        return num_visits
+
+    def save(self, request, response):
+        if not hasattr(request, '_catalog_num_visits'):
+            return
+        response.set_signed_cookie(
+            self.cookie_name, request._catalog_num_visits, salt=self.salt, max_age=self.max_age,
+            secure=request.is_secure(), httponly=True, samesite='Lax',
+        )
+
+
+class CacheVisitCounter:
+    key_prefix = 'catalog:visits:'
+
+    def __init__(self):
+        self.cache = caches[getattr(settings, 'CATALOG_VISIT_CACHE', 'default')]
+
+    def visit(self, request):
+        if not request.user.is_authenticated:
+            return None
+        key = f'{self.key_prefix}{request.user.pk}'
+        # add() is a no-op if the key exists, so the count is never reset by a race
+        self.cache.add(key, 0, timeout=None)
+        try:
+            return self.cache.incr(key) - 1
+        except ValueError:
+            # Evicted between add() and incr()
+            self.cache.set(key, 1, timeout=None)
+            return 0
+
+    def save(self, request, response):
+        pass
+
+
+def get_visit_counter():
+    return import_string(getattr(settings, 'CATALOG_VISIT_COUNTER', 'catalog.visits.SignedCookieVisitCounter'))()
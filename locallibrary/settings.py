@@ -38,12 +38,17 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'catalog',
+    'catalog.apps.CatalogConfig',
 ]
 
 MIDDLEWARE = [
+    # First, so that the queries of every other middleware are timed too
+    'catalog.middleware.RequestMetricsMiddleware',
+    # Catalog reads of the request go to the read replicas, if there are any
+    'catalog.middleware.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # whitenoise.middleware.WhiteNoiseMiddleware, usable by the async views under ASGI
+    'catalog.middleware.AsyncCapableWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,7 +61,8 @@ ROOT_URLCONF = 'locallibrary.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The Django backend, timing template rendering for RequestMetricsMiddleware
+        'BACKEND': 'catalog.metrics.TimedDjangoTemplates',
         'DIRS': [
             os.path.join(BASE_DIR, 'templates'),
         ],
@@ -86,6 +92,60 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+
+# Holds the index counters and the detail page fragments. Every process serving the site must
+# share it (e.g. memcached) for invalidation to reach all workers; local memory suits development.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', ''),
+    }
+}
+
+
+# Home page visit counter: catalog.visits.SignedCookieVisitCounter, CacheVisitCounter or SessionVisitCounter.
+# CacheVisitCounter uses the CATALOG_VISIT_CACHE alias of CACHES, which should be a shared
+# (e.g. Redis) cache when several processes serve the site.
+CATALOG_VISIT_COUNTER = os.environ.get('DJANGO_VISIT_COUNTER', 'catalog.visits.SignedCookieVisitCounter')
+CATALOG_VISIT_CACHE = 'default'
+
+
+# Query inspector (development and staging only)
+# Groups the SQL of each request by shape, logs probable N+1 and slow queries, and keeps a ranked
+# report of every view's queries in CATALOG_QUERY_REPORT.
+CATALOG_QUERY_INSPECTOR = os.environ.get('DJANGO_QUERY_INSPECTOR', '') == 'True'
+CATALOG_QUERY_REPORT = os.environ.get('DJANGO_QUERY_REPORT', os.path.join(BASE_DIR, 'query-report.txt'))
+CATALOG_QUERY_REPEAT_THRESHOLD = 3
+CATALOG_SLOW_QUERY_MS = 100
+
+# Days a patron has to pick up the copy set aside for their hold (see catalog.holds)
+CATALOG_HOLD_PICKUP_DAYS = 7
+
+# Version of the UUIDs new copies get as ids: 7 (time-ordered) or 4 (random), see catalog/identifiers.py
+CATALOG_COPY_UUID_VERSION = 7
+
+
+# Whether the default cache is shared by every process serving the site. A per-process cache only
+# sees the invalidations made in its own process, so it must not hold users, permissions or sessions.
+SHARED_DEFAULT_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# With a shared cache, users are loaded with their permissions and groups from it, see catalog/authcache.py.
+# ModelBackend stays listed so that sessions logged in through either backend remain valid.
+AUTHENTICATION_BACKENDS = [
+    *(['catalog.authcache.CachedModelBackend'] if SHARED_DEFAULT_CACHE else []),
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# With a shared cache, sessions are read from it, and written through to the database
+if SHARED_DEFAULT_CACHE:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -133,6 +193,39 @@ import dj_database_url
 db_from_env = dj_database_url.config(conn_max_age=500)
 DATABASES['default'].update(db_from_env)
 
+# Read replicas: DATABASE_REPLICA_URLS is a comma separated list of database URLs. Catalog reads of
+# requests go to them, see catalog/replicas.py. Two copies of db.sqlite3 make local stand-ins, e.g.
+# DATABASE_REPLICA_URLS=sqlite:////tmp/replica1.sqlite3,sqlite:////tmp/replica2.sqlite3
+CATALOG_REPLICAS = []
+for number, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = dj_database_url.parse(url.strip(), conn_max_age=500)
+    # Tests read the replicas through the test database of the primary
+    DATABASES[f'replica{number}']['TEST'] = {'MIRROR': 'default'}
+    CATALOG_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['catalog.replicas.ReplicaRouter']
+# How long a browser reads from the primary after changing the catalog, covering the replication lag
+CATALOG_REPLICA_STICKY_SECONDS = 10
+# How long a replica that failed to connect is left alone
+CATALOG_REPLICA_RETRY_SECONDS = 30
+
+# Connection pooling and health checks (catalog/pool.py). The catalog.backends engines check a
+# persistent connection on its first use in each request (CONN_HEALTH_CHECKS). With DJANGO_DB_POOL,
+# connections are also returned to a per-process pool at the end of each request and reused by any
+# thread, instead of being kept per thread with CONN_MAX_AGE.
+CATALOG_ENGINES = {
+    'django.db.backends.sqlite3': 'catalog.backends.sqlite3',
+    'django.db.backends.postgresql': 'catalog.backends.postgresql',
+    'django.db.backends.postgresql_psycopg2': 'catalog.backends.postgresql',
+}
+for database in DATABASES.values():
+    if database['ENGINE'] in CATALOG_ENGINES:
+        database['ENGINE'] = CATALOG_ENGINES[database['ENGINE']]
+        if os.environ.get('DJANGO_DB_POOL', '') == 'True':
+            database['CONN_MAX_AGE'] = 0
+            database['POOL'] = {'MAX_IDLE': int(os.environ.get('DJANGO_DB_POOL_SIZE', 5)), 'MAX_IDLE_SECONDS': 300}
+        else:
+            database['CONN_HEALTH_CHECKS'] = True
+
 # Static files (CSS, Javascript, Images)
 # https://docs.djangoproject.com/en/2.1/howto/static-files/
 